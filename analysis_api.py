@@ -1,17 +1,83 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
 from flask import jsonify
 from db import get_connection
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import io, base64
-from datetime import datetime
+from data_version import conditional_response
+from hours_series import SERIES_BUCKETS, bucket_points, choose_bucket, get_hours_series
+from charts import get_pie_chart, CHART_FORMATS
+from datetime import datetime, timedelta
  
  
 analysis_bp = Blueprint("analysis_bp", __name__)
  
  
  
+def _as_date(value):
+    # pyodbc returns date objects; some drivers hand DATE columns back as strings
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+
+ANALYSIS_SUMMARY_SQL = (
+    "SELECT d.Tdate, p.Project_Name, SUM(d.hours), SUM(d.overtime) "
+    "FROM TimesheetDailyRollup d "
+    "JOIN TimesheetProjects p ON d.project_id = p.id "
+    "WHERE d.user_id = ? AND d.Tdate >= ? AND d.Tdate <= ? "
+    "GROUP BY d.Tdate, p.Project_Name "
+    "ORDER BY d.Tdate;"
+)
+
+
+def get_analysis_summary(user_id, start_date, end_date):
+    """
+    Everything the Analysis page shows, computed from a single pass over the daily rollup:
+    - projects: per-project hours, overtime, total and share of the range total (percent)
+    - daily: total hours (including overtime) per day, ordered by date
+    - weekly: hours and overtime per week (weeks start on Monday)
+    - total_hours / total_overtime for the whole range
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(ANALYSIS_SUMMARY_SQL, (user_id, start_date, end_date))
+    rows = cursor.fetchall()
+    conn.close()
+
+    projects = {}
+    daily = {}
+    weekly = {}
+    total_hours = 0.0
+    total_overtime = 0.0
+    for Tdate, project, hours, overtime in rows:
+        Tdate = _as_date(Tdate)
+        hours = float(hours)
+        overtime = float(overtime)
+        total_hours += hours
+        total_overtime += overtime
+
+        p = projects.setdefault(project, [0.0, 0.0])
+        p[0] += hours
+        p[1] += overtime
+        daily[Tdate] = daily.get(Tdate, 0.0) + hours + overtime
+        week = weekly.setdefault(Tdate - timedelta(days=Tdate.weekday()), [0.0, 0.0])
+        week[0] += hours
+        week[1] += overtime
+
+    grand_total = total_hours + total_overtime
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_hours": total_hours,
+        "total_overtime": total_overtime,
+        "projects": [
+            {"project": name, "hours": h, "overtime": o, "total": h + o,
+             "share": (h + o) * 100.0 / grand_total if grand_total else 0.0}
+            for name, (h, o) in sorted(projects.items())
+        ],
+        "daily": [{"date": str(d), "hours": h} for d, h in sorted(daily.items())],
+        "weekly": [{"week_start": str(w), "hours": h, "overtime": o} for w, (h, o) in sorted(weekly.items())],
+    }
+
+
 @analysis_bp.route("/analysis", methods=["GET"])
 def analysis():
     user_id = session.get("user_id")
@@ -19,6 +85,9 @@ def analysis():
     # Read dates from query string (GET). Format: YYYY-MM-DD
     start_date = request.args.get("start_date") or "2026-01-01"
     end_date = request.args.get("end_date") or "2026-01-30"
+    chart_format = request.args.get("chart_format", "png")
+    if chart_format not in CHART_FORMATS:
+        chart_format = "png"
     if not user_id:
         return redirect(url_for("login"))
  
@@ -30,55 +99,62 @@ def analysis():
         flash("Invalid date format. Use YYYY-MM-DD.")
         return redirect(url_for('analysis_bp.analysis'))
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    # Use COALESCE to handle NULL overtime, and fix the WHERE clauses
-    cursor.execute(
-        "SELECT p.Project_Name, "
-        "(SUM(m.hours + COALESCE(m.overtime,0)) * 100.0 / "
-        "(SELECT SUM(m2.hours + COALESCE(m2.overtime,0)) FROM TimesheetMain m2 "
-        "JOIN TimesheetProjects p2 ON m2.project_id = p2.id "
-        "WHERE m2.user_id = ? AND m2.Tdate >= ? AND m2.Tdate <= ?)) "
-        "AS Time_Employee_Worked "
-        "FROM TimesheetMain m "
-        "JOIN TimesheetProjects p ON m.project_id = p.id "
-        "WHERE m.user_id = ? AND m.Tdate >= ? AND m.Tdate <= ? "
-        "GROUP BY p.Project_Name;",
-        (user_id, start_date, end_date, user_id, start_date, end_date)
-    )
-    rows = cursor.fetchall()
-    conn.close()
+    # One rollup scan feeds both charts: the pie is rendered here and the daily
+    # series is embedded in the page, so the browser makes no second request
+    summary = get_analysis_summary(user_id, start_date, end_date)
+    # Long ranges are charted per week or month rather than one point per day
+    summary["daily"] = bucket_points(summary["daily"], choose_bucket(_as_date(start_date), _as_date(end_date)))
+    labels = [p["project"] for p in summary["projects"]]
+    data = [p["share"] for p in summary["projects"]]
 
-    labels = [n for n, _ in rows]
-    data = [p for _, p in rows]
+    # Rendered on the chart worker pool and cached per user/range/data (see charts.py)
+    img_data = get_pie_chart(user_id, start_date, end_date, labels, data, chart_format)
+    return render_template("Analysis.html", chart_data=img_data, chart_mime=CHART_FORMATS[chart_format],
+                           summary=summary, start_date=start_date, end_date=end_date,username = username)
 
-    plt.figure(figsize=(6,6))
 
-    if not data or sum(data) == 0:
-        # no data - create a placeholder pie chart
-        labels = ['No data']
-        data = [1]
+@analysis_bp.route("/analysis/data", methods=["GET"])
+def analysis_data():
+    """
+    ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD[&bucket=day|week|month|auto]
+    Hours series for the line chart; the bucket used is returned in X-Series-Bucket.
+    Supports conditional GET (ETag / Last-Modified, see data_version.py).
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "not authenticated"}), 401
 
-    plt.pie(data, labels=labels, autopct="%1.1f%%")
-    plt.legend(title="Projects")
+    start_date = request.args.get("start_date") or "2026-01-01"
+    end_date = request.args.get("end_date") or "2026-01-05"
+    bucket = (request.args.get("bucket") or "auto").lower()
 
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format="png")
-    plt.close()
-    img_buffer.seek(0)
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+    if bucket != "auto" and bucket not in SERIES_BUCKETS:
+        return jsonify({"error": "Invalid bucket. Use day, week, month or auto."}), 400
 
-    img_data = base64.b64encode(img_buffer.read()).decode('utf-8')
-    return render_template("Analysis.html", chart_data=img_data, start_date=start_date, end_date=end_date,username = username)
+    def build():
+        used, points = get_hours_series(user_id, start, end, bucket)
+        response = jsonify(points)
+        response.headers["X-Series-Bucket"] = used
+        return response
 
+    # 304 without querying when nothing was written since the client's copy
+    return conditional_response(user_id, build)
 
-@analysis_bp.route("/analysis/data", methods=["GET"])
-def analysis_data():
+
+@analysis_bp.route("/analysis/summary", methods=["GET"])
+def analysis_summary():
+    """Project share, daily series, weekly totals and overtime totals in one JSON document."""
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "not authenticated"}), 401
 
     start_date = request.args.get("start_date") or "2026-01-01"
-    end_date = request.args.get("end_date") or "2026-01-05"
+    end_date = request.args.get("end_date") or "2026-01-30"
 
     try:
         datetime.strptime(start_date, "%Y-%m-%d")
@@ -86,18 +162,4 @@ def analysis_data():
     except ValueError:
         return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT Tdate, SUM(hours + COALESCE(overtime, 0)) AS Total_hours_worked "
-        "FROM TimesheetMain "
-        "WHERE user_id = ? AND Tdate >= ? AND Tdate <= ? "
-        "GROUP BY Tdate "
-        "ORDER BY Tdate;",
-        (user_id, start_date, end_date)
-    )
-    rows = cursor.fetchall()
-    conn.close()
-
-    data = [{"date": str(r[0]), "hours": float(r[1])} for r in rows]
-    return jsonify(data)
\ No newline at end of file
+    return jsonify(get_analysis_summary(user_id, start_date, end_date))
@@ -1,32 +1,46 @@
+import os
 from flask import Flask, flash, render_template, request, session, jsonify, redirect, url_for
-import pyodbc
-from flask_bcrypt import Bcrypt
+from markupsafe import Markup
+from datetime import datetime, timedelta
 from db import get_connection
 from analysis_api import analysis_bp
 from timesheet_api import timesheet_bp
 from timesheet_routes import timesheet_routes_bp
+from export_api import export_bp
+from reports_api import reports_bp
+from jobs_api import jobs_bp
+from import_api import import_bp
+import metrics
+from auth import admin_required
+from warmup import warm_up
+from rollup import get_entry_key
+from timesheet_model import sync_entry_changes, insert_main_entry, TASK_PAGE_SQL, TASK_PAGE_AFTER_SQL
+from ingest import IngestBusy
+from search_index import search_entries, FIELD_IDS
+from reference_data import get_projects, get_tasks, get_project_tree, invalidate_reference_data
+from passwords import hash_password, verify_password, warm_up_pool, PasswordServiceBusy
+from serialize import FastJSONProvider, rows_to_dicts
+from page_streaming import stream_page, cached_fragment
+from data_version import get_user_version
+from user_profile import get_user_profile, cache_user_profile, invalidate_user_profile
 
 
 app = Flask(__name__)
-bcrypt = Bcrypt(app)
 app.register_blueprint(analysis_bp)
 app.register_blueprint(timesheet_bp)
 app.register_blueprint(timesheet_routes_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(reports_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(import_bp)
 
 app.secret_key = "TCE2025SecretKey"
 
-# Database connection string
-conn_str = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=SRMUMATBU10;"
-    "Database=YEDP2024;"
-    "Trusted_Connection=yes;"
-)
+# jsonify() through orjson when available (see serialize.py)
+app.json = FastJSONProvider(app)
 
-
-
-def get_connection():
-    return pyodbc.connect(conn_str)
+# Per-request latency, SQL accounting and /metrics (see metrics.py)
+metrics.init_app(app)
 
 @app.route("/")
 def landingPage():
@@ -45,7 +59,11 @@ def create_user():
         Fname = request.form["Fname"]
         ContactNo = request.form["ContactNo"]
         Password = request.form["Password"]
-        Password_hash = bcrypt.generate_password_hash(Password).decode("utf-8")
+        # Hashed in the password worker pool (see passwords.py)
+        try:
+            Password_hash = hash_password(Password)
+        except PasswordServiceBusy:
+            return render_template("SignUp.html", error="The server is busy. Please try again in a moment."), 503, {"Retry-After": "2"}
 
         conn = get_connection()
         cursor = conn.cursor()
@@ -88,7 +106,7 @@ def login():
             conn = get_connection()
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT Id, Password,Fname FROM UserDetail WHERE Username = ?",
+                "SELECT Id, Password, Fname, Username, Lname, ContactNo, Email FROM UserDetail WHERE Username = ?",
                 (Username,)
             )
             row = cursor.fetchone()
@@ -106,9 +124,20 @@ def login():
         stored_hash = row[1]
         username = row[2]
 
-        if bcrypt.check_password_hash(stored_hash, Password):
+        try:
+            ok, new_hash = verify_password(stored_hash, Password)
+        except PasswordServiceBusy:
+            return render_template("loginform.html", error="The server is busy. Please try again in a moment.", flag = 1), 503, {"Retry-After": "2"}
+
+        if ok:
+            if new_hash:
+                # Stored hash was made with a different work factor; upgrade it
+                rehash_password(user_id, new_hash)
             session["user_id"] = user_id
             session["username"] = username
+            # Prime the profile cache so the pages after login skip UserDetail
+            cache_user_profile({"Id": row[0], "Username": row[3], "Fname": row[2], "Lname": row[4],
+                                "ContactNo": row[5], "Email": row[6]})
             return redirect(url_for('analysis_bp.analysis'))
         else:
             return render_template("loginform.html", error="Invalid username or password" ,flag = 1), 401
@@ -119,44 +148,94 @@ def login():
     else:
         return redirect(url_for('analysis_bp.analysis'))
 
+def rehash_password(user_id, new_hash):
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE UserDetail SET Password = ? WHERE Id = ?", (new_hash, user_id))
+        conn.commit()
+    except Exception as e:
+        # The old hash still works; try again on the next login
+        print("Password rehash error:", e)
+    finally:
+        if conn:
+            conn.close()
+
 # -------------------
 # Data helpers
 # -------------------
 def get_projectNames():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, Project_Name FROM TimesheetProjects")
-    rows = cursor.fetchall()
-    conn.close()
-    projects = [{"id": row[0], "name": row[1]} for row in rows]
-    return projects
+    # Served from the in-process reference cache (see reference_data.py)
+    return get_projects()
 
 def get_taskNames(project_id=None):
+    return get_tasks(project_id)
+
+# Rows per dashboard page; the table loads further pages on scroll.
+HOME_PAGE_SIZE = 50
+HOME_PAGE_MAX = 200
+
+def get_task_page(user_id, limit=HOME_PAGE_SIZE, before_date=None, before_id=None):
+    """
+    Keyset-paginated slice of a user's logged tasks, newest first.
+    Ordering is (Tdate DESC, id DESC); passing the last row's (Tdate, id) as
+    before_date/before_id returns the page after it, so each page costs the same
+    no matter how much history the user has.
+    Returns (rows, next_cursor) where next_cursor is None on the last page.
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    if project_id:
-        cursor.execute("SELECT id, Proj_id, Task FROM TimesheetTasks WHERE Proj_id = ?", (project_id,))
-        rows = cursor.fetchall()
-        tasks = [{"id": row[0], "Proj_id": row[1], "task": row[2]} for row in rows]
+    if before_date is not None and before_id is not None:
+        query = TASK_PAGE_AFTER_SQL
+        params = [limit + 1, user_id, before_date, before_date, before_id]
     else:
-        cursor.execute("SELECT id, Proj_id, Task FROM TimesheetTasks")
-        rows = cursor.fetchall()
-        tasks = [{"id": row[0], "Proj_id": row[1], "task": row[2]} for row in rows]
+        query = TASK_PAGE_SQL
+        params = [limit + 1, user_id]
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    data = rows_to_dicts(cursor, rows[:limit], query)
     conn.close()
-    return tasks
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = data[-1]
+        next_cursor = {"before_date": str(last["Tdate"]), "before_id": last["id"]}
+    return data, next_cursor
 
 # -------------------
 # API endpoints for dropdowns
 # -------------------
+def reference_response(payload):
+    """JSON built from the reference data, tagged with its ETag; 304 when the client's copy matches."""
+    _, etag = get_project_tree()
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
 @app.route("/getProjects", methods=["GET"])
 def addProjs():
     projects = get_projectNames()
-    return jsonify({"projects": projects})
+    return reference_response({"projects": projects})
 
 @app.route("/getTasks/<int:project_id>", methods=["GET"])
 def addTaskNames(project_id):
     tasks = get_taskNames(project_id)
-    return jsonify({"tasks": tasks})
+    return reference_response({"tasks": tasks})
+
+@app.route("/getProjectTree", methods=["GET"])
+def getProjectTree():
+    """Every project with its tasks in one payload; answers 304 when the ETag still matches."""
+    tree, _ = get_project_tree()
+    return reference_response(tree)
+
+@app.route("/admin/reference/invalidate", methods=["POST"])
+@admin_required
+def invalidateReferenceData():
+    """Drop cached projects/tasks after TimesheetProjects or TimesheetTasks were edited."""
+    invalidate_reference_data()
+    return jsonify({"success": True})
 # -------------------
 # Home dashboard
 # -------------------
@@ -166,31 +245,51 @@ def home():
     if not user_id:
         return redirect(url_for("login"))
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Get username for greeting
-    cursor.execute("SELECT Username,Fname FROM UserDetail WHERE Id = ?", (user_id,))
-    user_row = cursor.fetchone()
-    Username = user_row[0] if user_row else "User"
-    Name = user_row[1] if user_row else "User"
-
-    # Get user's logged tasks
-    cursor.execute("""
-        SELECT m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description , m.Tdate
-        FROM TimesheetMain m
-        JOIN TimesheetProjects p ON m.project_id = p.id
-        JOIN TimesheetTasks t ON m.task_id = t.id
-        WHERE m.user_id = ?
-        ORDER BY m.Tdate DESC;
-    """, (user_id,))
-    rows = cursor.fetchall()
-    columns = [col[0] for col in cursor.description]
-    conn.close()
+    # Get username for greeting (cached, see user_profile.py)
+    user = get_user_profile(user_id)
+    Username = user["Username"] if user else "User"
+    Name = user["Fname"] if user else "User"
+
+    # Only the first page is rendered; the rest is fetched from /home/tasks on scroll.
+    # The page is streamed: the shell goes out first and load_page() runs when the
+    # template reaches the table. The first page is cached per user under the user's data
+    # version and the reference data ETag, so a repeat view runs neither the history
+    # query nor the template. Both are read before the query: a write landing in between
+    # can only make the cached page newer than its key, never older.
+    def render_first_page():
+        data, next_cursor = get_task_page(user_id)
+        rows_html = Markup(render_template("home_task_rows.html", data=data, entries=bool(data)))
+        return {"rows_html": rows_html, "next_cursor": next_cursor}
+
+    def load_page():
+        version, _ = get_user_version(user_id)
+        _, reference_etag = get_project_tree()
+        return cached_fragment(user_id, ("home_first_page", HOME_PAGE_SIZE, version, reference_etag),
+                               render_first_page)
+
+    return stream_page("Home.html", Username=Username, Name=Name, load_page=load_page)
+
+@app.route("/home/tasks", methods=["GET"])
+def home_tasks():
+    """JSON page of the dashboard table: ?before_date=YYYY-MM-DD&before_id=<id>&limit=<n>"""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
 
-    data = [dict(zip(columns, row)) for row in rows]
+    before_date = request.args.get("before_date")
+    before_id = request.args.get("before_id", type=int)
+    limit = request.args.get("limit", HOME_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, HOME_PAGE_MAX))
+    if before_date:
+        try:
+            datetime.strptime(before_date, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"success": False, "error": "Invalid before_date. Use YYYY-MM-DD."}), 400
 
-    return render_template("Home.html", Username=Username ,Name= Name, data=data, entries=bool(data))
+    data, next_cursor = get_task_page(user_id, limit, before_date, before_id)
+    for row in data:
+        row["Tdate"] = str(row["Tdate"])
+    return jsonify({"success": True, "results": data, "next_cursor": next_cursor})
 
 # -------------------
 # Add task (insert into TimesheetMain)
@@ -211,14 +310,10 @@ def add_task():
         overtime = float(overtime) if overtime else None
         description = request.form.get("description")
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO TimesheetMain (user_id, project_id, task_id, activity, hours, overtime, description, Tdate)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, project_id, task_id, activity, hours, overtime, description, Tdate))
-        conn.commit()
-        conn.close()
+        insert_main_entry(user_id, project_id, task_id, activity, hours, overtime, description, Tdate)
+    except IngestBusy:
+        # Queue full, or IngestTimeout: the row was withdrawn before it was written
+        return "The server is busy. Please try again in a moment.", 503, {"Retry-After": "2"}
     except Exception as e:
         print("Error inserting task:", e)
         # Optionally flash a message or return error page
@@ -235,6 +330,45 @@ def logout():
 # -------------------
 # Search tasks
 # -------------------
+SEARCH_LIMIT = 50
+SEARCH_LIMIT_MAX = 200
+
+SEARCH_BY_DATE_SQL = """
+    SELECT TOP (?) m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description, m.Tdate
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ? AND m.Tdate >= ? AND m.Tdate < ?
+    ORDER BY m.Tdate DESC, m.id DESC;
+"""
+
+def search_by_date(user_id, term, limit):
+    """
+    Entries on a day, month or year ("2026-01-05", "2026-01", "2026") as a range on Tdate,
+    so the (user_id, Tdate) index is used. Returns None if the term is not a date prefix.
+    """
+    for fmt, step in (("%Y-%m-%d", "day"), ("%Y-%m", "month"), ("%Y", "year")):
+        try:
+            start = datetime.strptime(term, fmt).date()
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+    if step == "day":
+        end = start + timedelta(days=1)
+    elif step == "month":
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    else:
+        end = start.replace(year=start.year + 1)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(SEARCH_BY_DATE_SQL, (limit, user_id, start, end))
+    results = rows_to_dicts(cursor, cursor.fetchall(), SEARCH_BY_DATE_SQL)
+    conn.close()
+    return results
+
 @app.route("/search_tasks", methods=["POST"])
 def search_tasks():
     user_id = session.get("user_id")
@@ -244,35 +378,23 @@ def search_tasks():
     try:
         data = request.get_json()
         search_term = data.get("search_term", "").strip()
-        column = data.get("column", "").strip()
+        column = (data.get("column") or "").strip()
+        limit = max(1, min(int(data.get("limit") or SEARCH_LIMIT), SEARCH_LIMIT_MAX))
 
-        if not search_term or not column:
-            return jsonify({"success": False, "error": "Search term and column are required"}), 400
+        if not search_term:
+            return jsonify({"success": False, "error": "Search term is required"}), 400
 
-        # Validate column name to prevent SQL injection
-        valid_columns = ["Project_Name", "Task", "activity", "Tdate", "description"]
-        if column not in valid_columns:
+        # Validate column name; empty means search every indexed column
+        if column and column != "Tdate" and column not in FIELD_IDS:
             return jsonify({"success": False, "error": "Invalid column"}), 400
 
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Build the query dynamically
-        query = f"""
-            SELECT m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description, m.Tdate
-            FROM TimesheetMain m
-            JOIN TimesheetProjects p ON m.project_id = p.id
-            JOIN TimesheetTasks t ON m.task_id = t.id
-            WHERE m.user_id = ? AND {column} LIKE ?
-            ORDER BY m.Tdate DESC;
-        """
-        
-        cursor.execute(query, (user_id, f"%{search_term}%"))
-        rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
-        conn.close()
-
-        results = [dict(zip(columns, row)) for row in rows]
+        # Dates are not in the token index; a date-shaped term is matched on Tdate instead
+        results = search_by_date(user_id, search_term, limit) if column in ("", "Tdate") else None
+        if column == "Tdate" and results is None:
+            return jsonify({"success": False, "error": "Use YYYY, YYYY-MM or YYYY-MM-DD"}), 400
+        if results is None:
+            # Ranked lookup in the token index (see search_index.py) instead of LIKE '%term%'
+            results = search_entries(user_id, search_term, field=column or None, limit=limit)
 
         return jsonify({"success": True, "results": results})
 
@@ -293,7 +415,10 @@ def delete_task(task_id):
 
     conn = get_connection()
     cursor = conn.cursor()
+    old_key = get_entry_key(cursor, task_id, user_id)
     cursor.execute("DELETE FROM TimesheetMain WHERE id = ? AND user_id = ?", (task_id, user_id))
+    if old_key:
+        sync_entry_changes(cursor, user_id, [old_key], entry_ids=(), deleted_ids=[task_id])
     conn.commit()
     conn.close()
 
@@ -338,11 +463,15 @@ def update_task(task_id):
         overtime = float(overtime_raw) if overtime_raw not in (None, "") else None
         description = request.form.get("description", "")
 
+        old_key = get_entry_key(cursor, task_id, user_id)
         cursor.execute("""
           UPDATE TimesheetMain
           SET Tdate=?, project_id=?, task_id=?, activity=?, hours=?, overtime=?, description=?
           WHERE id=? AND user_id=?
         """, (Tdate, project_id, task_id_form, activity, hours, overtime, description, task_id, user_id))
+        if old_key:
+            # The entry may have moved to another day/project: refresh both rollup keys
+            sync_entry_changes(cursor, user_id, [old_key, (Tdate, project_id)], entry_ids=[task_id])
         conn.commit()
         conn.close()
         return redirect(url_for("home"))
@@ -360,8 +489,7 @@ def update_task(task_id):
         conn.close()
         flash("Task not found.", "error")
         return redirect(url_for("home"))
-    columns = [c[0] for c in cursor.description]
-    task = dict(zip(columns, row))
+    task = rows_to_dicts(cursor, [row])[0]
     conn.close()
     return render_template("Update.html", task=task)
 
@@ -372,24 +500,10 @@ def profile():
     if not user_id:
         return redirect(url_for("login"))
  
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Id, Username, Fname, Lname, ContactNo, Email FROM UserDetail WHERE Id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
- 
-    if not row:
+    user = get_user_profile(user_id)
+    if not user:
         return "User not found", 404
  
-    user = {
-        "Id": row[0],
-        "Username": row[1],
-        "Fname": row[2],
-        "Lname": row[3],
-        "ContactNo": row[4],
-        "Email": row[5]
-    }
- 
     return render_template("Profile.html", user=user)
  
 # -------------------
@@ -402,23 +516,10 @@ def edit_profile():
     if not user_id:
         return redirect(url_for("login"))
  
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Username, Fname, Lname, ContactNo, Email FROM UserDetail WHERE Id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
- 
-    if not row:
+    user = get_user_profile(user_id)
+    if not user:
         return "User not found", 404
  
-    user = {
-        "Username": row[0],
-        "Fname": row[1],
-        "Lname": row[2],
-        "ContactNo": row[3],
-        "Email": row[4]
-    }
- 
     return render_template("edit_profile.html", user=user)
  
 # -------------------
@@ -445,9 +546,14 @@ def update_profile():
     """, (fname, lname, email, contact, user_id))
     conn.commit()
     conn.close()
+    invalidate_user_profile(user_id)
  
     return redirect(url_for('profile'))
  
 
+if os.environ.get("TIMESHEET_WARMUP"):
+    # Load the lazily imported dependencies in the background right after boot
+    warm_up([("password_pool", warm_up_pool)], background=True)
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,244 @@
+# async_api.py
+# Async (ASGI) variant of the JSON endpoints in timesheet_api.py and analysis_api.py.
+#
+# The Flask views block a worker thread for the whole ODBC round trip, so a worker can
+# only serve as many requests as it has threads. This module exposes the same endpoints
+# under /async as a plain ASGI application: requests are parsed on the event loop, and
+# only the blocking database calls are handed to a bounded thread pool
+# (TIMESHEET_ASYNC_DB_WORKERS, default = connection pool size). One worker process can
+# then keep many requests in flight, and excess load gets a fast 503 instead of queueing
+# behind busy worker threads.
+#
+# It reuses the Flask app's session cookie, so a user logged in through the normal pages
+# is authenticated here too. Run it next to the WSGI app, e.g.
+#     uvicorn async_api:app --port 8001
+# and route /async/* to it from the reverse proxy.
+#
+# Endpoints:
+#     GET  /async/api/timesheet/weekly/<week_start>
+#     POST /async/api/timesheet/add
+#     POST /async/api/timesheet/batch
+#     GET  /async/analysis/data?start_date=&end_date=[&bucket=]
+#     GET  /async/analysis/summary?start_date=&end_date=
+
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from app import app as flask_app
+from analysis_api import get_analysis_summary
+from db import get_pool
+from hours_series import get_hours_series, SERIES_BUCKETS
+from ingest import IngestBusy
+from serialize import dumps
+from timesheet_api import MAX_BATCH_ENTRIES
+from timesheet_model import get_weekly_timesheet, insert_timesheet_entry, validate_main_entry, insert_main_entries
+
+ASYNC_DB_WORKERS = int(os.environ.get("TIMESHEET_ASYNC_DB_WORKERS", 0)) or get_pool().max_size
+# Requests allowed to wait for a database thread before new ones are shed with 503
+ASYNC_MAX_PENDING = int(os.environ.get("TIMESHEET_ASYNC_MAX_PENDING", 1000))
+MAX_BODY_BYTES = 1024 * 1024
+
+_db_executor = ThreadPoolExecutor(max_workers=ASYNC_DB_WORKERS, thread_name_prefix="async-db")
+_pending = 0
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def run_db(func, *args):
+    """Run a blocking database function on the bounded executor."""
+    global _pending
+    if _pending >= ASYNC_MAX_PENDING:
+        raise HTTPError(503, "Server busy, try again")
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_db_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+def _session_user(scope):
+    """user_id from the Flask session cookie, or None."""
+    cookie_name = flask_app.config["SESSION_COOKIE_NAME"]
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookie = SimpleCookie(value.decode("latin-1")).get(cookie_name)
+            if cookie is None:
+                continue
+            serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+            try:
+                max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+                return serializer.loads(cookie.value, max_age=max_age).get("user_id")
+            except Exception:
+                return None
+    return None
+
+
+def _date_range(query, default_end):
+    start_date = query.get("start_date") or "2026-01-01"
+    end_date = query.get("end_date") or default_end
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+        datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPError(400, "Invalid date format. Use YYYY-MM-DD.")
+    return start_date, end_date
+
+
+# ---- handlers: (user_id, match, query, body) -> (status, payload) ----
+async def weekly(user_id, match, query, body):
+    try:
+        week_start_date = datetime.strptime(match.group(1), '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPError(400, 'Invalid week_start format. Use YYYY-MM-DD')
+    timesheet = await run_db(get_weekly_timesheet, user_id, week_start_date)
+    return 200, {'timesheet': timesheet}
+
+
+async def add_entry(user_id, match, query, body):
+    task, hours, date_str = body.get('task'), body.get('hours'), body.get('date')
+    if not all([task, hours, date_str]):
+        raise HTTPError(400, 'Missing required fields: task, hours, date')
+    try:
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPError(400, 'Invalid date format. Use YYYY-MM-DD')
+    week_start = date - timedelta(days=date.weekday())
+    try:
+        await run_db(insert_timesheet_entry, user_id, task, hours, date, week_start)
+    except IngestBusy:
+        # Queue full, or IngestTimeout: the row was withdrawn before it was written
+        raise HTTPError(503, "Server busy, try again")
+    return 201, {'message': 'Timesheet entry added successfully'}
+
+
+async def add_batch(user_id, match, query, body):
+    raw_entries = body.get('entries')
+    if not isinstance(raw_entries, list) or not raw_entries:
+        raise HTTPError(400, 'entries must be a non-empty list')
+    if len(raw_entries) > MAX_BATCH_ENTRIES:
+        raise HTTPError(400, f'At most {MAX_BATCH_ENTRIES} entries per batch')
+    atomic = body.get('atomic', True)
+    if not isinstance(atomic, bool):
+        raise HTTPError(400, 'atomic must be true or false')
+    results, valid = [], []
+    for index, raw in enumerate(raw_entries):
+        entry, error = validate_main_entry(raw)
+        results.append({'index': index, 'ok': not error, **({'error': error} if error else {})})
+        if entry:
+            valid.append(entry)
+    if len(valid) < len(raw_entries) and atomic:
+        for result in results:
+            if result['ok']:
+                result.update(ok=False, error='Not inserted: batch contains invalid entries')
+        return 400, {'inserted': 0, 'results': results}
+    if valid:
+        await run_db(insert_main_entries, user_id, valid)
+    return 201, {'inserted': len(valid), 'results': results}
+
+
+async def daily_hours(user_id, match, query, body):
+    start_date, end_date = _date_range(query, "2026-01-05")
+    bucket = (query.get("bucket") or "auto").lower()
+    if bucket != "auto" and bucket not in SERIES_BUCKETS:
+        raise HTTPError(400, "Invalid bucket. Use day, week, month or auto.")
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    _, points = await run_db(get_hours_series, user_id, start, end, bucket)
+    return 200, points
+
+
+async def summary(user_id, match, query, body):
+    start_date, end_date = _date_range(query, "2026-01-30")
+    return 200, await run_db(get_analysis_summary, user_id, start_date, end_date)
+
+
+ROUTES = [
+    ("GET", re.compile(r"^/async/api/timesheet/weekly/([^/]+)$"), weekly),
+    ("POST", re.compile(r"^/async/api/timesheet/add$"), add_entry),
+    ("POST", re.compile(r"^/async/api/timesheet/batch$"), add_batch),
+    ("GET", re.compile(r"^/async/analysis/data$"), daily_hours),
+    ("GET", re.compile(r"^/async/analysis/summary$"), summary),
+]
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status, payload):
+    body = dumps(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                _db_executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    try:
+        for method, pattern, handler in ROUTES:
+            match = pattern.match(scope["path"])
+            if match:
+                break
+        else:
+            raise HTTPError(404, "Not found")
+        if scope["method"] != method:
+            raise HTTPError(405, "Method not allowed")
+
+        user_id = _session_user(scope)
+        if not user_id:
+            raise HTTPError(401, "User not logged in")
+
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        body = {}
+        if method == "POST":
+            raw = await _read_body(receive)
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                raise HTTPError(400, "Invalid JSON body")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "JSON body must be an object")
+
+        status, payload = await handler(user_id, match, query, body)
+    except HTTPError as e:
+        status, payload = e.status, {"error": e.message}
+    except Exception as e:
+        print("Async API error:", e)
+        status, payload = 500, {"error": "Internal server error"}
+    await _send_json(send, status, payload)
@@ -0,0 +1,30 @@
+# auth.py
+# Small helpers shared by blueprints that need to know who is allowed to see what.
+# The UserDetail table has no role column, so administrators are configured through
+# the TIMESHEET_ADMINS environment variable as a comma-separated list of user ids.
+
+import os
+from functools import wraps
+from flask import session, jsonify
+
+ADMIN_USER_IDS = {
+    int(x) for x in os.environ.get("TIMESHEET_ADMINS", "").split(",") if x.strip().isdigit()
+}
+
+
+def is_admin(user_id):
+    """Return True if the given user id is configured as an administrator."""
+    return user_id is not None and int(user_id) in ADMIN_USER_IDS
+
+
+def admin_required(view):
+    """Decorator for JSON/admin endpoints: 401 when logged out, 403 for non-admins."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get("user_id")
+        if not user_id:
+            return jsonify({"error": "User not logged in"}), 401
+        if not is_admin(user_id):
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
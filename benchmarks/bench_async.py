@@ -0,0 +1,192 @@
+# benchmarks/bench_async.py
+# Compare the sync Flask JSON views against the async variants in async_api.py.
+# Every SQL statement is delayed by --latency-ms to stand in for the ODBC round trip to
+# SQL Server (SQLite answers in microseconds, which would hide the blocking entirely).
+#
+#   sync:  requests go through a pool of --sync-workers threads, like a WSGI worker with
+#          that many threads; latency is measured from submission, so queueing counts.
+#   async: requests are driven straight into the ASGI app on one event loop; DB calls run
+#          on its bounded executor (TIMESHEET_ASYNC_DB_WORKERS, default = pool size).
+#
+# Both sides keep --concurrency requests in flight and report throughput and p50/p95/p99.
+# Usage: python -m benchmarks.bench_async [--requests 400] [--concurrency 64] [--latency-ms 20]
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import db
+from benchmarks.common import make_app, percentile, temp_db_path
+from benchmarks.datagen import populate, END_DATE
+
+ENDPOINTS = {
+    "weekly": lambda rng: (
+        "/api/timesheet/weekly/%s"
+        % (END_DATE - timedelta(days=END_DATE.weekday() + 7 * rng.randint(0, 20))).isoformat(), ""),
+    "analysis_data": lambda rng: ("/analysis/data", _range_query(rng)),
+    "analysis_summary": lambda rng: ("/analysis/summary", _range_query(rng)),
+}
+
+
+def _range_query(rng):
+    end = END_DATE - timedelta(days=rng.randint(0, 60))
+    start = end - timedelta(days=rng.randint(7, 60))
+    return "start_date=%s&end_date=%s" % (start.isoformat(), end.isoformat())
+
+
+class _SlowCursor:
+    def __init__(self, cursor, latency):
+        self._cursor = cursor
+        self._latency = latency
+
+    def execute(self, *args):
+        time.sleep(self._latency)
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        time.sleep(self._latency)
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _SlowConnection:
+    def __init__(self, conn, latency):
+        self.raw = conn
+        self._latency = latency
+
+    def cursor(self):
+        return _SlowCursor(self.raw.cursor(), self._latency)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def slow_connect(path, latency):
+    """connect() factory for the SQLite stand-in that adds `latency` seconds to every statement."""
+    connect = db.sqlite_connect(path)
+    return lambda: _SlowConnection(connect(), latency)
+
+
+def session_cookie(app, user_id):
+    serializer = app.session_interface.get_signing_serializer(app)
+    value = serializer.dumps({"user_id": user_id, "username": "user%d" % user_id})
+    return "%s=%s" % (app.config["SESSION_COOKIE_NAME"], value)
+
+
+def summarize(latencies, errors, wall, concurrency):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def _drive(requests, concurrency, issue):
+    """Keep `concurrency` calls of issue(i) in flight until `requests` are done."""
+    latencies = []
+    errors = [0]
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            started = time.perf_counter()
+            status = await issue(i)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors[0] += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors[0], time.perf_counter() - wall_start
+
+
+def run_sync(app, plan, concurrency, workers):
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def call(i):
+        path, query, cookie = plan[i]
+        client = app.test_client(use_cookies=False)
+        return client.get(path, query_string=query, headers={"Cookie": cookie}).status_code
+
+    async def issue(i):
+        return await asyncio.get_running_loop().run_in_executor(executor, call, i)
+
+    try:
+        latencies, errors, wall = asyncio.run(_drive(len(plan), concurrency, issue))
+    finally:
+        executor.shutdown()
+    return summarize(latencies, errors, wall, concurrency)
+
+
+def run_async(asgi_app, plan, concurrency):
+    async def issue(i):
+        path, query, cookie = plan[i]
+        scope = {
+            "type": "http", "method": "GET", "path": "/async" + path,
+            "query_string": query.encode(), "headers": [(b"cookie", cookie.encode())],
+        }
+        status = [0]
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+        await asgi_app(scope, receive, send)
+        return status[0]
+
+    latencies, errors, wall = asyncio.run(_drive(len(plan), concurrency, issue))
+    return summarize(latencies, errors, wall, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=130)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint and mode")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests kept in flight")
+    parser.add_argument("--sync-workers", type=int, default=8, help="threads serving the sync views")
+    parser.add_argument("--pool-size", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated latency per SQL statement")
+    args = parser.parse_args()
+
+    path = temp_db_path()
+    print("Generating synthetic data in %s ..." % path)
+    print(populate(path, args.users, args.days))
+
+    app = make_app(path, max_size=args.pool_size)
+    db.configure_pool(slow_connect(path, args.latency_ms / 1000.0), max_size=args.pool_size)
+    import async_api
+
+    rng = random.Random(1)
+    cookies = {u: session_cookie(app, u) for u in range(1, args.users + 1)}
+    print("latency/statement %.1f ms, pool %d, sync workers %d, async DB workers %d"
+          % (args.latency_ms, args.pool_size, args.sync_workers, async_api.ASYNC_DB_WORKERS))
+    print("%-17s %-6s %9s %8s %9s %9s %7s" % ("endpoint", "mode", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors"))
+    for name in (n.strip() for n in args.endpoints.split(",") if n.strip()):
+        if name not in ENDPOINTS:
+            parser.error("unknown endpoint %r" % name)
+        plan = [ENDPOINTS[name](rng) + (cookies[rng.randint(1, args.users)],) for _ in range(args.requests)]
+        for mode, result in (
+            ("sync", run_sync(app, plan, args.concurrency, args.sync_workers)),
+            ("async", run_async(async_api.app, plan, args.concurrency)),
+        ):
+            print("%-17s %-6s %9.1f %8.2f %9.2f %9.2f %7d" % (
+                name, mode, result["throughput_rps"], result["p50_ms"], result["p95_ms"], result["p99_ms"],
+                result["errors"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_batch_insert.py
+# Compare inserting a batch of timesheet entries through /add_task (one request,
+# connection checkout and commit per row) against one /api/timesheet/batch request.
+# Usage: python -m benchmarks.bench_batch_insert [--entries 35] [--rounds 20]
+
+import argparse
+from datetime import date, timedelta
+
+from benchmarks.common import temp_db_path, create_schema, seed_reference_data, make_app, login_client, Timer
+
+
+def make_entries(count):
+    start = date(2026, 1, 5)
+    return [
+        {
+            "date": (start + timedelta(days=i % 7)).isoformat(),
+            "project_id": 1 + i % 5,
+            "task_id": 1 + (i % 5) * 4,
+            "activity": "Development",
+            "hours": 1.5,
+            "overtime": 0,
+            "description": "Synthetic entry %d" % i,
+        }
+        for i in range(count)
+    ]
+
+
+def run(entries, rounds):
+    path = temp_db_path()
+    create_schema(path)
+    seed_reference_data(path)
+    app = make_app(path)
+    client = login_client(app, 1)
+    payload = make_entries(entries)
+
+    with Timer() as single:
+        for _ in range(rounds):
+            for entry in payload:
+                client.post("/add_task", data=entry)
+
+    with Timer() as batch:
+        for _ in range(rounds):
+            response = client.post("/api/timesheet/batch", json={"entries": payload})
+            assert response.status_code == 201, response.get_json()
+
+    total = entries * rounds
+    print("entries per request batch: %d, rounds: %d" % (entries, rounds))
+    print("single-row /add_task      : %8.0f rows/s  (%.3fs)" % (total / single.elapsed, single.elapsed))
+    print("batch /api/timesheet/batch: %8.0f rows/s  (%.3fs)" % (total / batch.elapsed, batch.elapsed))
+    print("speedup                   : %8.1fx" % (single.elapsed / batch.elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=35)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    run(args.entries, args.rounds)
@@ -0,0 +1,69 @@
+# benchmarks/bench_import.py
+# CSV bulk import through /import/timesheet: rows per second and peak Python memory
+# (tracemalloc) for growing files, to show that memory stays flat as the file grows.
+# A share of rows is deliberately invalid (--bad-every) so per-row error reporting is
+# exercised too. The file is sent as a streamed text/csv body.
+# Usage: python -m benchmarks.bench_import [--rows 20000 100000] [--bad-every 500]
+
+import argparse
+import logging
+import os
+import random
+import tracemalloc
+
+from benchmarks.common import create_schema, seed_reference_data, make_app, login_client, temp_db_path, Timer
+
+
+def write_csv(path, rows, bad_every, seed=7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("date,project,task,activity,hours,overtime,description\n")
+        for i in range(rows):
+            p = rng.randint(1, 5)
+            task = "Task %d.%d" % (p, rng.randint(1, 4))
+            hours = "%.2f" % rng.uniform(0.5, 8)
+            if bad_every and i % bad_every == bad_every - 1:
+                hours = "lots"
+            f.write("2025-%02d-%02d,Project %d,%s,Development,%s,,\"Imported row %d, from the old sheet\"\n" % (
+                1 + i % 12, 1 + i % 28, p, task, hours, i))
+    return os.path.getsize(path)
+
+
+def run(rows, bad_every):
+    path = temp_db_path()
+    create_schema(path)
+    seed_reference_data(path)
+    app = make_app(path)
+    client = login_client(app, 1)
+    csv_path = os.path.join(os.path.dirname(path), "import.csv")
+    size = write_csv(csv_path, rows, bad_every)
+
+    with open(csv_path, "rb") as f:
+        tracemalloc.start()
+        with Timer() as t:
+            response = client.post("/import/timesheet", input_stream=f, content_type="text/csv",
+                                   headers={"Content-Length": str(size)})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    summary = response.get_json()
+    assert response.status_code == 200, summary
+    assert summary["inserted"] + summary["failed"] == rows, summary
+    return size, t.elapsed, peak, summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--bad-every", type=int, default=500, help="make every Nth row invalid (0 = none)")
+    args = parser.parse_args()
+    logging.getLogger("timesheet.slow").setLevel(logging.ERROR)
+
+    print("%10s %10s %10s %10s %10s %12s" % ("rows", "file MB", "inserted", "failed", "rows/s", "peak MB"))
+    for rows in args.rows:
+        size, elapsed, peak, summary = run(rows, args.bad_every)
+        print("%10d %10.1f %10d %10d %10.0f %12.1f" % (
+            rows, size / 1e6, summary["inserted"], summary["failed"], rows / elapsed, peak / 1e6))
+
+
+if __name__ == "__main__":
+    main()
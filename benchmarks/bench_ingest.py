@@ -0,0 +1,101 @@
+# benchmarks/bench_ingest.py
+# Deadline burst: --concurrency users each submitting entries through /add_task at once,
+# with the normal per-request commit and with ingest mode (group commits, see ingest.py).
+# Every SQL statement is delayed by --latency-ms and every commit by --commit-ms to stand
+# in for the round trip and log flush on SQL Server.
+# SQLite allows one writer at a time, so the per-request mode queues on the database lock
+# here; on SQL Server those requests would overlap more, but each still pays its own commit.
+# Usage: python -m benchmarks.bench_ingest [--users 200] [--entries 10] [--concurrency 64]
+#                                          [--latency-ms 1] [--commit-ms 5] [--batch 200] [--delay-ms 20]
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import ingest
+from benchmarks.bench_async import _SlowConnection
+from benchmarks.common import create_schema, seed_reference_data, make_app, login_client, percentile, temp_db_path
+
+
+class _SlowCommitConnection(_SlowConnection):
+    def __init__(self, conn, latency, commit_latency):
+        super().__init__(conn, latency)
+        self._commit_latency = commit_latency
+
+    def commit(self):
+        time.sleep(self._commit_latency)
+        return self.raw.commit()
+
+
+def entry_form(user_id, i):
+    return {
+        "date": "2026-01-%02d" % (5 + i % 5),
+        "project_id": 1 + (user_id + i) % 5,
+        "task_id": 1 + ((user_id + i) % 5) * 4,
+        "activity": "Development",
+        "hours": "1.5",
+        "overtime": "",
+        "description": "Deadline entry %d for user %d" % (i, user_id),
+    }
+
+
+def run(args, enabled):
+    path = temp_db_path()
+    create_schema(path)
+    seed_reference_data(path, users=args.users)
+    app = make_app(path, max_size=args.pool_size)
+    connect = db.sqlite_connect(path)
+    db.configure_pool(lambda: _SlowCommitConnection(connect(), args.latency_ms / 1000.0, args.commit_ms / 1000.0),
+                      max_size=args.pool_size)
+    ingest.configure(enabled=enabled, batch=args.batch, delay_ms=args.delay_ms)
+
+    clients = {u: login_client(app, u) for u in range(1, args.users + 1)}
+    jobs = [(u, i) for i in range(args.entries) for u in range(1, args.users + 1)]
+
+    def submit(job):
+        user_id, i = job
+        started = time.perf_counter()
+        response = clients[user_id].post("/add_task", data=entry_form(user_id, i))
+        assert response.status_code == 302, response.status_code
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(submit, jobs))
+    elapsed = time.perf_counter() - started
+
+    conn = connect()
+    stored = conn.cursor().execute("SELECT COUNT(*) FROM TimesheetMain").fetchone()[0]
+    rollup = conn.cursor().execute("SELECT SUM(entries) FROM TimesheetDailyRollup").fetchone()[0]
+    indexed = conn.cursor().execute("SELECT COUNT(DISTINCT entry_id) FROM TimesheetSearchTokens").fetchone()[0]
+    conn.close()
+    assert stored == rollup == indexed == len(jobs), (stored, rollup, indexed, len(jobs))
+    return len(jobs) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=10, help="entries per user")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="simulated latency per SQL statement")
+    parser.add_argument("--commit-ms", type=float, default=5.0, help="simulated latency per commit")
+    parser.add_argument("--batch", type=int, default=200, help="ingest mode: rows per group commit")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="ingest mode: latency budget per batch")
+    args = parser.parse_args()
+    logging.getLogger("timesheet.slow").setLevel(logging.ERROR)
+
+    print("%d inserts, %d in flight" % (args.users * args.entries, args.concurrency))
+    print("%-18s %12s %10s %10s" % ("mode", "inserts/s", "p50", "p95"))
+    for name, enabled in (("per-request commit", False), ("group commit", True)):
+        rate, latencies = run(args, enabled)
+        print("%-18s %12.0f %7.1f ms %7.1f ms" % (
+            name, rate, percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000))
+    print("ingest stats:", ingest.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_login.py
+# Concurrent-login benchmark: many clients POST /login at once, as in the morning spike,
+# while other clients keep requesting a cheap page (/getProjectTree) to show whether
+# password hashing starves the rest of the worker.
+# Runs twice: hashing inline on the request threads, then in the passwords.py process
+# pool. Reports login throughput, p50/p95/p99, shed (503) logins and the latency of the
+# background requests. Stored hashes use --stored-rounds so the first login of each user
+# also exercises the transparent rehash to --rounds.
+# Usage: python -m benchmarks.bench_login [--users 40] [--logins 200] [--concurrency 32]
+
+import argparse
+import logging
+import threading
+import time
+
+import passwords
+from benchmarks.common import temp_db_path, create_schema, seed_reference_data, make_app, login_client, percentile
+
+
+def create_users(path, users, rounds):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT OR REPLACE INTO UserDetail (id, Fname, Lname, Username, ContactNo, Password, Email) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, "User", str(i), "login%d" % i, "0000000000", passwords._hash("password%d" % i, rounds), "login%d@example.com" % i)
+         for i in range(1, users + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def stored_costs(path):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    costs = [passwords.hash_cost(row[0]) for row in conn.execute("SELECT Password FROM UserDetail WHERE Username LIKE 'login%'")]
+    conn.close()
+    return sorted(set(costs))
+
+
+def run(app, users, logins, concurrency, background):
+    latencies, statuses, other = [], [], []
+    lock = threading.Lock()
+    remaining = [logins]
+    done = threading.Event()
+
+    def login_worker(worker_id):
+        i = worker_id
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            user = i % users + 1
+            i += concurrency
+            client = app.test_client()
+            started = time.perf_counter()
+            response = client.post("/login", data={"Username": "login%d" % user, "Password": "password%d" % user})
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+
+    def background_worker():
+        client = login_client(app, 1)
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get("/getProjectTree")
+            with lock:
+                other.append(time.perf_counter() - started)
+
+    extra = [threading.Thread(target=background_worker) for _ in range(background)]
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(concurrency)]
+    for t in extra:
+        t.start()
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    done.set()
+    for t in extra:
+        t.join()
+
+    ok = statuses.count(302)
+    return {
+        "logins_per_s": ok / wall if wall else 0.0,
+        "ok": ok,
+        "shed": statuses.count(503),
+        "failed": len(statuses) - ok - statuses.count(503),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "other_p99_ms": percentile(other, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--background", type=int, default=2, help="threads requesting a cheap page meanwhile")
+    parser.add_argument("--rounds", type=int, default=passwords.BCRYPT_ROUNDS, help="current bcrypt cost")
+    parser.add_argument("--stored-rounds", type=int, default=passwords.BCRYPT_ROUNDS - 1, help="cost of the seeded hashes")
+    parser.add_argument("--workers", type=int, default=passwords.HASH_WORKERS, help="hash processes for the pool run")
+    parser.add_argument("--queue", type=int, default=0, help="hash queue limit for the pool run (default 4 per process)")
+    args = parser.parse_args()
+
+    # Every login is a "slow request" here; keep the slow-request log quiet
+    logging.getLogger("timesheet.slow").setLevel(logging.ERROR)
+
+    path = temp_db_path()
+    create_schema(path)
+    seed_reference_data(path)
+    app = make_app(path, max_size=args.concurrency + args.background)
+
+    print("%-7s %9s %8s %9s %9s %6s %7s %14s" % (
+        "mode", "logins/s", "p50 ms", "p95 ms", "p99 ms", "shed", "failed", "other p99 ms"))
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        create_users(path, args.users, args.stored_rounds)
+        passwords.configure(workers=workers, queue_limit=args.queue or max(workers, 1) * 4, rounds=args.rounds)
+        passwords.warm_up_pool()
+        r = run(app, args.users, args.logins, args.concurrency, args.background)
+        print("%-7s %9.1f %8.1f %9.1f %9.1f %6d %7d %14.1f" % (
+            mode, r["logins_per_s"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["shed"], r["failed"], r["other_p99_ms"]))
+        print("        stored costs after run: %s" % stored_costs(path))
+    passwords.configure(workers=0)
+
+
+if __name__ == "__main__":
+    main()
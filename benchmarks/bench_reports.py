@@ -0,0 +1,95 @@
+# benchmarks/bench_reports.py
+# Org-wide utilization report: reports_api's bulk, numpy-backed aggregation (in-process
+# and on the report process pool) against the equivalent loop of one SQL query per user
+# aggregated in Python. Checks that all variants agree on the totals.
+# SQLite answers each per-user query without a network round trip, so on SQL Server the
+# per-user loop is slower still than shown here.
+# Usage: python -m benchmarks.bench_reports [--users 500] [--days 130] [--range-days 120] [--workers 4]
+
+import argparse
+import os
+from datetime import timedelta
+
+import reports_api
+from analysis_api import _as_date
+from benchmarks.common import make_app, temp_db_path, Timer
+from benchmarks.datagen import populate, END_DATE
+from db import get_connection
+
+
+def per_user_loop(start_date, end_date):
+    """The same breakdowns built from one grouped query per user."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT Id FROM UserDetail ORDER BY Id")
+    user_ids = [row[0] for row in cursor.fetchall()]
+    by_user, by_project, by_task, by_week = {}, {}, {}, {}
+    for user_id in user_ids:
+        cursor.execute(
+            "SELECT project_id, task_id, Tdate, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*) "
+            "FROM TimesheetMain WHERE user_id = ? AND Tdate >= ? AND Tdate <= ? "
+            "GROUP BY project_id, task_id, Tdate",
+            (user_id, start_date, end_date),
+        )
+        for project_id, task_id, Tdate, hours, overtime, entries in cursor.fetchall():
+            Tdate = _as_date(Tdate)
+            week = Tdate - timedelta(days=Tdate.weekday())
+            for table, key in ((by_user, user_id), (by_project, project_id),
+                               (by_task, (project_id, task_id)), (by_week, week)):
+                totals = table.setdefault(key, [0.0, 0.0, 0])
+                totals[0] += float(hours)
+                totals[1] += float(overtime)
+                totals[2] += entries
+    conn.close()
+    hours = sum(t[0] for t in by_user.values())
+    overtime = sum(t[1] for t in by_user.values())
+    entries = sum(t[2] for t in by_user.values())
+    return {"hours": round(hours, 2), "overtime": round(overtime, 2), "entries": entries,
+            "queries": len(user_ids) + 1}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--days", type=int, default=130, help="working days of history per user")
+    parser.add_argument("--range-days", type=int, default=120, help="report range, ending at the newest data")
+    parser.add_argument("--workers", type=int, default=max(os.cpu_count() or 1, 2), help="report processes")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    path = temp_db_path()
+    print("Generating synthetic data in %s ..." % path)
+    print(populate(path, args.users, args.days, search_index=False))
+    make_app(path)
+    # Report worker processes open their own pool from the environment
+    os.environ["TIMESHEET_SQLITE_PATH"] = path
+
+    end = END_DATE
+    start = end - timedelta(days=args.range_days - 1)
+    print("range %s .. %s, %d users" % (start, end, args.users))
+
+    def engine(workers):
+        def run():
+            reports_api.REPORT_WORKERS = workers
+            totals = reports_api.build_utilization_report(start, end)["totals"]
+            return {k: totals[k] for k in ("hours", "overtime", "entries")}
+        return run
+
+    variants = [
+        ("per-user SQL loop", lambda: per_user_loop(start.isoformat(), end.isoformat())),
+        ("bulk, in-process", engine(1)),
+        ("bulk, %d processes" % args.workers, engine(args.workers)),
+    ]
+    engine(args.workers)()  # start the report processes before timing
+    print("%-22s %10s   %s" % ("variant", "best s", "totals"))
+    for name, run in variants:
+        best = None
+        for _ in range(args.rounds):
+            with Timer() as t:
+                result = run()
+            best = t.elapsed if best is None else min(best, t.elapsed)
+        print("%-22s %10.3f   %s" % (name, best, result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# benchmarks/bench_routes.py
+# Synthetic-load benchmark for every hot route.
+# Generates (or reuses) a SQLite stand-in database with benchmarks.datagen, then drives
+# each route with concurrent clients, each acting as a random synthetic user, and reports
+# throughput and p50/p95/p99 latency per route. Results are written as JSON so runs can
+# be compared with --compare.
+#
+# Usage:
+#     python -m benchmarks.bench_routes                         # small default dataset
+#     python -m benchmarks.bench_routes --users 10000 --days 1000 --db big.db   # ~10M entries
+#     python -m benchmarks.bench_routes --db big.db --reuse --routes home,search_tasks
+#     python -m benchmarks.bench_routes --compare results/old.json
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import make_app, login_client, percentile, temp_db_path
+from benchmarks.datagen import populate, END_DATE, ACTIVITIES, WORDS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _random_range(rng, max_days=60):
+    end = END_DATE - timedelta(days=rng.randint(0, 120))
+    start = end - timedelta(days=rng.randint(7, max_days))
+    return start.isoformat(), end.isoformat()
+
+
+def _random_entry(rng, ctx):
+    project_id = rng.randint(1, ctx["projects"])
+    return {
+        "date": (END_DATE - timedelta(days=rng.randint(0, 30))).isoformat(),
+        "project_id": project_id,
+        "task_id": (project_id - 1) * ctx["tasks_per_project"] + rng.randint(1, ctx["tasks_per_project"]),
+        "activity": rng.choice(ACTIVITIES),
+        "hours": rng.choice((1, 2, 4)),
+        "overtime": "",
+        "description": " ".join(rng.choice(WORDS) for _ in range(6)),
+    }
+
+
+# Route name -> callable(client, rng, ctx) issuing one request and returning the response
+ROUTES = {
+    "home": lambda c, rng, ctx: c.get("/home"),
+    "search_tasks": lambda c, rng, ctx: c.post(
+        "/search_tasks", json={"search_term": rng.choice(WORDS + ACTIVITIES), "column": ""}),
+    "analysis": lambda c, rng, ctx: c.get(
+        "/analysis?start_date=%s&end_date=%s" % _random_range(rng)),
+    "analysis_data": lambda c, rng, ctx: c.get(
+        "/analysis/data?start_date=%s&end_date=%s" % _random_range(rng)),
+    "weekly": lambda c, rng, ctx: c.get(
+        "/api/timesheet/weekly/%s" % (END_DATE - timedelta(days=END_DATE.weekday() + 7 * rng.randint(0, 20))).isoformat()),
+    "add_task": lambda c, rng, ctx: c.post("/add_task", data=_random_entry(rng, ctx)),
+    "api_add": lambda c, rng, ctx: c.post("/api/timesheet/add", json={
+        "task": rng.choice(ACTIVITIES), "hours": 2, "date": END_DATE.isoformat()}),
+    "api_batch": lambda c, rng, ctx: c.post(
+        "/api/timesheet/batch", json={"entries": [_random_entry(rng, ctx) for _ in range(35)]}),
+}
+
+
+def drive_route(app, name, requests, concurrency, ctx, seed=0):
+    """Issue `requests` requests to one route from `concurrency` threads. Returns a stats dict."""
+    call = ROUTES[name]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        clients = {}
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            user_id = rng.randint(1, ctx["users"])
+            client = clients.get(user_id)
+            if client is None:
+                client = clients[user_id] = login_client(app, user_id)
+            started = time.perf_counter()
+            try:
+                response = call(client, rng, ctx)
+                ok = response.status_code < 400
+                status = response.status_code
+            except Exception as e:
+                ok = False
+                status = repr(e)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": [str(e) for e in errors[:5]],
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_table(results, baseline=None):
+    header = "%-15s %9s %8s %9s %9s %9s %7s" % ("route", "req/s", "p50 ms", "p95 ms", "p99 ms", "max ms", "errors")
+    if baseline:
+        header += "   p95 vs baseline"
+    print(header)
+    for name, r in results.items():
+        line = "%-15s %9.1f %8.2f %9.2f %9.2f %9.2f %7d" % (
+            name, r["throughput_rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["max_ms"], r["errors"])
+        old = (baseline or {}).get(name)
+        if old and old["p95_ms"]:
+            line += "   %+.1f%%" % ((r["p95_ms"] - old["p95_ms"]) * 100.0 / old["p95_ms"])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="SQLite file to use (default: a fresh temporary file)")
+    parser.add_argument("--reuse", action="store_true", help="use --db as is instead of regenerating it")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=130)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--tasks-per-project", type=int, default=8)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated subset of: %s" % ", ".join(ROUTES))
+    parser.add_argument("--requests", type=int, default=300, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/routes-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare p95 against")
+    args = parser.parse_args()
+
+    path = args.db or temp_db_path()
+    dataset = {"path": path}
+    if args.reuse:
+        if not os.path.exists(path):
+            parser.error("--reuse needs an existing --db file")
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        print("Generating synthetic data in %s ..." % path)
+        dataset.update(populate(path, args.users, args.days, args.projects, args.tasks_per_project))
+        print(dataset)
+
+    ctx = {"users": args.users, "projects": args.projects, "tasks_per_project": args.tasks_per_project}
+    app = make_app(path, max_size=args.pool_size)
+
+    results = {}
+    for i, name in enumerate(n.strip() for n in args.routes.split(",") if n.strip()):
+        if name not in ROUTES:
+            parser.error("unknown route %r" % name)
+        results[name] = drive_route(app, name, args.requests, args.concurrency, ctx, seed=i)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["routes"]
+    print_table(results, baseline)
+
+    out = args.out or os.path.join(RESULTS_DIR, "routes-%s.json" % time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "dataset": dataset,
+            "settings": {"requests": args.requests, "concurrency": args.concurrency, "pool_size": args.pool_size},
+            "routes": results,
+        }, f, indent=2)
+    print("Results written to %s" % out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_serialize.py
+# Row -> JSON cost of a large response: the old path (dict(zip(columns, row)) per row,
+# then Flask's default jsonify) against serialize.rows_to_dicts + the fast provider.
+# Rows mimic pyodbc results for the dashboard query (Decimal hours, date Tdate), and
+# the cursor reports column types the way pyodbc does.
+# Usage: python -m benchmarks.bench_serialize [--rows 20000] [--rounds 5]
+
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialize
+from benchmarks.common import Timer
+
+QUERY = "SELECT m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description, m.Tdate ..."
+
+
+class FakeCursor:
+    description = [
+        ("id", int, None, 10, 10, 0, False),
+        ("Project_Name", str, None, 255, 255, 0, False),
+        ("Task", str, None, 255, 255, 0, False),
+        ("activity", str, None, 255, 255, 0, True),
+        ("hours", Decimal, None, 5, 5, 2, False),
+        ("overtime", Decimal, None, 5, 5, 2, True),
+        ("description", str, None, 1000, 1000, 0, True),
+        ("Tdate", date, None, 10, 10, 0, False),
+    ]
+
+
+def make_rows(count):
+    start = date(2026, 1, 1)
+    return [
+        (i, "Project %d" % (i % 50), "Task %d" % (i % 8), "Development", Decimal("7.50"),
+         Decimal("1.00") if i % 5 == 0 else None, "synthetic description for entry %d" % i,
+         start + timedelta(days=i % 180))
+        for i in range(count)
+    ]
+
+
+def old_path(app, cursor, rows):
+    columns = [col[0] for col in cursor.description]
+    data = [dict(zip(columns, row)) for row in rows]
+    with app.app_context():
+        return app.response_class(DefaultJSONProvider(app).dumps({"results": data}), mimetype="application/json").get_data()
+
+
+def new_path(app, cursor, rows):
+    data = serialize.rows_to_dicts(cursor, rows, QUERY)
+    with app.app_context():
+        return app.json.response({"results": data}).get_data()
+
+
+def measure(func, *args, rounds):
+    best = None
+    for _ in range(rounds):
+        with Timer() as t:
+            body = func(*args)
+        best = t.elapsed if best is None else min(best, t.elapsed)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = serialize.FastJSONProvider(app)
+    cursor = FakeCursor()
+    rows = make_rows(args.rows)
+
+    print("encoder: %s, %d rows" % ("orjson" if serialize.orjson else "json (orjson not installed)", args.rows))
+    print("%-8s %10s %12s %11s" % ("path", "best ms", "peak alloc", "bytes"))
+    results = {}
+    for name, func in (("old", old_path), ("new", new_path)):
+        seconds, peak, size = measure(func, app, cursor, rows, rounds=args.rounds)
+        results[name] = seconds
+        print("%-8s %10.1f %10.1f MB %11d" % (name, seconds * 1000, peak / 1e6, size))
+    print("speed-up: %.1fx" % (results["old"] / results["new"]))
+
+
+if __name__ == "__main__":
+    main()
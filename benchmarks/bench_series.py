@@ -0,0 +1,56 @@
+# benchmarks/bench_series.py
+# /analysis/data for growing ranges: one point per day (bucket=day) against server-side
+# bucketing (bucket=auto), with a cold and a warm closed-period cache.
+# Reports points and bytes per response and the median request time.
+# Usage: python -m benchmarks.bench_series [--users 20] [--days 2600] [--requests 30]
+
+import argparse
+import logging
+import time
+from datetime import timedelta
+
+import hours_series
+from benchmarks.common import make_app, login_client, percentile, temp_db_path
+from benchmarks.datagen import populate, END_DATE
+
+RANGES = (("1 month", 30), ("1 year", 365), ("3 years", 3 * 365), ("10 years", 3650))
+
+
+def measure(client, query, requests, cold):
+    times = []
+    for _ in range(requests):
+        if cold:
+            hours_series._series_cache.invalidate()
+        started = time.perf_counter()
+        response = client.get("/analysis/data?" + query)
+        times.append(time.perf_counter() - started)
+    return response, percentile(times, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--days", type=int, default=2600, help="working days of history per user")
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+    logging.getLogger("timesheet.slow").setLevel(logging.ERROR)
+
+    path = temp_db_path()
+    print("Generating synthetic data in %s ..." % path)
+    print(populate(path, args.users, args.days, search_index=False))
+    client = login_client(make_app(path), 1)
+
+    print("%-9s %-6s %-6s %7s %9s %10s %10s" % ("range", "asked", "used", "points", "bytes", "cold p50", "warm p50"))
+    for name, days in RANGES:
+        start = END_DATE - timedelta(days=days - 1)
+        for bucket in ("day", "auto"):
+            query = "start_date=%s&end_date=%s&bucket=%s" % (start.isoformat(), END_DATE.isoformat(), bucket)
+            _, cold = measure(client, query, args.requests, True)
+            response, warm = measure(client, query, args.requests, False)
+            print("%-9s %-6s %-6s %7d %9d %7.2f ms %7.2f ms" % (
+                name, bucket, response.headers["X-Series-Bucket"], len(response.get_json()),
+                len(response.data), cold * 1000, warm * 1000))
+
+
+if __name__ == "__main__":
+    main()
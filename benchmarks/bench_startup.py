@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+# Cold-start benchmark: imports app.py in a fresh interpreter with `python -X importtime`
+# and reports the cumulative import time of each module, slowest first.
+# Use --budget-ms in CI so a new eager heavy import fails the run.
+# Usage: python -m benchmarks.bench_startup [--top 15] [--runs 3] [--budget-ms 800]
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay lazy; importing app.py should not pull them in.
+LAZY_MODULES = ("matplotlib", "pyodbc", "flask_bcrypt", "bcrypt", "numpy")
+
+
+def import_profile(module="app"):
+    """
+    Import `module` in a fresh interpreter.
+    Returns ({module_name: cumulative_microseconds}, [lazy modules that were imported]).
+    """
+    code = (
+        "import sys, %s\n"
+        "print(','.join(m for m in %r if m in sys.modules))" % (module, LAZY_MODULES)
+    )
+    env = dict(os.environ, TIMESHEET_WARMUP="")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        timings[name] = max(timings.get(name, 0), int(cumulative_us))
+    eager = [m for m in proc.stdout.strip().split(",") if m]
+    return timings, eager
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="exit non-zero when importing the module takes longer than this")
+    args = parser.parse_args()
+
+    runs = [import_profile(args.module) for _ in range(args.runs)]
+    # Best of N per module filters out disk-cache noise on the first run
+    best = {}
+    for timings, _ in runs:
+        for name, us in timings.items():
+            best[name] = min(best.get(name, us), us)
+
+    total_ms = best.get(args.module, 0) / 1000.0
+    print("import %s: %.1f ms (best of %d)" % (args.module, total_ms, args.runs))
+    print("%-40s %10s" % ("module", "cumul ms"))
+    for name, us in sorted(best.items(), key=lambda item: -item[1])[:args.top]:
+        print("%-40s %10.1f" % (name, us / 1000.0))
+
+    failed = False
+    eager = runs[-1][1]
+    if eager:
+        print("FAIL: heavy modules imported eagerly: %s" % ", ".join(eager))
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print("FAIL: import time %.1f ms exceeds budget %.1f ms" % (total_ms, args.budget_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
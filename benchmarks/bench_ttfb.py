@@ -0,0 +1,63 @@
+# benchmarks/bench_ttfb.py
+# Time to first byte and total time of the /home dashboard for users with long histories.
+# Compares the page rendered in one piece against the streamed page, each with a cold and
+# a warm fragment cache. Every SQL statement can be delayed with --latency-ms to stand
+# in for the round trip to SQL Server.
+# Usage: python -m benchmarks.bench_ttfb [--users 5] [--days 1500] [--requests 50] [--latency-ms 5]
+
+import argparse
+import time
+
+import db
+import page_streaming
+from benchmarks.bench_async import slow_connect
+from benchmarks.common import make_app, login_client, percentile, temp_db_path
+from benchmarks.datagen import populate
+
+
+def measure(app, users, requests, cold):
+    ttfb, total = [], []
+    clients = [login_client(app, u) for u in range(1, users + 1)]
+    for i in range(requests):
+        if cold:
+            page_streaming._fragment_cache.invalidate()
+        client = clients[i % users]
+        started = time.perf_counter()
+        response = client.get("/home", buffered=False)
+        chunks = iter(response.response)
+        next(chunks)
+        ttfb.append(time.perf_counter() - started)
+        for _ in chunks:
+            pass
+        response.close()
+        total.append(time.perf_counter() - started)
+    return ttfb, total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--days", type=int, default=1500, help="working days of history per user")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated latency per SQL statement")
+    args = parser.parse_args()
+
+    path = temp_db_path()
+    print("Generating synthetic data in %s ..." % path)
+    print(populate(path, args.users, args.days))
+    app = make_app(path)
+    db.configure_pool(slow_connect(path, args.latency_ms / 1000.0))
+
+    print("%-9s %-6s %10s %10s %11s %11s" % ("mode", "cache", "ttfb p50", "ttfb p95", "total p50", "total p95"))
+    for streamed in (False, True):
+        page_streaming.STREAM_PAGES = streamed
+        for cold in (True, False):
+            ttfb, total = measure(app, args.users, args.requests, cold)
+            print("%-9s %-6s %8.2f ms %8.2f ms %9.2f ms %9.2f ms" % (
+                "streamed" if streamed else "buffered", "cold" if cold else "warm",
+                percentile(ttfb, 50) * 1000, percentile(ttfb, 95) * 1000,
+                percentile(total, 50) * 1000, percentile(total, 95) * 1000))
+
+
+if __name__ == "__main__":
+    main()
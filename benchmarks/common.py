@@ -0,0 +1,166 @@
+# benchmarks/common.py
+# Shared helpers for the benchmark scripts: a SQLite stand-in for the SQL Server schema,
+# a Flask app wired to it, and small timing/statistics utilities.
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import db
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS UserDetail (
+    id INTEGER PRIMARY KEY,
+    Fname VARCHAR(20), Lname VARCHAR(20), Username VARCHAR(20) UNIQUE,
+    ContactNo VARCHAR(11), Password VARCHAR(100), Email VARCHAR(100) UNIQUE
+);
+CREATE TABLE IF NOT EXISTS TimesheetProjects (
+    id INTEGER PRIMARY KEY,
+    Project_Name VARCHAR(50) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS TimesheetTasks (
+    id INTEGER PRIMARY KEY,
+    Proj_id INT NOT NULL REFERENCES TimesheetProjects(id),
+    Task VARCHAR(100) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS TimesheetMain (
+    id INTEGER PRIMARY KEY,
+    project_id INT NOT NULL REFERENCES TimesheetProjects(id),
+    user_id INT NOT NULL REFERENCES UserDetail(id),
+    task_id INT NOT NULL REFERENCES TimesheetTasks(id),
+    activity VARCHAR(500),
+    hours DECIMAL(10,2) NOT NULL,
+    overtime DECIMAL(10,2) DEFAULT 0,
+    Tdate DATE NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS TimesheetDailyRollup (
+    user_id INT NOT NULL,
+    Tdate DATE NOT NULL,
+    project_id INT NOT NULL,
+    hours DECIMAL(12,2) NOT NULL,
+    overtime DECIMAL(12,2) NOT NULL,
+    entries INT NOT NULL,
+    PRIMARY KEY (user_id, Tdate, project_id)
+);
+CREATE TABLE IF NOT EXISTS TimesheetSearchTokens (
+    user_id INT NOT NULL,
+    token VARCHAR(40) NOT NULL,
+    entry_id INT NOT NULL,
+    field TINYINT NOT NULL,
+    PRIMARY KEY (user_id, token, entry_id, field)
+);
+CREATE INDEX IF NOT EXISTS IX_TimesheetSearchTokens_entry ON TimesheetSearchTokens (entry_id);
+-- Same indexes as migrations/0005_timesheetmain_indexes.sql
+CREATE INDEX IF NOT EXISTS IX_TimesheetMain_user_date ON TimesheetMain (user_id, Tdate DESC, id DESC);
+CREATE INDEX IF NOT EXISTS IX_TimesheetMain_date ON TimesheetMain (Tdate, user_id, project_id, hours, overtime);
+CREATE INDEX IF NOT EXISTS IX_TimesheetTasks_project ON TimesheetTasks (Proj_id, Task);
+CREATE TABLE IF NOT EXISTS ReportJobs (
+    id CHAR(32) NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    kind VARCHAR(50) NOT NULL,
+    params TEXT NOT NULL,
+    dedup_key CHAR(40) NOT NULL,
+    status VARCHAR(10) NOT NULL,
+    error VARCHAR(1000),
+    result_path VARCHAR(500),
+    content_type VARCHAR(100),
+    filename VARCHAR(200),
+    result_bytes BIGINT,
+    created_at TIMESTAMP NOT NULL,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    expires_at TIMESTAMP,
+    owner CHAR(32),
+    heartbeat_at TIMESTAMP
+);
+-- Same as migrations/0008_report_job_owners.sql
+CREATE UNIQUE INDEX IF NOT EXISTS UX_ReportJobs_active_dedup ON ReportJobs (dedup_key)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS IX_ReportJobs_user ON ReportJobs (user_id, created_at DESC);
+CREATE TABLE IF NOT EXISTS UserDataVersion (
+    user_id INT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL,
+    modified TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Timesheet (
+    id INTEGER PRIMARY KEY,
+    user_id INT NOT NULL REFERENCES UserDetail(id),
+    task NVARCHAR(255) NOT NULL,
+    hours FLOAT NOT NULL,
+    date DATE NOT NULL,
+    week_start DATE NOT NULL
+);
+"""
+
+
+def temp_db_path(name="timesheet_bench.db"):
+    """Fresh database file in a temporary directory."""
+    return os.path.join(tempfile.mkdtemp(prefix="timesheet_bench_"), name)
+
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    # WAL lets readers run while a writer commits, closer to SQL Server behaviour
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SQLITE_SCHEMA)
+    conn.commit()
+    conn.close()
+
+
+def seed_reference_data(path, users=1, projects=5, tasks_per_project=4):
+    """Insert users, projects and tasks with predictable ids (1..n)."""
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO UserDetail (id, Fname, Lname, Username, ContactNo, Password, Email) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, "User", str(i), "user%d" % i, "0000000000", "", "user%d@example.com" % i) for i in range(1, users + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO TimesheetProjects (id, Project_Name) VALUES (?, ?)",
+        [(p, "Project %d" % p) for p in range(1, projects + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO TimesheetTasks (id, Proj_id, Task) VALUES (?, ?, ?)",
+        [((p - 1) * tasks_per_project + t, p, "Task %d.%d" % (p, t))
+         for p in range(1, projects + 1) for t in range(1, tasks_per_project + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def make_app(path, **pool_options):
+    """Point the connection pool at the SQLite file and return the Flask app."""
+    db.configure_pool(db.sqlite_connect(path), **pool_options)
+    from app import app
+    app.config["TESTING"] = True
+    return app
+
+
+def login_client(app, user_id):
+    """Test client with an authenticated session for user_id."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["username"] = "user%d" % user_id
+    return client
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Timer:
+    """Context manager measuring wall-clock seconds into .elapsed."""
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
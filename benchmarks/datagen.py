@@ -0,0 +1,143 @@
+# benchmarks/datagen.py
+# Synthetic users, projects, tasks and timesheet entries for the SQLite stand-in.
+# Entries look like real usage: each user works on a few projects, logs 1-3 entries per
+# working day going back `days` days, and writes short activity/description text.
+# The rollup and search index are filled in bulk so the database matches what the
+# incremental write paths would have produced.
+# Usage: python -m benchmarks.datagen bench.db [--users 200] [--days 130] [--no-search-index]
+
+import argparse
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from benchmarks.common import create_schema, Timer
+from search_index import index_tokens
+
+ACTIVITIES = [
+    "Development", "Code review", "Testing", "Deployment", "Design", "Documentation",
+    "Meeting", "Support", "Bug fixing", "Research", "Planning", "Training",
+]
+WORDS = (
+    "api backend frontend database migration report invoice payroll customer release "
+    "sprint ticket module service dashboard export import schema index query cache "
+    "performance login profile weekly monthly analysis chart upload validation"
+).split()
+
+END_DATE = date(2026, 6, 30)
+
+
+def _working_days(days):
+    day = END_DATE
+    produced = 0
+    while produced < days:
+        if day.weekday() < 5:
+            yield day
+            produced += 1
+        day -= timedelta(days=1)
+
+
+def generate_entries(rng, users, days, projects, tasks_per_project, projects_per_user=3):
+    """Yield TimesheetMain rows (id, project_id, user_id, task_id, activity, hours, overtime, Tdate, description)."""
+    entry_id = 0
+    for user_id in range(1, users + 1):
+        mine = rng.sample(range(1, projects + 1), min(projects_per_user, projects))
+        for day in _working_days(days):
+            count = rng.choice((1, 2, 2, 3))
+            hours_left = 8.0
+            for i in range(count):
+                entry_id += 1
+                project_id = rng.choice(mine)
+                task_id = (project_id - 1) * tasks_per_project + rng.randint(1, tasks_per_project)
+                hours = hours_left if i == count - 1 else rng.choice((1.0, 2.0, 2.5, 3.0, 4.0))
+                hours_left = max(hours_left - hours, 0.5)
+                overtime = rng.choice((0, 0, 0, 0, 1.0, 2.0))
+                description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+                yield (entry_id, project_id, user_id, task_id, rng.choice(ACTIVITIES), hours,
+                       overtime, day.isoformat(), description)
+
+
+def populate(path, users=200, days=130, projects=50, tasks_per_project=8, search_index=True, seed=42):
+    """Create the schema at `path` and fill it. Returns a dict of row counts and timings."""
+    rng = random.Random(seed)
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    stats = {}
+
+    with Timer() as t:
+        conn.executemany(
+            "INSERT INTO UserDetail (id, Fname, Lname, Username, ContactNo, Password, Email) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(i, "User", str(i), "user%d" % i, "0000000000", "", "user%d@example.com" % i) for i in range(1, users + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO TimesheetProjects (id, Project_Name) VALUES (?, ?)",
+            [(p, "Project %s %d" % (rng.choice(WORDS).title(), p)) for p in range(1, projects + 1)],
+        )
+        task_names = {}
+        for p in range(1, projects + 1):
+            for t_ in range(1, tasks_per_project + 1):
+                task_names[(p - 1) * tasks_per_project + t_] = "%s %d" % (rng.choice(ACTIVITIES), t_)
+        conn.executemany(
+            "INSERT INTO TimesheetTasks (id, Proj_id, Task) VALUES (?, ?, ?)",
+            [(tid, (tid - 1) // tasks_per_project + 1, name) for tid, name in task_names.items()],
+        )
+        project_names = dict(conn.execute("SELECT id, Project_Name FROM TimesheetProjects"))
+
+        entries = 0
+        tokens = 0
+        batch = []
+        token_batch = []
+        for row in generate_entries(rng, users, days, projects, tasks_per_project):
+            batch.append(row)
+            if search_index:
+                entry_id, project_id, user_id, task_id, activity, _, _, _, description = row
+                for field, text in ((1, activity), (2, description), (3, project_names[project_id]), (4, task_names[task_id])):
+                    token_batch.extend((user_id, token, entry_id, field) for token in index_tokens(text))
+            if len(batch) >= 10000:
+                entries += _flush(conn, batch, token_batch)
+                tokens += len(token_batch)
+                batch, token_batch = [], []
+        entries += _flush(conn, batch, token_batch)
+        tokens += len(token_batch)
+
+        conn.execute(
+            "INSERT INTO TimesheetDailyRollup (user_id, Tdate, project_id, hours, overtime, entries) "
+            "SELECT user_id, Tdate, project_id, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*) "
+            "FROM TimesheetMain GROUP BY user_id, Tdate, project_id"
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    conn.close()
+
+    stats.update(users=users, projects=projects, tasks=len(task_names), entries=entries,
+                 search_tokens=tokens, seconds=round(t.elapsed, 2))
+    return stats
+
+
+def _flush(conn, batch, token_batch):
+    conn.executemany(
+        "INSERT INTO TimesheetMain (id, project_id, user_id, task_id, activity, hours, overtime, Tdate, description) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        batch,
+    )
+    if token_batch:
+        conn.executemany(
+            "INSERT OR IGNORE INTO TimesheetSearchTokens (user_id, token, entry_id, field) VALUES (?, ?, ?, ?)",
+            token_batch,
+        )
+    return len(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=130, help="working days of history per user")
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--tasks-per-project", type=int, default=8)
+    parser.add_argument("--no-search-index", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(populate(args.path, args.users, args.days, args.projects, args.tasks_per_project,
+                   not args.no_search_index, args.seed))
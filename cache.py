@@ -0,0 +1,76 @@
+# cache.py
+# Small in-process cache used for data that is read far more often than it changes
+# (reference data, rendered charts, profiles, ...). Entries can expire after a TTL,
+# the cache can be bounded with least-recently-used eviction, and callers invalidate
+# keys explicitly when they change the underlying rows.
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe key/value cache.
+    Parameters:
+    - ttl: seconds an entry stays valid (None = until invalidated or evicted)
+    - maxsize: maximum number of entries; the least recently used is evicted (None = unbounded)
+    """
+
+    def __init__(self, ttl=None, maxsize=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() and caching its result on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=_MISSING):
+        """Drop one key, or everything when called without arguments."""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every key for which predicate(key) is true."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,85 @@
+# charts.py
+# Server-side rendering of the analysis pie chart.
+# Figures are built with matplotlib's object-oriented Figure API (no pyplot global state),
+# rendered on a bounded worker pool, and kept in an LRU cache keyed by
+# (user_id, start_date, end_date, data version, format) so repeat views never re-render.
+
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+from metrics import CHART_SECONDS
+
+CHART_WORKERS = int(os.environ.get("TIMESHEET_CHART_WORKERS", 2))
+CHART_CACHE_SIZE = int(os.environ.get("TIMESHEET_CHART_CACHE_SIZE", 256))
+CHART_TIMEOUT = 30.0
+
+CHART_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+_executor = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="chart")
+_chart_cache = TTLCache(maxsize=CHART_CACHE_SIZE)
+# Renders currently running, so concurrent requests for the same chart share one render
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def data_version(labels, data):
+    """Digest of the chart inputs; identical data always maps to the same cached image."""
+    text = repr([(str(l), float(d)) for l, d in zip(labels, data)])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def render_pie(labels, data, fmt="png"):
+    """Render a pie chart and return it base64-encoded. Runs on any thread."""
+    # Imported here so processes that never draw a chart do not pay for matplotlib
+    from matplotlib.figure import Figure
+
+    started = time.perf_counter()
+
+    if not data or sum(data) == 0:
+        # no data - create a placeholder pie chart
+        labels = ['No data']
+        data = [1]
+
+    fig = Figure(figsize=(6, 6))
+    ax = fig.add_subplot()
+    ax.pie(data, labels=labels, autopct="%1.1f%%")
+    ax.legend(title="Projects")
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    CHART_SECONDS.observe(time.perf_counter() - started, fmt)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def get_pie_chart(user_id, start_date, end_date, labels, data, fmt="png"):
+    """
+    Return the base64 pie chart for this user/range/data, rendering it on the worker pool
+    only when it is not already cached.
+    """
+    key = (user_id, start_date, end_date, data_version(labels, data), fmt)
+    cached = _chart_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = _executor.submit(render_pie, list(labels), [float(d) for d in data], fmt)
+            _in_flight[key] = future
+    try:
+        image = future.result(timeout=CHART_TIMEOUT)
+    finally:
+        with _in_flight_lock:
+            if _in_flight.get(key) is future and future.done():
+                del _in_flight[key]
+    _chart_cache.set(key, image)
+    return image
@@ -0,0 +1,91 @@
+# data_version.py
+# Per-user data versions for conditional GETs on the read endpoints that clients poll
+# (/analysis/data, /api/timesheet/weekly/<week_start>, ...).
+# The version is a counter in UserDataVersion (migrations/0007_user_data_version.sql),
+# one row per user. Every write path calls bump_user_version(cursor, user_id) on its own
+# cursor before committing, so the new version becomes visible together with the data it
+# describes and every app server behind the load balancer sees it. conditional_response()
+# answers 304 when the client's ETag (or If-Modified-Since) is still current, before the
+# response is built, so an unchanged poll costs one primary key lookup instead of a query.
+
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+from db import get_connection
+
+_BUMP_SQL = """
+    UPDATE UserDataVersion WITH (UPDLOCK, HOLDLOCK)
+    SET version = version + 1, modified = ?
+    WHERE user_id = ?
+"""
+
+_CREATE_SQL = """
+    INSERT INTO UserDataVersion (user_id, version, modified) VALUES (?, 1, ?)
+"""
+
+
+def bump_user_version(cursor, user_id):
+    """
+    Give user_id a new data version. Runs on the writer's cursor so it commits (or rolls
+    back) with the write. The locking hints make a concurrent first bump for the same
+    user wait for this one instead of inserting the row twice.
+    """
+    modified = datetime.now(timezone.utc).replace(tzinfo=None)
+    cursor.execute(_BUMP_SQL, (modified, user_id))
+    if cursor.rowcount == 0:
+        cursor.execute(_CREATE_SQL, (user_id, modified))
+
+
+def get_user_version(user_id):
+    """
+    (version, last modified as an aware datetime) of user_id's data; (0, None) for a
+    user nothing has been written for yet.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT version, modified FROM UserDataVersion WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if row is None:
+        return 0, None
+    modified = row[1]
+    if isinstance(modified, str):
+        modified = datetime.fromisoformat(modified)
+    return int(row[0]), modified.replace(tzinfo=timezone.utc)
+
+
+def conditional_response(user_id, build, *validators):
+    """
+    Respond to a GET on user_id's data: 304 when the client already has the current
+    version, otherwise build() (a Flask response) with ETag and Last-Modified set.
+    validators: anything else the response depends on (e.g. the reference data ETag).
+    """
+    version, modified = get_user_version(user_id)
+    # Versions are counters per user, so the user id is part of the tag
+    etag = hashlib.sha1("|".join([str(user_id), str(version)] + [str(v) for v in validators]).encode("utf-8")).hexdigest()
+    settled = False
+    if modified is not None:
+        # Last-Modified has one-second resolution, so it is only a safe validator once the
+        # data is at least a second old (a later write in the same second would not change it)
+        modified = modified.replace(microsecond=0)
+        settled = (datetime.now(timezone.utc) - modified).total_seconds() >= 2
+
+    if request.if_none_match:
+        current = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        current = settled and since is not None and modified <= since and not validators
+    if current:
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if settled:
+        response.last_modified = modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
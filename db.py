@@ -1,4 +1,18 @@
-import pyodbc
+# db.py
+# Shared database access for every module in the app.
+# get_connection() hands out connections from a bounded, thread-safe pool instead of
+# running a fresh ODBC handshake per call. Callers keep the old pattern:
+#     conn = get_connection(); cursor = conn.cursor(); ...; conn.close()
+# where close() returns the connection to the pool rather than tearing it down.
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
 
 conn_str = (
     "Driver={ODBC Driver 17 for SQL Server};"
@@ -7,5 +21,573 @@ conn_str = (
     "Trusted_Connection=yes;"
 )
 
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+def odbc_connect():
+    """Open a raw connection to SQL Server (pyodbc is imported on first use)."""
+    import pyodbc
+    return pyodbc.connect(conn_str)
+
+
+def is_data_error(exc):
+    """
+    True when the database rejected the data itself (constraint violation, conversion or
+    truncation error), False for everything else, e.g. a lost connection or PoolTimeout.
+    """
+    if isinstance(exc, (sqlite3.IntegrityError, sqlite3.DataError)):
+        return True
+    # Only loaded once an ODBC connection was made, and then its errors are pyodbc's
+    pyodbc = sys.modules.get("pyodbc")
+    return pyodbc is not None and isinstance(exc, (pyodbc.IntegrityError, pyodbc.DataError))
+
+
+# -------------------
+# SQLite stand-in
+# -------------------
+# The benchmarks and local development run against SQLite instead of SQL Server.
+# The wrapper below rewrites the few T-SQL constructs our queries use so the same
+# SQL strings work on both backends.
+_DATEADD_RE = re.compile(r"DATEADD\(\s*DAY\s*,\s*(-?\d+)\s*,\s*\?\s*\)", re.IGNORECASE)
+_TOP_RE = re.compile(r"^(\s*SELECT\s+)TOP\s*\(\s*\?\s*\)\s*", re.IGNORECASE)
+_DATEDIFF_RE = re.compile(r"DATEDIFF\(\s*DAY\s*,\s*('[^']*'|\?)\s*,\s*([\w.]+)\s*\)", re.IGNORECASE)
+# Table hints such as WITH (UPDLOCK, HOLDLOCK); SQLite serializes writers anyway
+_HINTS_RE = re.compile(r"\s+WITH\s*\(\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|SERIALIZABLE)(?:\s*,\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|SERIALIZABLE))*\s*\)", re.IGNORECASE)
+
+
+def _sqlite_sql(sql, params):
+    sql = _DATEADD_RE.sub(lambda m: "date(?, '%+d day')" % int(m.group(1)), sql)
+    sql = _DATEDIFF_RE.sub(lambda m: "CAST(julianday(%s) - julianday(%s) AS INTEGER)" % (m.group(2), m.group(1)), sql)
+    sql = _HINTS_RE.sub("", sql)
+    match = _TOP_RE.match(sql)
+    if match:
+        # TOP (?) binds the first parameter; LIMIT ? binds the last one.
+        params = list(params)
+        params.append(params.pop(0))
+        sql = match.group(1) + sql[match.end():].rstrip().rstrip(";") + " LIMIT ?"
+    return sql, params
+
+
+class _SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fast_executemany = False
+
+    def execute(self, sql, params=()):
+        sql, params = _sqlite_sql(sql, params)
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql, _ = _sqlite_sql(sql, ())
+        self._cursor.executemany(sql, seq_of_params)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _SqliteConnection:
+    dialect = "sqlite"
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _SqliteCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _sql_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'%s'" % str(value).replace("'", "''")
+
+
+def explain_query(conn, sql, params=()):
+    """
+    Return the query plan for `sql` as a list of text lines without running the query.
+    Uses SET SHOWPLAN_TEXT on SQL Server and EXPLAIN QUERY PLAN on the SQLite stand-in.
+    """
+    cursor = conn.cursor()
+    try:
+        if dialect(conn) == "sqlite":
+            sql, params = _sqlite_sql(sql, params)
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+        # SHOWPLAN does not accept parameter markers, so inline the sample values
+        for value in params:
+            sql = sql.replace("?", _sql_literal(value), 1)
+        cursor.execute("SET SHOWPLAN_TEXT ON")
+        try:
+            cursor.execute(sql)
+            lines = []
+            while True:
+                lines.extend(str(row[0]) for row in cursor.fetchall())
+                if not cursor.nextset():
+                    break
+            return lines
+        finally:
+            cursor.execute("SET SHOWPLAN_TEXT OFF")
+    finally:
+        cursor.close()
+
+
+def sqlite_connect(path):
+    """Return a connect() factory that opens the SQLite stand-in database at `path`."""
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        return _SqliteConnection(conn)
+    return connect
+
+
+# -------------------
+# Query accounting
+# -------------------
+# While a QueryStats is installed in this context variable (metrics.py does that for each
+# request), cursors handed out by the pool record every statement, its time and the rows fetched.
+current_query_stats = ContextVar("current_query_stats", default=None)
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 50
+
+
+class QueryStats:
+    """Per-request totals: number of statements, seconds spent in the driver, rows fetched."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.statements = []  # [sql, seconds, rows] for the first MAX_RECORDED_STATEMENTS
+        self._current = None  # entry of the statement being fetched, None if not recorded
+
+    def record(self, sql, seconds):
+        self.queries += 1
+        self.seconds += seconds
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self._current = [" ".join(sql.split()), seconds, 0]
+            self.statements.append(self._current)
+        else:
+            self._current = None
+
+    def record_fetch(self, rows, seconds):
+        self.rows += rows
+        self.seconds += seconds
+        if self._current is not None:
+            self._current[1] += seconds
+            self._current[2] += rows
+
+
+class _TrackedCursor:
+    """Cursor wrapper that reports into a QueryStats; everything else is passed through."""
+
+    def __init__(self, cursor, stats):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_stats", stats)
+
+    def execute(self, sql, *params):
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            self._stats.record(sql, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._stats.record(sql, time.perf_counter() - started)
+        return self
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        if method == "fetchone":
+            count = 0 if result is None else 1
+        else:
+            count = len(result)
+        self._stats.record_fetch(count, time.perf_counter() - started)
+        return result
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def fetchmany(self, *args):
+        return self._fetch("fetchmany", *args)
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. cursor.fast_executemany = True must reach the driver's cursor
+        setattr(self._cursor, name, value)
+
+
+# -------------------
+# Connection pool
+# -------------------
+class _PooledConnection:
+    """
+    Thin proxy around a raw connection checked out of the pool.
+    close() releases the connection back to the pool; everything else is passed through.
+    """
+
+    def __init__(self, pool, record):
+        self._pool = pool
+        self._record = record
+
+    @property
+    def raw(self):
+        return self._record.conn
+
+    def cursor(self):
+        if self._record is None:
+            raise RuntimeError("Connection already returned to the pool")
+        cursor = self._record.conn.cursor()
+        stats = current_query_stats.get()
+        return _TrackedCursor(cursor, stats) if stats is not None else cursor
+
+    def close(self):
+        record, self._record = self._record, None
+        if record is not None:
+            self._pool._release(record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # A handler that forgot close() must not leak a pool slot forever.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        if self._record is None:
+            raise RuntimeError("Connection already returned to the pool")
+        return getattr(self._record.conn, name)
+
+
+class _Record:
+    __slots__ = ("conn", "created", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections.
+    Parameters:
+    - connect: zero-argument callable that opens a raw connection
+    - min_size: connections kept open even when idle
+    - max_size: hard cap on open connections; callers wait when it is reached
+    - timeout: seconds a caller waits for a free connection before PoolTimeout
+    - max_idle: idle connections older than this (seconds) are closed, down to min_size
+    - max_lifetime: connections older than this (seconds) are recycled
+    - ping_after: idle time (seconds) after which a connection is health-checked on checkout
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30.0,
+                 max_idle=300.0, max_lifetime=3600.0, ping_after=5.0, ping_sql="SELECT 1"):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.ping_sql = ping_sql
+
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._prefilled = False
+
+        self._waiters = 0
+        self._checkouts = 0
+        self._hits = 0
+        self._misses = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._connects = 0
+        self._connect_total = 0.0
+
+    # ---- checkout / release ----
+    # Health checks and closes talk to the server, so they run outside self._cond: a slow
+    # ping or close must not hold up every other acquire and release in the process.
+    def acquire(self):
+        """Check a connection out of the pool; call close() on the result to give it back."""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        self._prefill()
+        while True:
+            record = self._reserve(deadline)
+            if record is None or self._healthy(record):
+                break
+            with self._cond:
+                self._forget(record)
+                self._cond.notify()
+            self._close_records([record])
+        hit = record is not None
+
+        if record is None:
+            try:
+                record = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return _PooledConnection(self, record)
+
+    def _reserve(self, deadline):
+        # Take an idle record (LIFO keeps the hot connections hot), or None after reserving
+        # room for a new connection; waits while the pool is at max_size.
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout("No database connection available within %.1fs" % self.timeout)
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+    def _open(self):
+        started = time.perf_counter()
+        record = _Record(self._connect())
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._connects += 1
+            self._connect_total += elapsed
+        return record
+
+    def _healthy(self, record):
+        # Called without the lock, on a record this caller has taken out of the pool.
+        now = time.monotonic()
+        if now - record.created > self.max_lifetime:
+            return False
+        return now - record.last_used <= self.ping_after or self._ping(record)
+
+    def _ping(self, record):
+        try:
+            cursor = record.conn.cursor()
+            cursor.execute(self.ping_sql)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _release(self, record):
+        # Never hand the next caller a half-finished transaction.
+        try:
+            record.conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        closing = []
+        with self._cond:
+            now = time.monotonic()
+            if self._closed or not healthy or now - record.created > self.max_lifetime:
+                self._forget(record)
+                closing.append(record)
+            else:
+                record.last_used = now
+                self._idle.append(record)
+            closing.extend(self._evict_idle(now))
+            self._cond.notify()
+        self._close_records(closing)
+
+    def _forget(self, record):
+        # Called with the lock held; the caller closes the record after releasing it.
+        self._size -= 1
+        self._discarded += 1
+
+    @staticmethod
+    def _close_records(records):
+        # Called without the lock.
+        for record in records:
+            try:
+                record.conn.close()
+            except Exception:
+                pass
+
+    def _evict_idle(self, now):
+        # Called with the lock held; returns the evicted records for the caller to close.
+        # Oldest idle connections sit at the left end of the deque.
+        evicted = []
+        while self._idle and self._size > self.min_size and now - self._idle[0].last_used > self.max_idle:
+            record = self._idle.popleft()
+            self._forget(record)
+            evicted.append(record)
+        return evicted
+
+    def _prefill(self):
+        if self._prefilled:
+            return
+        with self._cond:
+            if self._prefilled:
+                return
+            self._prefilled = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._open())
+        finally:
+            with self._cond:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                if len(opened) < missing:
+                    # The server was unreachable; try again on the next acquire
+                    self._prefilled = False
+                self._cond.notify_all()
+
+    # ---- maintenance ----
+    def evict_idle(self):
+        """Close idle connections past max_idle (down to min_size). Safe to call from a timer."""
+        with self._cond:
+            evicted = self._evict_idle(time.monotonic())
+        self._close_records(evicted)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        closing = []
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                record = self._idle.popleft()
+                self._forget(record)
+                closing.append(record)
+            self._cond.notify_all()
+        self._close_records(closing)
+
+    def stats(self):
+        """Snapshot of pool counters, suitable for logging or a metrics endpoint."""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "waiters": self._waiters,
+                "checkouts": checkouts,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / checkouts) if checkouts else 0.0,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "avg_checkout_ms": (self._wait_total / checkouts * 1000.0) if checkouts else 0.0,
+                "max_checkout_ms": self._wait_max * 1000.0,
+                "connects": self._connects,
+                "connect_seconds_total": self._connect_total,
+            }
+
+
+# -------------------
+# Module-level pool
+# -------------------
+_pool = None
+_pool_lock = threading.RLock()
+
+
+def _default_connect():
+    # TIMESHEET_SQLITE_PATH switches the whole app onto the SQLite stand-in.
+    sqlite_path = os.environ.get("TIMESHEET_SQLITE_PATH")
+    if sqlite_path:
+        return sqlite_connect(sqlite_path)
+    return odbc_connect
+
+
+def configure_pool(connect=None, **options):
+    """
+    Replace the process-wide pool, e.g. configure_pool(sqlite_connect("bench.db"), max_size=4).
+    Options are passed to ConnectionPool; missing ones fall back to TIMESHEET_POOL_* env vars.
+    """
+    global _pool
+    options.setdefault("min_size", int(os.environ.get("TIMESHEET_POOL_MIN", 1)))
+    options.setdefault("max_size", int(os.environ.get("TIMESHEET_POOL_MAX", 10)))
+    options.setdefault("timeout", float(os.environ.get("TIMESHEET_POOL_TIMEOUT", 30)))
+    new_pool = ConnectionPool(connect or _default_connect(), **options)
+    with _pool_lock:
+        old, _pool = _pool, new_pool
+    if old is not None:
+        old.close()
+    return new_pool
+
+
+def get_pool():
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                configure_pool()
+    return _pool
+
+
 def get_connection():
-    return pyodbc.connect(conn_str)
\ No newline at end of file
+    return get_pool().acquire()
+
+
+def dialect(conn):
+    """"sqlite" for the SQLite stand-in, "mssql" for SQL Server."""
+    raw = getattr(conn, "raw", conn)
+    return getattr(raw, "dialect", "mssql")
+
+
+def pool_stats():
+    return get_pool().stats()
@@ -0,0 +1,139 @@
+# export_api.py
+# Streaming export of TimesheetMain entries for payroll and month-end reporting.
+# Rows are pulled from the cursor with fetchmany() and written straight into a
+# generator response, so memory use stays flat regardless of how many rows match.
+
+import csv
+import io
+from datetime import datetime
+from flask import Blueprint, Response, request, session, jsonify
+from db import get_connection
+from serialize import dumps
+from auth import admin_required
+
+export_bp = Blueprint("export_bp", __name__)
+
+# Rows fetched from the database per round trip while streaming.
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = ["id", "user_id", "Username", "Tdate", "Project_Name", "Task",
+                  "activity", "hours", "overtime", "description"]
+
+EXPORT_SQL = """
+    SELECT m.id, m.user_id, u.Username, m.Tdate, p.Project_Name, t.Task,
+           m.activity, m.hours, m.overtime, m.description
+    FROM TimesheetMain m
+    JOIN UserDetail u ON m.user_id = u.id
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.Tdate >= ? AND m.Tdate <= ?
+"""
+
+
+def iter_export_rows(start_date, end_date, user_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows (tuples in EXPORT_COLUMNS order) for the date range, optionally
+    restricted to one user. The connection is held only while the generator runs and is
+    returned to the pool when it finishes or the client disconnects.
+    """
+    query = EXPORT_SQL
+    params = [start_date, end_date]
+    if user_id is not None:
+        query += " AND m.user_id = ?"
+        params.append(user_id)
+    query += " ORDER BY m.Tdate, m.id"
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def stream_csv(rows):
+    """Encode rows as CSV, one chunk of output per EXPORT_CHUNK_SIZE rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows):
+    """Encode rows as newline-delimited JSON objects."""
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(dict(zip(EXPORT_COLUMNS, row))))
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            chunk.append(b"")
+            yield b"\n".join(chunk)
+            chunk = []
+    if chunk:
+        chunk.append(b"")
+        yield b"\n".join(chunk)
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+def _export_response(user_id):
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    fmt = (request.args.get("format") or "csv").lower()
+
+    if not start_date or not end_date:
+        return jsonify({"error": "start_date and end_date are required"}), 400
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+        datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+    if fmt not in FORMATS:
+        return jsonify({"error": "Invalid format. Use csv or ndjson."}), 400
+
+    encode, mimetype = FORMATS[fmt]
+    scope = "user%s" % user_id if user_id is not None else "all"
+    filename = "timesheet_%s_%s_%s.%s" % (scope, start_date, end_date, fmt)
+    body = encode(iter_export_rows(start_date, end_date, user_id))
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": "attachment; filename=%s" % filename})
+
+
+@export_bp.route("/export/timesheet", methods=["GET"])
+def export_timesheet():
+    """
+    Stream the logged-in user's entries.
+    Query string: start_date, end_date (YYYY-MM-DD), format=csv|ndjson (default csv).
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+    return _export_response(user_id)
+
+
+@export_bp.route("/admin/export/timesheet", methods=["GET"])
+@admin_required
+def admin_export_timesheet():
+    """
+    Stream entries for every user, or for one user when ?user_id= is given.
+    Same query string as /export/timesheet.
+    """
+    return _export_response(request.args.get("user_id", type=int))
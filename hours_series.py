@@ -0,0 +1,126 @@
+# hours_series.py
+# Hours series for /analysis/data, the Analysis line chart and /async/analysis/data.
+# Series are aggregated server-side into day, week or month buckets; "auto" picks the
+# finest bucket that keeps the series within SERIES_MAX_POINTS points, so payload and
+# chart render time stay bounded however long the range is.
+# Totals of closed past periods are cached per user under the user's data version (see
+# data_version.py). Every write bumps that version in its own transaction, so a cached
+# total is never served after a write, in this process or any other, and nothing has to
+# be invalidated explicitly; entries of older versions simply age out.
+
+import os
+from datetime import date, datetime, timedelta
+
+from cache import TTLCache
+from data_version import get_user_version
+from db import get_connection
+
+SERIES_BUCKETS = ("day", "week", "month")
+SERIES_MAX_POINTS = int(os.environ.get("TIMESHEET_SERIES_MAX_POINTS", 120))
+SERIES_CACHE_TTL = float(os.environ.get("TIMESHEET_SERIES_CACHE_TTL", 600))
+SERIES_CACHE_SIZE = int(os.environ.get("TIMESHEET_SERIES_CACHE_SIZE", 100000))
+
+DAILY_HOURS_SQL = (
+    "SELECT Tdate, SUM(hours + overtime) AS Total_hours_worked "
+    "FROM TimesheetDailyRollup "
+    "WHERE user_id = ? AND Tdate >= ? AND Tdate <= ? "
+    "GROUP BY Tdate "
+    "ORDER BY Tdate;"
+)
+
+_series_cache = TTLCache(ttl=SERIES_CACHE_TTL, maxsize=SERIES_CACHE_SIZE)
+
+
+def get_daily_hours(user_id, start_date, end_date):
+    """Total hours (including overtime) per day: [{"date": "YYYY-MM-DD", "hours": float}, ...]"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(DAILY_HOURS_SQL, (user_id, start_date, end_date))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [{"date": str(r[0]), "hours": float(r[1])} for r in rows]
+
+
+def period_start(day, bucket):
+    """First day of the bucket containing day (weeks start on Monday)."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start, bucket):
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def choose_bucket(start_date, end_date, max_points=SERIES_MAX_POINTS):
+    """Finest bucket with at most max_points periods between the two dates (month if none)."""
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return "day"
+    weeks = (end_date - period_start(start_date, "week")).days // 7 + 1
+    if weeks <= max_points:
+        return "week"
+    return "month"
+
+
+def bucket_points(points, bucket):
+    """Sum daily points [{"date", "hours"}, ...] into buckets, keyed by each bucket's first day."""
+    if bucket == "day":
+        return points
+    totals = {}
+    for point in points:
+        day = datetime.strptime(point["date"][:10], "%Y-%m-%d").date()
+        start = period_start(day, bucket)
+        totals[start] = totals.get(start, 0.0) + point["hours"]
+    return [{"date": str(d), "hours": h} for d, h in sorted(totals.items())]
+
+
+def get_hours_series(user_id, start_date, end_date, bucket="auto"):
+    """
+    Total hours (including overtime) per day, week or month between two dates (date objects).
+    Returns (bucket, [{"date": first day of the period, "hours": float}, ...]); periods
+    without hours are left out, as in get_daily_hours().
+    """
+    if bucket == "auto":
+        bucket = choose_bucket(start_date, end_date)
+    today = date.today()
+    # Read before the rollup: a write that lands in between then only makes this
+    # request's totals newer than the version they are cached under, never older
+    version, _ = get_user_version(user_id)
+
+    # Walk the periods; closed ones that lie wholly inside the range come from the cache,
+    # the rest are read from the rollup in as few contiguous runs as possible
+    totals = {}
+    runs = []
+    start = period_start(start_date, bucket)
+    while start <= end_date:
+        end = _next_period(start, bucket) - timedelta(days=1)
+        closed = start >= start_date and end <= end_date and end < today
+        cached = _series_cache.get((user_id, version, bucket, start)) if closed else None
+        if cached is not None:
+            totals[start] = cached
+        else:
+            lo, hi = max(start, start_date), min(end, end_date)
+            if runs and runs[-1][1] + timedelta(days=1) == lo:
+                runs[-1][1] = hi
+                runs[-1][2].append((start, closed))
+            else:
+                runs.append([lo, hi, [(start, closed)]])
+        start = _next_period(start, bucket)
+
+    for lo, hi, periods in runs:
+        loaded = {p["date"]: p["hours"] for p in bucket_points(get_daily_hours(user_id, lo, hi), bucket)}
+        for start, closed in periods:
+            hours = loaded.get(str(start), 0.0)
+            totals[start] = hours
+            if closed:
+                _series_cache.set((user_id, version, bucket, start), hours)
+
+    return bucket, [{"date": str(d), "hours": h} for d, h in sorted(totals.items()) if h]
@@ -0,0 +1,236 @@
+# import_api.py
+# Bulk import of TimesheetMain entries from CSV, for teams moving over from spreadsheets.
+#     POST /import/timesheet   multipart upload with a "file" field, or a text/csv body
+# Columns (header row required, names are case-insensitive):
+#     date (or Tdate), project (or Project_Name, or project_id), task (or Task, or task_id),
+#     activity, hours, overtime, description
+# so a CSV produced by /export/timesheet can be imported again. Extra columns are ignored.
+# The upload is parsed as a stream and handled IMPORT_CHUNK_SIZE rows at a time: project
+# and task names are resolved against one lookup built from the reference data before the
+# import starts, each chunk is validated and the good rows are inserted in one
+# transaction. Bad rows are reported with their line number and skipped; if the database
+# rejects a chunk, it is split in halves until the rejected rows are isolated, so only
+# the bad ones are lost and a single bad row costs about 2*log2(chunk size) transactions.
+# Only data errors are bisected: when the database cannot be reached at all the import
+# stops with 503, reporting the chunks committed so far.
+# Memory stays bounded by the chunk size and IMPORT_MAX_ERRORS however large the file is.
+
+import csv
+import io
+import time
+
+from flask import Blueprint, request, session, jsonify
+
+from db import is_data_error
+from reference_data import get_project_tree
+from timesheet_model import validate_main_entry, insert_main_entries
+
+import_bp = Blueprint("import_bp", __name__)
+
+# Rows validated and inserted per transaction
+IMPORT_CHUNK_SIZE = 1000
+# Per-row errors listed in the response; further errors are only counted
+IMPORT_MAX_ERRORS = 1000
+
+COLUMN_ALIASES = {
+    "date": "date", "tdate": "date",
+    "project": "project", "project_name": "project", "project_id": "project_id",
+    "task": "task", "task_id": "task_id",
+    "activity": "activity",
+    "hours": "hours",
+    "overtime": "overtime",
+    "description": "description",
+}
+
+
+def build_lookup():
+    """
+    Name -> id maps for resolving CSV rows, built once per import:
+    (projects by lowercase name, tasks by (project_id, lowercase task name), {task_id: project_id}).
+    """
+    tree, _ = get_project_tree()
+    projects, tasks, task_projects = {}, {}, {}
+    for project in tree["projects"]:
+        projects[project["name"].strip().lower()] = project["id"]
+        for task in project["tasks"]:
+            tasks[(project["id"], task["task"].strip().lower())] = task["id"]
+            task_projects[task["id"]] = project["id"]
+    return projects, tasks, task_projects
+
+
+def resolve_row(row, lookup):
+    """
+    Map one CSV row (dict keyed by canonical column name) to the dict validate_main_entry
+    expects. Returns (raw_entry, None) or (None, error_message).
+    """
+    projects, tasks, task_projects = lookup
+    project = (row.get("project") or "").strip()
+    if project:
+        project_id = projects.get(project.lower())
+        if project_id is None:
+            return None, "Unknown project: %s" % project
+    else:
+        try:
+            project_id = int(row.get("project_id"))
+        except (TypeError, ValueError):
+            return None, "project or project_id is required"
+
+    task = (row.get("task") or "").strip()
+    if task:
+        task_id = tasks.get((project_id, task.lower()))
+        if task_id is None:
+            return None, "Unknown task for this project: %s" % task
+    else:
+        try:
+            task_id = int(row.get("task_id"))
+        except (TypeError, ValueError):
+            return None, "task or task_id is required"
+    if task_projects.get(task_id) != project_id:
+        return None, "Task does not belong to the project"
+
+    return {
+        "date": (row.get("date") or "").strip()[:10],
+        "project_id": project_id,
+        "task_id": task_id,
+        "activity": row.get("activity"),
+        "hours": row.get("hours"),
+        "overtime": row.get("overtime"),
+        "description": row.get("description"),
+    }, None
+
+
+class ImportAborted(Exception):
+    """The database failed for a reason other than the rows themselves; the import stopped."""
+
+    def __init__(self, summary, cause):
+        super().__init__(str(cause))
+        self.summary = summary
+
+
+class ImportSummary:
+    """Counts, timing and the first IMPORT_MAX_ERRORS per-row errors of one import."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds else None,
+        }
+
+
+def _insert_chunk(user_id, chunk, summary):
+    """chunk: list of (line, validated entry)."""
+    try:
+        insert_main_entries(user_id, [entry for _, entry in chunk])
+        summary.inserted += len(chunk)
+        return
+    except Exception as e:
+        if not is_data_error(e):
+            # Bisecting would only repeat the failure for every row
+            raise ImportAborted(summary, e) from e
+        if len(chunk) == 1:
+            print("Import insert error:", e)
+            summary.error(chunk[0][0], "Rejected by the database")
+            return
+    # Bisect to find the rows the database rejects; the rest of the chunk still goes in
+    middle = len(chunk) // 2
+    _insert_chunk(user_id, chunk[:middle], summary)
+    _insert_chunk(user_id, chunk[middle:], summary)
+
+
+def import_csv(user_id, text_stream):
+    """
+    Import CSV rows from a text stream as entries of user_id.
+    Returns the summary dict (see ImportSummary.as_dict); raises ValueError if the header
+    row is missing required columns and ImportAborted if the database failed mid-import.
+    """
+    summary = ImportSummary()
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("The file is empty")
+    columns = [COLUMN_ALIASES.get(name.strip().lower()) for name in header]
+    missing = [name for name, alternatives in (
+        ("date", ("date",)), ("project", ("project", "project_id")), ("task", ("task", "task_id")),
+        ("hours", ("hours",)), ("description", ("description",)),
+    ) if not any(a in columns for a in alternatives)]
+    if missing:
+        raise ValueError("Missing columns: %s" % ", ".join(missing))
+
+    lookup = build_lookup()
+    chunk = []
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            # Unparseable line (e.g. a field over csv.field_size_limit()): count it and carry on
+            summary.rows += 1
+            summary.error(reader.line_num, "Malformed CSV: %s" % e)
+            continue
+        if not any(v.strip() for v in values):
+            continue
+        summary.rows += 1
+        row = {name: value for name, value in zip(columns, values) if name}
+        raw, error = resolve_row(row, lookup)
+        if raw is not None:
+            entry, error = validate_main_entry(raw)
+        if error:
+            summary.error(reader.line_num, error)
+        else:
+            chunk.append((reader.line_num, entry))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _insert_chunk(user_id, chunk, summary)
+            chunk = []
+    if chunk:
+        _insert_chunk(user_id, chunk, summary)
+    return summary.as_dict()
+
+
+@import_bp.route("/import/timesheet", methods=["POST"])
+def import_timesheet():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+
+    upload = request.files.get("file")
+    if upload is not None:
+        binary = upload.stream
+    elif request.mimetype in ("text/csv", "text/plain"):
+        binary = request.stream
+    else:
+        return jsonify({"error": "Upload a CSV file in the 'file' field or send a text/csv body"}), 400
+
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        summary = import_csv(user_id, text)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ImportAborted as e:
+        print("CSV import for user %s aborted:" % user_id, e)
+        summary = e.summary.as_dict()
+        summary["error"] = "The database is unavailable; the import stopped after %d rows" % summary["inserted"]
+        return jsonify(summary), 503
+    finally:
+        text.detach()
+    print("CSV import for user %s: %d rows, %d inserted, %d failed, %.0f rows/s" % (
+        user_id, summary["rows"], summary["inserted"], summary["failed"], summary["rows_per_second"] or 0))
+    return jsonify(summary), 200
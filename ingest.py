@@ -0,0 +1,198 @@
+# ingest.py
+# Group-committed inserts for deadline bursts (opt-in with TIMESHEET_INGEST_MODE=1).
+# Normally every /add_task and /api/timesheet/add request checks out a connection, runs
+# one INSERT and commits, so the commit round trip caps throughput. In ingest mode the
+# request hands its validated row to a single writer thread instead:
+#   - the writer collects rows until TIMESHEET_INGEST_BATCH rows (default 200) are waiting
+#     or the oldest has waited TIMESHEET_INGEST_DELAY_MS (default 20), then inserts them
+#     with one executemany per statement, refreshes the derived tables for all of them
+#     with a few set-based statements and commits once
+#   - each request blocks until its batch has committed, so a success response still
+#     means the row is durable
+#   - if the batch is rejected, its rows are retried one transaction each so only the
+#     bad row fails
+#   - at most TIMESHEET_INGEST_QUEUE rows (default 5000) may be waiting; beyond that
+#     write() raises IngestBusy so the view can answer 503
+#   - a row still waiting after TIMESHEET_INGEST_TIMEOUT seconds is withdrawn and write()
+#     raises IngestTimeout (also a 503), so a client retry cannot insert it twice
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from data_version import bump_user_version
+from db import get_connection
+
+INGEST_MODE = os.environ.get("TIMESHEET_INGEST_MODE", "0") == "1"
+INGEST_BATCH = int(os.environ.get("TIMESHEET_INGEST_BATCH", 200))
+INGEST_DELAY_MS = float(os.environ.get("TIMESHEET_INGEST_DELAY_MS", 20))
+INGEST_QUEUE = int(os.environ.get("TIMESHEET_INGEST_QUEUE", 5000))
+INGEST_TIMEOUT = float(os.environ.get("TIMESHEET_INGEST_TIMEOUT", 30))
+
+
+class IngestBusy(Exception):
+    """Too many rows waiting to be committed; the caller should ask the client to retry."""
+
+
+class IngestTimeout(IngestBusy):
+    """The row waited too long for a group commit and was withdrawn; nothing was written."""
+
+
+_queue = queue.Queue(maxsize=INGEST_QUEUE)
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {"rows": 0, "batches": 0, "retried_batches": 0, "failed_rows": 0}
+
+
+def configure(enabled=None, batch=None, delay_ms=None):
+    """Override the environment settings (used by benchmarks)."""
+    global INGEST_MODE, INGEST_BATCH, INGEST_DELAY_MS
+    if enabled is not None:
+        INGEST_MODE = enabled
+    if batch is not None:
+        INGEST_BATCH = batch
+    if delay_ms is not None:
+        INGEST_DELAY_MS = delay_ms
+
+
+def stats():
+    return dict(_stats, pending=_queue.qsize())
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run_writer, name="ingest-writer", daemon=True)
+                _writer.start()
+
+
+def write(sql, params, user_id=None, sync_key=None):
+    """
+    Insert one row with `sql` and `params` as part of the next group commit and wait for it.
+    user_id's data version is bumped in the same transaction. sync_key is the
+    (Tdate, project_id) pair whose derived data changes for user_id, or None for tables
+    without derived data.
+    Raises IngestBusy when the queue is full, IngestTimeout when the row was not picked up
+    within INGEST_TIMEOUT seconds, and re-raises the database error if the row was rejected.
+    """
+    _ensure_writer()
+    future = Future()
+    try:
+        _queue.put_nowait((sql, params, user_id, sync_key, future))
+    except queue.Full:
+        raise IngestBusy()
+    try:
+        return future.result(timeout=INGEST_TIMEOUT)
+    except FutureTimeout:
+        if future.cancel():
+            # Still queued: the writer will skip it, so the client can safely retry
+            raise IngestTimeout()
+    # The writer has already taken the row into a transaction; wait for its outcome
+    return future.result()
+
+
+def _take(batch, item):
+    # Rows withdrawn by a timed-out write() are dropped here
+    if item[-1].set_running_or_notify_cancel():
+        batch.append(item)
+
+
+def _collect():
+    batch = []
+    while not batch:
+        _take(batch, _queue.get())
+    deadline = time.monotonic() + INGEST_DELAY_MS / 1000.0
+    while len(batch) < INGEST_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            _take(batch, _queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _insert(cursor, items):
+    # Imported here: timesheet_model imports this module for its write paths
+    from timesheet_model import sync_inserted_entries
+
+    by_sql = {}
+    synced = []
+    unsynced_users = set()
+    for sql, params, user_id, sync_key, _ in items:
+        by_sql.setdefault(sql, []).append(params)
+        if sync_key is not None:
+            synced.append((user_id,) + tuple(sync_key))
+        elif user_id is not None:
+            unsynced_users.add(user_id)
+    cursor.fast_executemany = True
+    for sql, rows in by_sql.items():
+        cursor.executemany(sql, rows)
+    if synced:
+        # Also bumps the data versions of these users
+        sync_inserted_entries(cursor, synced)
+    for user_id in sorted(unsynced_users - {key[0] for key in synced}):
+        bump_user_version(cursor, user_id)
+
+
+def _commit(items):
+    """Commit items in one transaction. Returns the exception if the transaction failed."""
+    try:
+        conn = get_connection()
+    except Exception as e:
+        return e
+    cursor = conn.cursor()
+    try:
+        _insert(cursor, items)
+        conn.commit()
+        return None
+    except Exception as e:
+        conn.rollback()
+        return e
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _run_writer():
+    while True:
+        batch = _collect()
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            # Never let the writer thread die; whoever is still waiting gets the error
+            print("Ingest writer error:", e)
+            for item in batch:
+                if not item[-1].done():
+                    item[-1].set_exception(e)
+
+
+def _write_batch(batch):
+    error = _commit(batch)
+    _stats["batches"] += 1
+    if error is None:
+        _stats["rows"] += len(batch)
+        for item in batch:
+            item[-1].set_result(True)
+        return
+    if len(batch) == 1:
+        print("Ingest insert error:", error)
+        _stats["failed_rows"] += 1
+        batch[0][-1].set_exception(error)
+        return
+    # One bad row should not fail everyone else's request
+    _stats["retried_batches"] += 1
+    for item in batch:
+        error = _commit([item])
+        if error is None:
+            _stats["rows"] += 1
+            item[-1].set_result(True)
+        else:
+            print("Ingest insert error:", error)
+            _stats["failed_rows"] += 1
+            item[-1].set_exception(error)
@@ -0,0 +1,544 @@
+# jobs_api.py
+# Background jobs for heavy reports (long-range analysis, chart images, exports,
+# org-wide utilization) so they no longer run inside a request and hit proxy timeouts.
+#     POST /jobs                  {"kind": ..., "params": {...}}  -> 202 {"job_id", "status", ...}
+#     GET  /jobs                  the caller's recent jobs
+#     GET  /jobs/<job_id>         status
+#     GET  /jobs/<job_id>/result  download once status is "done"
+# Jobs are rows in ReportJobs (migrations/0006) and run on a process pool of
+# TIMESHEET_JOB_WORKERS processes (default 2). Results are written to files under
+# TIMESHEET_JOB_DIR and expire after TIMESHEET_JOB_TTL seconds (default 86400).
+# Submitting a job identical to one that is still queued or running returns the existing
+# job instead of starting another (a unique index on the dedup key of in-flight jobs,
+# migrations/0008, settles concurrent submissions). Each user may have
+# TIMESHEET_JOB_MAX_ACTIVE jobs in flight (default 3). Jobs queued or running for longer
+# than TIMESHEET_JOB_TIMEOUT (default 3600 seconds) are marked failed; if such a job is
+# still running, the process that started it replaces its pool so the job no longer
+# holds a worker that queued jobs are waiting for. Every job records
+# the app process that queued it; that process refreshes the job's heartbeat every
+# TIMESHEET_JOB_HEARTBEAT seconds (default 30), and jobs whose heartbeat stops (the
+# process exited or was restarted) are marked failed at the next sweep.
+# Expired jobs are swept on submit, or with: python jobs_api.py expire
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, session, jsonify, send_file, url_for
+
+from auth import is_admin
+from db import get_connection
+from process_pool import LazyProcessPool
+
+jobs_bp = Blueprint("jobs_bp", __name__)
+
+JOB_WORKERS = int(os.environ.get("TIMESHEET_JOB_WORKERS", 2))
+JOB_DIR = os.environ.get("TIMESHEET_JOB_DIR") or os.path.join(tempfile.gettempdir(), "timesheet_jobs")
+JOB_TTL = float(os.environ.get("TIMESHEET_JOB_TTL", 86400))
+JOB_TIMEOUT = float(os.environ.get("TIMESHEET_JOB_TIMEOUT", 3600))
+JOB_MAX_ACTIVE = int(os.environ.get("TIMESHEET_JOB_MAX_ACTIVE", 3))
+SWEEP_INTERVAL = 60.0
+JOB_HEARTBEAT = float(os.environ.get("TIMESHEET_JOB_HEARTBEAT", 30))
+MAX_JOB_DAYS = 731
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Identifies this process as the owner of the jobs it queues
+OWNER_ID = uuid.uuid4().hex
+
+_pool = LazyProcessPool()
+# job id -> (executor, future) of the jobs this process has handed to its pool
+_futures = {}
+_futures_lock = threading.Lock()
+_last_sweep = 0.0
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+
+
+class JobError(Exception):
+    """Invalid or refused job submission; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# -------------------
+# Job kinds
+# -------------------
+# Each runner is called in a worker process as run(params, user_id, out) with `out` an
+# open binary file, and returns (content_type, download filename).
+def _run_analysis_summary(params, user_id, out):
+    from analysis_api import get_analysis_summary
+    from serialize import dumps
+    out.write(dumps(get_analysis_summary(user_id, params["start_date"], params["end_date"])))
+    return "application/json", "analysis_%s_%s.json" % (params["start_date"], params["end_date"])
+
+
+def _run_analysis_chart(params, user_id, out):
+    import base64
+    from analysis_api import get_analysis_summary
+    from charts import render_pie, CHART_FORMATS
+    summary = get_analysis_summary(user_id, params["start_date"], params["end_date"])
+    labels = [p["project"] for p in summary["projects"]]
+    data = [p["share"] for p in summary["projects"]]
+    out.write(base64.b64decode(render_pie(labels, data, params["format"])))
+    return CHART_FORMATS[params["format"]], "analysis_%s_%s.%s" % (params["start_date"], params["end_date"], params["format"])
+
+
+def _run_export(params, user_id, out):
+    from export_api import iter_export_rows, FORMATS
+    encode, mimetype = FORMATS[params["format"]]
+    scope_user = params.get("user_id", user_id)
+    for chunk in encode(iter_export_rows(params["start_date"], params["end_date"], scope_user)):
+        out.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    scope = "user%s" % scope_user if scope_user is not None else "all"
+    return mimetype, "timesheet_%s_%s_%s.%s" % (scope, params["start_date"], params["end_date"], params["format"])
+
+
+def _run_utilization_report(params, user_id, out):
+    from reports_api import build_utilization_report
+    from serialize import dumps
+    start = datetime.strptime(params["start_date"], "%Y-%m-%d").date()
+    end = datetime.strptime(params["end_date"], "%Y-%m-%d").date()
+    out.write(dumps(build_utilization_report(start, end)))
+    return "application/json", "utilization_%s_%s.json" % (params["start_date"], params["end_date"])
+
+
+# kind -> (runner, admin only, {optional param: allowed values})
+JOB_KINDS = {
+    "analysis_summary": (_run_analysis_summary, False, {}),
+    "analysis_chart": (_run_analysis_chart, False, {"format": ("png", "svg")}),
+    "export": (_run_export, False, {"format": ("csv", "ndjson")}),
+    "utilization_report": (_run_utilization_report, True, {}),
+}
+
+
+def validate_job(kind, params, user_id):
+    """Normalised params for a job of `kind` submitted by user_id; raises JobError."""
+    if kind not in JOB_KINDS:
+        raise JobError("Unknown job kind. Use one of: %s" % ", ".join(sorted(JOB_KINDS)))
+    _, admin_only, options = JOB_KINDS[kind]
+    admin = is_admin(user_id)
+    if admin_only and not admin:
+        raise JobError("Admin access required", 403)
+    if not isinstance(params, dict):
+        raise JobError("params must be an object")
+
+    try:
+        start = datetime.strptime(str(params.get("start_date", "")), "%Y-%m-%d").date()
+        end = datetime.strptime(str(params.get("end_date", "")), "%Y-%m-%d").date()
+    except ValueError:
+        raise JobError("start_date and end_date are required (YYYY-MM-DD)")
+    if end < start:
+        raise JobError("end_date is before start_date")
+    if (end - start).days >= MAX_JOB_DAYS:
+        raise JobError(f"Ranges are limited to {MAX_JOB_DAYS} days")
+    clean = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+    for name, allowed in options.items():
+        value = str(params.get(name) or allowed[0]).lower()
+        if value not in allowed:
+            raise JobError("Invalid %s. Use %s." % (name, " or ".join(allowed)))
+        clean[name] = value
+
+    if kind == "export" and admin and "user_id" in params:
+        # Admins may export one other user, or everyone with "user_id": null
+        if params["user_id"] is not None and not str(params["user_id"]).isdigit():
+            raise JobError("user_id must be a number or null")
+        clean["user_id"] = int(params["user_id"]) if params["user_id"] is not None else None
+    return clean
+
+
+def dedup_key(kind, params, user_id):
+    # Admin-only jobs do not depend on who asked, so all admins share them
+    scope = "admin" if JOB_KINDS[kind][1] else str(user_id)
+    text = json.dumps([kind, scope, params], sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# -------------------
+# Store
+# -------------------
+JOB_COLUMNS = ("id", "user_id", "kind", "params", "status", "error", "result_path", "content_type",
+               "filename", "result_bytes", "created_at", "started_at", "finished_at", "expires_at")
+
+
+def get_job(job_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT %s FROM ReportJobs WHERE id = ?" % ", ".join(JOB_COLUMNS), (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+
+def list_jobs(user_id, limit=50):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT TOP (?) %s FROM ReportJobs WHERE user_id = ? ORDER BY created_at DESC" % ", ".join(JOB_COLUMNS),
+        (limit, user_id),
+    )
+    jobs = [dict(zip(JOB_COLUMNS, row)) for row in cursor.fetchall()]
+    conn.close()
+    return jobs
+
+
+def _set_status(job_id, status, expected=ACTIVE_STATUSES, **fields):
+    """Move a job to `status` if it is still in one of `expected`. Returns True if it moved."""
+    assignments = ["status = ?"] + ["%s = ?" % name for name in fields]
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE ReportJobs SET %s WHERE id = ? AND status IN (%s)" % (
+            ", ".join(assignments), ",".join("?" * len(expected))),
+        [status] + list(fields.values()) + [job_id] + list(expected),
+    )
+    moved = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return moved
+
+
+def _remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def expire_jobs(now=None):
+    """
+    Delete finished jobs (and their result files) past expires_at, and fail jobs that have
+    been queued or running longer than JOB_TIMEOUT or whose owner stopped sending
+    heartbeats. Returns (expired, failed).
+    """
+    now = now or datetime.now()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, result_path FROM ReportJobs WHERE status IN ('done', 'failed') AND expires_at < ?", (now,))
+    expired = cursor.fetchall()
+    for job_id, path in expired:
+        _remove_file(path)
+        cursor.execute("DELETE FROM ReportJobs WHERE id = ?", (job_id,))
+    expires = now + timedelta(seconds=JOB_TTL)
+    # Running jobs are timed by when they started, not by how long they waited in the queue
+    cursor.execute(
+        "UPDATE ReportJobs SET status = 'failed', error = ?, finished_at = ?, expires_at = ? "
+        "WHERE (status = 'queued' AND created_at < ?) OR (status = 'running' AND started_at < ?)",
+        ("Timed out", now, expires, now - timedelta(seconds=JOB_TIMEOUT), now - timedelta(seconds=JOB_TIMEOUT)),
+    )
+    failed = max(cursor.rowcount, 0)
+    cursor.execute(
+        "UPDATE ReportJobs SET status = 'failed', error = ?, finished_at = ?, expires_at = ? "
+        "WHERE status IN ('queued', 'running') AND heartbeat_at < ?",
+        ("Interrupted: the server that queued it stopped", now, expires, now - timedelta(seconds=3 * JOB_HEARTBEAT)),
+    )
+    failed += max(cursor.rowcount, 0)
+    conn.commit()
+    conn.close()
+    if failed:
+        _stop_failed_jobs()
+    return len(expired), failed
+
+
+def _run_heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT)
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE ReportJobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (datetime.now(), OWNER_ID))
+            conn.commit()
+            conn.close()
+            # Another server's sweep may have failed one of our jobs
+            _stop_failed_jobs()
+        except Exception as e:
+            print("Job heartbeat error:", e)
+
+
+def _ensure_heartbeat():
+    global _heartbeat
+    if _heartbeat is None:
+        with _heartbeat_lock:
+            if _heartbeat is None:
+                _heartbeat = threading.Thread(target=_run_heartbeat, name="job-heartbeat", daemon=True)
+                _heartbeat.start()
+
+
+# -------------------
+# Runner
+# -------------------
+def _get_executor():
+    return _pool.get(max(JOB_WORKERS, 1))
+
+
+def execute_job(job_id):
+    """Run one queued job to completion. Runs in a job worker process."""
+    job = get_job(job_id)
+    if job is None or not _set_status(job_id, "running", ("queued",), started_at=datetime.now()):
+        return
+    run = JOB_KINDS[job["kind"]][0]
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = os.path.join(JOB_DIR, job_id)
+    try:
+        with open(path + ".part", "wb") as out:
+            content_type, filename = run(json.loads(job["params"]), job["user_id"], out)
+        os.replace(path + ".part", path)
+    except Exception as e:
+        print("Job %s failed:" % job_id, e)
+        _remove_file(path + ".part")
+        now = datetime.now()
+        _set_status(job_id, "failed", error=str(e)[:1000], finished_at=now,
+                    expires_at=now + timedelta(seconds=JOB_TTL))
+        return
+    now = datetime.now()
+    if not _set_status(job_id, "done", result_path=path, content_type=content_type, filename=filename,
+                       result_bytes=os.path.getsize(path), finished_at=now,
+                       expires_at=now + timedelta(seconds=JOB_TTL)):
+        # Timed out while it ran: the job is already failed and nobody can download this
+        _remove_file(path)
+
+
+def _fail_job(job_id, error):
+    now = datetime.now()
+    _set_status(job_id, "failed", error=error[:1000], finished_at=now, expires_at=now + timedelta(seconds=JOB_TTL))
+
+
+def _job_finished(job_id, executor, future):
+    # The worker records its own outcome; this only catches a worker that died mid-job
+    with _futures_lock:
+        if _futures.get(job_id, (None, None))[1] is future:
+            del _futures[job_id]
+    if future.cancelled():
+        # Withdrawn by _stop_failed_jobs, which also restarts it if it is still queued
+        return
+    error = future.exception()
+    if error is not None:
+        if isinstance(error, BrokenProcessPool):
+            # The dead worker took the pool down with it; the next job gets a fresh one
+            _pool.discard(executor)
+        _fail_job(job_id, "Worker error: %s" % error)
+
+
+def _start_job(job_id):
+    executor = _get_executor()
+    try:
+        future = executor.submit(execute_job, job_id)
+    except BrokenProcessPool:
+        _pool.discard(executor)
+        executor = _get_executor()
+        future = executor.submit(execute_job, job_id)
+    with _futures_lock:
+        _futures[job_id] = (executor, future)
+    future.add_done_callback(lambda f: _job_finished(job_id, executor, f))
+
+
+def _stop_failed_jobs():
+    """
+    Stop this process's jobs that are no longer active in ReportJobs (timed out or
+    interrupted). A job still waiting in the pool is cancelled. A running one cannot be
+    interrupted, so its pool is replaced: the jobs queued behind it are started again on
+    a fresh pool, and the old worker exits once the job returns (its result is discarded).
+    A queued job that the old pool runs anyway does nothing: execute_job only starts a
+    job whose status it moves from queued to running.
+    """
+    with _futures_lock:
+        local = dict(_futures)
+    if not local:
+        return
+    ids = sorted(local)
+    statuses = {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    for i in range(0, len(ids), 1000):
+        chunk = ids[i:i + 1000]
+        cursor.execute("SELECT id, status FROM ReportJobs WHERE id IN (%s)" % ",".join("?" * len(chunk)), chunk)
+        statuses.update((row[0], row[1]) for row in cursor.fetchall())
+    conn.close()
+
+    stuck = set()
+    for job_id in ids:
+        executor, future = local[job_id]
+        if statuses.get(job_id) not in ACTIVE_STATUSES and not future.cancel() and not future.done():
+            stuck.add(executor)
+    if not stuck:
+        return
+    requeue = [job_id for job_id in ids
+               if local[job_id][0] in stuck and statuses.get(job_id) == "queued" and not local[job_id][1].done()]
+    for executor in stuck:
+        print("Replacing the job pool: a timed-out job is still running on it")
+        _pool.discard(executor)
+    for job_id in requeue:
+        try:
+            _start_job(job_id)
+        except Exception as e:
+            _fail_job(job_id, "Could not be restarted: %s" % e)
+
+
+def _active_job(cursor, key):
+    cursor.execute(
+        "SELECT id FROM ReportJobs WHERE dedup_key = ? AND status IN ('queued', 'running')", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def submit_job(user_id, kind, params):
+    """
+    Queue a job, or return the identical one already in flight.
+    Returns (job_id, deduplicated). Raises JobError for invalid or refused submissions.
+    """
+    global _last_sweep
+    params = validate_job(kind, params, user_id)
+    key = dedup_key(kind, params, user_id)
+
+    if time.monotonic() - _last_sweep > SWEEP_INTERVAL:
+        _last_sweep = time.monotonic()
+        expire_jobs()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    existing = _active_job(cursor, key)
+    if existing:
+        conn.close()
+        return existing, True
+
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    try:
+        # The limit is checked by the INSERT itself; the locks make a concurrent submit by
+        # the same user wait for this transaction instead of counting the same jobs
+        cursor.execute(
+            "INSERT INTO ReportJobs (id, user_id, kind, params, dedup_key, status, created_at, owner, heartbeat_at) "
+            "SELECT ?, ?, ?, ?, ?, 'queued', ?, ?, ? "
+            "WHERE (SELECT COUNT(*) FROM ReportJobs WITH (UPDLOCK, HOLDLOCK) "
+            "WHERE user_id = ? AND status IN ('queued', 'running')) < ?",
+            (job_id, user_id, kind, json.dumps(params, sort_keys=True), key, now, OWNER_ID, now,
+             user_id, JOB_MAX_ACTIVE),
+        )
+        inserted = cursor.rowcount > 0
+        conn.commit()
+    except Exception:
+        # An identical job submitted at the same moment won the unique index on dedup_key
+        conn.rollback()
+        existing = _active_job(cursor, key)
+        conn.close()
+        if existing is None:
+            raise
+        return existing, True
+    if not inserted:
+        conn.close()
+        raise JobError("Too many jobs in progress; wait for one to finish", 429)
+    conn.close()
+
+    _ensure_heartbeat()
+    try:
+        _start_job(job_id)
+    except Exception as e:
+        print("Job %s could not be started:" % job_id, e)
+        _fail_job(job_id, "Could not be started: %s" % e)
+        raise JobError("The job service is unavailable; try again in a moment", 503)
+    return job_id, False
+
+
+# -------------------
+# Routes
+# -------------------
+def _job_document(job):
+    doc = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "params": json.loads(job["params"]),
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"],
+    }
+    if job["status"] == "failed":
+        doc["error"] = job["error"]
+    if job["status"] == "done":
+        doc["result_url"] = url_for("jobs_bp.job_result", job_id=job["id"])
+        doc["result_bytes"] = job["result_bytes"]
+    return doc
+
+
+def _visible_job(job_id, user_id):
+    job = get_job(job_id)
+    if job is None or (job["user_id"] != user_id and not is_admin(user_id)):
+        return None
+    return job
+
+
+@jobs_bp.route("/jobs", methods=["POST"])
+def create_job():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "JSON body must be an object"}), 400
+    try:
+        job_id, deduplicated = submit_job(user_id, body.get("kind"), body.get("params") or {})
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
+    response = jsonify(_job_document(get_job(job_id)) | {"deduplicated": deduplicated})
+    response.status_code = 202
+    response.headers["Location"] = url_for("jobs_bp.job_status", job_id=job_id)
+    return response
+
+
+@jobs_bp.route("/jobs", methods=["GET"])
+def my_jobs():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+    return jsonify({"jobs": [_job_document(job) for job in list_jobs(user_id)]})
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+    job = _visible_job(job_id, user_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_document(job))
+
+
+@jobs_bp.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 401
+    job = _visible_job(job_id, user_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": "Job is %s" % job["status"]}), 409
+    if not job["result_path"] or not os.path.exists(job["result_path"]):
+        return jsonify({"error": "Result has expired"}), 410
+    return send_file(job["result_path"], mimetype=job["content_type"], as_attachment=True,
+                     download_name=job["filename"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain background report jobs")
+    parser.add_argument("command", choices=["expire"])
+    args = parser.parse_args()
+    expired, failed = expire_jobs()
+    print("Expired %d jobs, marked %d stuck jobs as failed" % (expired, failed))
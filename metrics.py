@@ -0,0 +1,221 @@
+# metrics.py
+# Request instrumentation and a Prometheus-format /metrics endpoint.
+# init_app(app) installs hooks that, for every request:
+#   - time the request and record it in a per-route latency histogram (streamed responses
+#     are recorded when the server closes them, after the whole body was rendered)
+#   - install a db.QueryStats so pooled cursors count queries, query time and rows fetched
+#   - log slow requests (TIMESHEET_SLOW_MS, default 500) together with their SQL
+# Template rendering (Jinja) and chart rendering (matplotlib) get their own histograms,
+# and connection pool and ingest queue statistics are exported as gauges.
+
+import logging
+import os
+import threading
+import time
+
+from flask import Response, g, request, template_rendered, before_render_template
+
+import db
+import ingest
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("TIMESHEET_SLOW_MS", 500)) / 1000.0
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger("timesheet.slow")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    parts = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append('%s="%s"' % (name, value))
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s counter" % self.name]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append("%s%s %s" % (self.name, _label_text(self.labels, key), repr(float(value))))
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append("%s_bucket%s %d" % (self.name, _label_text(names, key + (repr(bound),)), count))
+                lines.append("%s_bucket%s %d" % (self.name, _label_text(names, key + ("+Inf",)), series[-2]))
+                labels = _label_text(self.labels, key)
+                lines.append("%s_count%s %d" % (self.name, labels, series[-2]))
+                lines.append("%s_sum%s %s" % (self.name, labels, repr(float(series[-1]))))
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "timesheet_request_duration_seconds", "Request latency by route", ("route", "method"))
+REQUESTS_TOTAL = Counter(
+    "timesheet_requests_total", "Requests by route and status", ("route", "method", "status"))
+REQUEST_DB_SECONDS = Histogram(
+    "timesheet_request_db_seconds", "Time spent in database calls per request", ("route",))
+DB_QUERIES_TOTAL = Counter(
+    "timesheet_db_queries_total", "SQL statements executed", ("route",))
+DB_ROWS_TOTAL = Counter(
+    "timesheet_db_rows_fetched_total", "Rows fetched from the database", ("route",))
+TEMPLATE_SECONDS = Histogram(
+    "timesheet_template_render_seconds", "Jinja template render time", ("template",))
+CHART_SECONDS = Histogram(
+    "timesheet_chart_render_seconds", "matplotlib chart render time", ("format",))
+SLOW_REQUESTS_TOTAL = Counter(
+    "timesheet_slow_requests_total", "Requests slower than TIMESHEET_SLOW_MS", ("route",))
+
+REGISTRY = [REQUEST_SECONDS, REQUESTS_TOTAL, REQUEST_DB_SECONDS, DB_QUERIES_TOTAL, DB_ROWS_TOTAL,
+            TEMPLATE_SECONDS, CHART_SECONDS, SLOW_REQUESTS_TOTAL]
+
+
+def _route():
+    return request.endpoint or "unmatched"
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_stats = db.QueryStats()
+    g._metrics_token = db.current_query_stats.set(g._metrics_stats)
+
+
+def _after_request(response):
+    started = g.pop("_metrics_started", None)
+    stats = g.get("_metrics_stats")
+    if started is None or stats is None:
+        return response
+    route, method, path, status = _route(), request.method, request.full_path, response.status_code
+
+    def finish():
+        return _record(route, method, path, status, started, stats)
+
+    if response.is_streamed:
+        # The body is rendered while it is sent (page_streaming.stream_page), so the request
+        # is only over when the server closes the response; the headers are already gone by then
+        response.call_on_close(lambda: _finish_stream(finish, stats))
+        g._metrics_streaming = True
+        return response
+    elapsed = finish()
+    response.headers["Server-Timing"] = "app;dur=%.1f, db;dur=%.1f" % (elapsed * 1000, stats.seconds * 1000)
+    return response
+
+
+def _finish_stream(finish, stats):
+    finish()
+    # Generators without stream_with_context get no second teardown to reset this
+    if db.current_query_stats.get() is stats:
+        db.current_query_stats.set(None)
+
+
+def _record(route, method, path, status, started, stats):
+    """Record a finished request; returns its duration in seconds."""
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(elapsed, route, method)
+    REQUESTS_TOTAL.inc(1, route, method, str(status))
+    REQUEST_DB_SECONDS.observe(stats.seconds, route)
+    DB_QUERIES_TOTAL.inc(stats.queries, route)
+    DB_ROWS_TOTAL.inc(stats.rows, route)
+
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS_TOTAL.inc(1, route)
+        slow_log.warning(
+            "Slow request %s %s -> %s: %.0f ms, %d queries, %.0f ms in db, %d rows\n%s",
+            method, path, status, elapsed * 1000,
+            stats.queries, stats.seconds * 1000, stats.rows,
+            "\n".join("  [%.1f ms, %d rows] %s" % (sec * 1000, rows, sql) for sql, sec, rows in stats.statements),
+        )
+    return elapsed
+
+
+def _teardown_request(exc):
+    if g.pop("_metrics_streaming", False):
+        # stream_with_context pushes the request context again while the body is sent and
+        # tears it down a second time at the end; keep counting the body's queries until then
+        return
+    token = g.pop("_metrics_token", None)
+    if token is not None:
+        db.current_query_stats.reset(token)
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault("_metrics_templates", []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get("_metrics_templates")
+    if starts:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - starts.pop(), template.name or "string")
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for key, value in sorted(db.pool_stats().items()):
+        name = "timesheet_db_pool_%s" % key
+        lines.append("# TYPE %s gauge" % name)
+        lines.append("%s %s" % (name, repr(float(value))))
+    for key, value in sorted(ingest.stats().items()):
+        name = "timesheet_ingest_%s" % key
+        lines.append("# TYPE %s gauge" % name)
+        lines.append("%s %s" % (name, repr(float(value))))
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics endpoint on a Flask app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,46 @@
+-- 0001: core tables (previously created by hand from the SQl/SQL1 scripts).
+-- Guarded so databases that already have them are left untouched.
+
+IF OBJECT_ID('UserDetail', 'U') IS NULL
+CREATE TABLE UserDetail (
+    id INT IDENTITY(1,1) CONSTRAINT PK_UserDetail PRIMARY KEY,
+    Fname VARCHAR(20),
+    Lname VARCHAR(20),
+    Username VARCHAR(20) UNIQUE,
+    ContactNo VARCHAR(11),
+    Password VARCHAR(100),
+    Email VARCHAR(100) UNIQUE
+);
+GO
+
+IF OBJECT_ID('TimesheetProjects', 'U') IS NULL
+CREATE TABLE TimesheetProjects (
+    id INT IDENTITY(1,1) CONSTRAINT PK_TimesheetProjects PRIMARY KEY,
+    Project_Name VARCHAR(50) NOT NULL
+);
+GO
+
+IF OBJECT_ID('TimesheetTasks', 'U') IS NULL
+CREATE TABLE TimesheetTasks (
+    id INT IDENTITY(1,1) CONSTRAINT PK_TimesheetTasks PRIMARY KEY,
+    Proj_id INT NOT NULL,
+    Task VARCHAR(100) NOT NULL,
+    CONSTRAINT FK_TimesheetTasks_Projects FOREIGN KEY (Proj_id) REFERENCES TimesheetProjects(id)
+);
+GO
+
+IF OBJECT_ID('TimesheetMain', 'U') IS NULL
+CREATE TABLE TimesheetMain (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    project_id INT NOT NULL,
+    user_id INT NOT NULL,
+    task_id INT NOT NULL,
+    activity VARCHAR(500) NULL,
+    hours DECIMAL(10,2) NOT NULL,
+    overtime DECIMAL(10,2) NULL DEFAULT 0,
+    Tdate DATE NOT NULL,
+    description VARCHAR(MAX) NOT NULL,
+    CONSTRAINT FK_TimesheetMain_UserDetail FOREIGN KEY (user_id) REFERENCES UserDetail(id),
+    CONSTRAINT FK_TimesheetMain_TimesheetProjects FOREIGN KEY (project_id) REFERENCES TimesheetProjects(id),
+    CONSTRAINT FK_TimesheetMain_TimesheetTasks FOREIGN KEY (task_id) REFERENCES TimesheetTasks(id)
+);
@@ -0,0 +1,12 @@
+-- 0002: Timesheet table used by /api/timesheet/add (same DDL as timesheet_model.CREATE_TIMESHEET_TABLE_SQL).
+
+IF OBJECT_ID('Timesheet', 'U') IS NULL
+CREATE TABLE Timesheet (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    user_id INT NOT NULL,
+    task NVARCHAR(255) NOT NULL,
+    hours FLOAT NOT NULL,
+    date DATE NOT NULL,
+    week_start DATE NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES UserDetail(Id)
+);
@@ -0,0 +1,19 @@
+-- 0003: daily analytics rollup (see rollup.py), backfilled from TimesheetMain.
+
+IF OBJECT_ID('TimesheetDailyRollup', 'U') IS NULL
+BEGIN
+    CREATE TABLE TimesheetDailyRollup (
+        user_id INT NOT NULL,
+        Tdate DATE NOT NULL,
+        project_id INT NOT NULL,
+        hours DECIMAL(12,2) NOT NULL,
+        overtime DECIMAL(12,2) NOT NULL,
+        entries INT NOT NULL,
+        CONSTRAINT PK_TimesheetDailyRollup PRIMARY KEY (user_id, Tdate, project_id)
+    );
+
+    INSERT INTO TimesheetDailyRollup (user_id, Tdate, project_id, hours, overtime, entries)
+    SELECT user_id, Tdate, project_id, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*)
+    FROM TimesheetMain
+    GROUP BY user_id, Tdate, project_id;
+END
@@ -0,0 +1,18 @@
+# 0004: search token index (see search_index.py), backfilled from TimesheetMain.
+# A Python migration because tokenizing happens in search_index, not in SQL.
+
+from search_index import CREATE_SEARCH_TABLE_SQL, index_entries
+
+BATCH_SIZE = 1000
+
+
+def upgrade(cursor):
+    cursor.execute(CREATE_SEARCH_TABLE_SQL)
+    last_id = 0
+    while True:
+        cursor.execute("SELECT TOP (?) id FROM TimesheetMain WHERE id > ? ORDER BY id", (BATCH_SIZE, last_id))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        index_entries(cursor, entry_ids=ids)
+        last_id = ids[-1]
@@ -0,0 +1,23 @@
+-- 0005: covering indexes for the hot TimesheetMain queries.
+-- Every per-user query filters on (user_id, Tdate); without an index each one scans the table.
+
+-- /home dashboard pages, /home/tasks, /search_tasks date search, weekly view, per-user export:
+-- seek on user_id, ordered by (Tdate DESC, id DESC), all selected columns included.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_TimesheetMain_user_date' AND object_id = OBJECT_ID('TimesheetMain'))
+CREATE NONCLUSTERED INDEX IX_TimesheetMain_user_date
+    ON TimesheetMain (user_id, Tdate DESC, id DESC)
+    INCLUDE (project_id, task_id, activity, hours, overtime, description);
+GO
+
+-- Org-wide date-range scans: admin export, rollup rebuilds and reports.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_TimesheetMain_date' AND object_id = OBJECT_ID('TimesheetMain'))
+CREATE NONCLUSTERED INDEX IX_TimesheetMain_date
+    ON TimesheetMain (Tdate)
+    INCLUDE (user_id, project_id, task_id, hours, overtime);
+GO
+
+-- Task dropdowns / project tree load.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_TimesheetTasks_project' AND object_id = OBJECT_ID('TimesheetTasks'))
+CREATE NONCLUSTERED INDEX IX_TimesheetTasks_project
+    ON TimesheetTasks (Proj_id)
+    INCLUDE (Task);
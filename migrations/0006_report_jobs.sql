@@ -0,0 +1,27 @@
+-- 0006: background report jobs (see jobs_api.py).
+-- One row per submitted job; results are files under TIMESHEET_JOB_DIR.
+
+IF OBJECT_ID('ReportJobs', 'U') IS NULL
+BEGIN
+    CREATE TABLE ReportJobs (
+        id CHAR(32) NOT NULL PRIMARY KEY,
+        user_id INT NOT NULL,
+        kind NVARCHAR(50) NOT NULL,
+        params NVARCHAR(MAX) NOT NULL,
+        dedup_key CHAR(40) NOT NULL,
+        status NVARCHAR(10) NOT NULL,          -- queued, running, done, failed
+        error NVARCHAR(1000) NULL,
+        result_path NVARCHAR(500) NULL,
+        content_type NVARCHAR(100) NULL,
+        filename NVARCHAR(200) NULL,
+        result_bytes BIGINT NULL,
+        created_at DATETIME2 NOT NULL,
+        started_at DATETIME2 NULL,
+        finished_at DATETIME2 NULL,
+        expires_at DATETIME2 NULL
+    );
+
+    -- In-flight lookup for deduplication and per-user limits
+    CREATE INDEX IX_ReportJobs_dedup ON ReportJobs (dedup_key, status);
+    CREATE INDEX IX_ReportJobs_user ON ReportJobs (user_id, created_at DESC) INCLUDE (status);
+END
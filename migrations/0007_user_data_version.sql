@@ -0,0 +1,11 @@
+-- 0007: per-user data versions for conditional GETs (see data_version.py).
+-- One row per user, bumped by every write path inside its own transaction.
+
+IF OBJECT_ID('UserDataVersion', 'U') IS NULL
+BEGIN
+    CREATE TABLE UserDataVersion (
+        user_id INT NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL,
+        modified DATETIME2 NOT NULL
+    );
+END
@@ -0,0 +1,25 @@
+-- 0008: report job owners and at most one in-flight job per dedup key (see jobs_api.py).
+-- owner is the id of the app process that queued the job; that process refreshes
+-- heartbeat_at while the job is queued or running, so the jobs of a process that has
+-- stopped can be failed instead of blocking deduplication and per-user limits.
+
+IF COL_LENGTH('ReportJobs', 'owner') IS NULL
+ALTER TABLE ReportJobs ADD owner CHAR(32) NULL, heartbeat_at DATETIME2 NULL;
+GO
+
+-- Jobs queued by the previous code have no heartbeat and may be duplicates of each other
+UPDATE ReportJobs
+SET status = 'failed', error = 'Interrupted by an upgrade', finished_at = SYSDATETIME(),
+    expires_at = DATEADD(DAY, 1, SYSDATETIME())
+WHERE status IN ('queued', 'running');
+GO
+
+-- Deduplication is enforced by the database, not by a SELECT before the INSERT
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ReportJobs_dedup' AND object_id = OBJECT_ID('ReportJobs'))
+DROP INDEX IX_ReportJobs_dedup ON ReportJobs;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_ReportJobs_active_dedup' AND object_id = OBJECT_ID('ReportJobs'))
+CREATE UNIQUE NONCLUSTERED INDEX UX_ReportJobs_active_dedup
+    ON ReportJobs (dedup_key)
+    WHERE status IN ('queued', 'running');
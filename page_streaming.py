@@ -0,0 +1,89 @@
+# page_streaming.py
+# Streamed page rendering and a cache for rendered HTML fragments.
+# stream_page() renders a template as a generator response: output is collected until the
+# template emits {{ flush }} and then sent in one piece, so the page shell reaches the
+# browser (which starts fetching CSS/JS) before the slow parts below it are rendered.
+# The status line is sent with the first chunk, so a failure further down cannot become a
+# 500 any more: a failing context callable returns {"failed": True} for the template to
+# render an error row, and any other error ends the page with a short error notice.
+# cached_fragment() keeps rendered fragments keyed by owner and a version the caller
+# supplies (e.g. the user's data version, see data_version.py), so a fragment of unchanged
+# data is neither queried nor rendered again.
+
+import functools
+import os
+import traceback
+
+from flask import Response, stream_template
+from markupsafe import Markup
+
+from cache import TTLCache
+
+# Set TIMESHEET_STREAM_PAGES=0 behind proxies that buffer whole responses anyway
+STREAM_PAGES = os.environ.get("TIMESHEET_STREAM_PAGES", "1") != "0"
+FRAGMENT_CACHE_SIZE = int(os.environ.get("TIMESHEET_FRAGMENT_CACHE_SIZE", 2048))
+
+FLUSH_MARKER = "<!--flush-->"
+STREAM_ERROR_HTML = '<p class="stream-error">Part of this page could not be loaded. Please reload it.</p>'
+
+_fragment_cache = TTLCache(maxsize=FRAGMENT_CACHE_SIZE)
+
+
+def _flushed_chunks(pieces):
+    buffer = []
+    try:
+        for piece in pieces:
+            if FLUSH_MARKER in piece:
+                before, _, after = piece.partition(FLUSH_MARKER)
+                buffer.append(before)
+                yield "".join(buffer)
+                buffer = [after.replace(FLUSH_MARKER, "")]
+            else:
+                buffer.append(piece)
+    except Exception:
+        print("Page render error:")
+        traceback.print_exc()
+        buffer.append(STREAM_ERROR_HTML)
+    yield "".join(buffer)
+
+
+def _guarded(func):
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            print("Page render error in %s:" % getattr(func, "__name__", func))
+            traceback.print_exc()
+            return {"failed": True}
+    return call
+
+
+def stream_page(template_name, **context):
+    """
+    Response rendering template_name with context, flushed at every {{ flush }}.
+    Values in context may be callables the template calls while rendering, so their work
+    happens after the earlier parts of the page are already sent. If one raises, the error
+    is logged and it returns {"failed": True}, which the template should check.
+    """
+    context = {name: _guarded(value) if callable(value) else value for name, value in context.items()}
+    context["flush"] = Markup(FLUSH_MARKER)
+    response = Response(_flushed_chunks(stream_template(template_name, **context)), mimetype="text/html")
+    if not STREAM_PAGES:
+        # Render fully before sending (markers are removed the same way)
+        response.set_data(b"".join(response.iter_encoded()))
+    return response
+
+
+def cached_fragment(owner, key, render):
+    """
+    render() for owner, from the cache when owner already rendered it under the same key.
+    key must change whenever the output would (e.g. a data version plus a page cursor);
+    on a hit neither render() nor the queries it runs are repeated.
+    """
+    cache_key = (owner, key)
+    fragment = _fragment_cache.get(cache_key)
+    if fragment is None:
+        fragment = render()
+        _fragment_cache.set(cache_key, fragment)
+    return fragment
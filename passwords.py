@@ -0,0 +1,144 @@
+# passwords.py
+# Password hashing and verification off the request thread.
+# bcrypt is deliberately CPU-bound, so hashing inline lets a burst of logins starve every
+# other request in the worker. Here each hash/check runs in a small process pool instead:
+#   - TIMESHEET_HASH_WORKERS processes (default: CPU count; 0 = hash inline, no pool)
+#   - at most TIMESHEET_HASH_QUEUE hashes waiting or running (default 4 per process);
+#     beyond that calls fail fast with PasswordServiceBusy so the view can answer 503
+#   - a call that gets no result within TIMESHEET_HASH_TIMEOUT seconds (default 10) also
+#     raises PasswordServiceBusy; its hash keeps the slot until it has actually finished
+#   - if a worker dies the pool is replaced and the hash retried once; when that fails too
+#     the call raises PasswordServiceBusy instead of breaking every later login
+#   - TIMESHEET_BCRYPT_ROUNDS sets the work factor for new hashes (default 12)
+# verify_password() also returns a fresh hash when the stored one uses a different cost,
+# so the caller can upgrade it after a successful login.
+
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from process_pool import LazyProcessPool
+
+BCRYPT_ROUNDS = int(os.environ.get("TIMESHEET_BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("TIMESHEET_HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE_LIMIT = int(os.environ.get("TIMESHEET_HASH_QUEUE", max(HASH_WORKERS, 1) * 4))
+HASH_TIMEOUT = float(os.environ.get("TIMESHEET_HASH_TIMEOUT", 10))
+
+# bcrypt only looks at the first 72 bytes; bcrypt >= 5 raises instead of truncating,
+# so truncate explicitly to keep existing hashes valid.
+MAX_PASSWORD_BYTES = 72
+
+
+class PasswordServiceBusy(Exception):
+    """Too many hashes queued; the caller should ask the client to retry."""
+
+
+_pool = LazyProcessPool()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def _password_bytes(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def hash_cost(stored_hash):
+    """Work factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it is not one."""
+    try:
+        return int(stored_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _hash(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _verify(stored_hash, password, rounds):
+    import bcrypt
+    try:
+        ok = bcrypt.checkpw(_password_bytes(password), stored_hash.encode("utf-8"))
+    except ValueError:
+        # Not a bcrypt hash
+        return False, None
+    if ok and hash_cost(stored_hash) != rounds:
+        return True, _hash(password, rounds)
+    return ok, None
+
+
+def _get_executor():
+    if HASH_WORKERS <= 0:
+        return None
+    return _pool.get(HASH_WORKERS)
+
+
+def _submit(executor, func, args):
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise PasswordServiceBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    # Released when the hash is done, not when we stop waiting for it
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeout:
+        raise PasswordServiceBusy()
+
+
+def _run(func, *args):
+    executor = _get_executor()
+    if executor is None:
+        return func(*args)
+    try:
+        return _submit(executor, func, args)
+    except BrokenProcessPool:
+        # A worker died; hashing has no side effects, so retry once on a fresh pool
+        _pool.discard(executor)
+    executor = _get_executor()
+    try:
+        return _submit(executor, func, args)
+    except BrokenProcessPool:
+        _pool.discard(executor)
+        raise PasswordServiceBusy()
+
+
+def hash_password(password):
+    """bcrypt hash of `password` at the configured cost. May raise PasswordServiceBusy."""
+    return _run(_hash, password, BCRYPT_ROUNDS)
+
+
+def verify_password(stored_hash, password):
+    """
+    Check `password` against `stored_hash`. Returns (ok, new_hash); new_hash is set when
+    the password matched but the stored hash was made with a different cost.
+    May raise PasswordServiceBusy.
+    """
+    return _run(_verify, stored_hash, password, BCRYPT_ROUNDS)
+
+
+def configure(workers=None, queue_limit=None, rounds=None):
+    """Override the environment settings (used by benchmarks); restarts the worker pool."""
+    global HASH_WORKERS, HASH_QUEUE_LIMIT, BCRYPT_ROUNDS, _slots
+    _pool.shutdown()
+    if workers is not None:
+        HASH_WORKERS = workers
+    if queue_limit is not None:
+        HASH_QUEUE_LIMIT = queue_limit
+    if rounds is not None:
+        BCRYPT_ROUNDS = rounds
+    _slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+def warm_up_pool():
+    """Start the worker processes and load bcrypt in them ahead of the first login."""
+    executor = _get_executor()
+    if executor is None:
+        import bcrypt  # noqa: F401
+        return
+    for future in [executor.submit(_hash, "warm-up", 4) for _ in range(HASH_WORKERS)]:
+        future.result()
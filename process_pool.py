@@ -0,0 +1,62 @@
+# process_pool.py
+# Lazily started process pools for the CPU-heavy work (password hashing in passwords.py,
+# report chunks in reports_api.py, background jobs in jobs_api.py).
+#   - a pool is only started on first use, so processes that never need it stay small
+#   - workers are started with forkserver (spawn where that is unavailable), which avoids
+#     forking a process that already runs request threads
+#   - every pool worker runs _mark_pool_worker() on start; inside a worker get() returns
+#     None so the caller does the work inline instead of starting pools of its own.
+#     multiprocessing.parent_process() cannot be used for this: it is also set in
+#     `uvicorn --workers` and gunicorn children, which do need their pools
+#   - a pool broken by a dead worker (BrokenProcessPool) can be dropped with discard();
+#     the next get() starts a fresh one
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# True inside a worker process of any LazyProcessPool
+IN_POOL_WORKER = False
+
+
+def _mark_pool_worker():
+    global IN_POOL_WORKER
+    IN_POOL_WORKER = True
+
+
+class LazyProcessPool:
+    """A ProcessPoolExecutor that is started on first use and can be replaced."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self, workers):
+        """The pool (started with `workers` processes if needed), or None inside a pool worker."""
+        if IN_POOL_WORKER:
+            return None
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=workers, mp_context=multiprocessing.get_context(method),
+                        initializer=_mark_pool_worker)
+                executor = self._executor
+        return executor
+
+    def discard(self, executor):
+        """Drop `executor` (e.g. after BrokenProcessPool) if it is still the current pool."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the pool, waiting for running work; the next get() starts a new one."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,69 @@
+# reference_data.py
+# Cached project/task reference data used by the dropdowns and by anything that needs to
+# resolve project or task ids. TimesheetProjects and TimesheetTasks almost never change,
+# so both tables are loaded together once per TTL and served from memory afterwards.
+# Call invalidate_reference_data() after changing either table.
+
+import hashlib
+import json
+import os
+
+from cache import TTLCache
+from db import get_connection
+
+REFERENCE_TTL = float(os.environ.get("TIMESHEET_REFERENCE_TTL", 600))
+
+_reference_cache = TTLCache(ttl=REFERENCE_TTL)
+
+
+def _load_project_tree():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, Project_Name FROM TimesheetProjects ORDER BY id")
+    project_rows = cursor.fetchall()
+    cursor.execute("SELECT id, Proj_id, Task FROM TimesheetTasks ORDER BY Proj_id, id")
+    task_rows = cursor.fetchall()
+    conn.close()
+
+    projects = [{"id": row[0], "name": row[1], "tasks": []} for row in project_rows]
+    by_id = {p["id"]: p for p in projects}
+    for row in task_rows:
+        project = by_id.get(row[1])
+        if project is not None:
+            project["tasks"].append({"id": row[0], "Proj_id": row[1], "task": row[2]})
+
+    payload = {"projects": projects}
+    etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"tree": payload, "etag": etag, "by_id": by_id}
+
+
+def _reference():
+    return _reference_cache.get_or_load("tree", _load_project_tree)
+
+
+def get_project_tree():
+    """
+    Every project with its tasks, plus an ETag for the payload.
+    Returns (tree, etag) where tree is {"projects": [{"id", "name", "tasks": [...]}, ...]}.
+    """
+    ref = _reference()
+    return ref["tree"], ref["etag"]
+
+
+def get_projects():
+    """List of {"id", "name"} for every project."""
+    return [{"id": p["id"], "name": p["name"]} for p in _reference()["tree"]["projects"]]
+
+
+def get_tasks(project_id=None):
+    """List of {"id", "Proj_id", "task"} for one project, or for all projects."""
+    ref = _reference()
+    if project_id:
+        project = ref["by_id"].get(project_id)
+        return list(project["tasks"]) if project else []
+    return [task for p in ref["tree"]["projects"] for task in p["tasks"]]
+
+
+def invalidate_reference_data():
+    """Forget the cached projects/tasks; the next read reloads them from the database."""
+    _reference_cache.invalidate()
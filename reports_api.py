@@ -0,0 +1,253 @@
+# reports_api.py
+# Org-wide utilization reports for managers: hours, overtime and capacity across every
+# user for a date range, broken down by user, project, task and week.
+# Instead of one query per user, TimesheetMain is read in bulk for the range and
+# aggregated with numpy:
+#   - the range is split into chunks of TIMESHEET_REPORT_CHUNK_DAYS days (default 28)
+#   - each chunk is fetched with fetchmany() into column arrays and reduced to totals per
+#     (user, project, task, week); with more than one chunk the chunks run on a process
+#     pool of TIMESHEET_REPORT_WORKERS processes (default: CPU count, 1 = in-process);
+#     if a pool worker dies the pool is replaced and that report is aggregated in-process
+#   - the per-chunk totals are merged and rolled up into the report sections
+# Capacity is TIMESHEET_HOURS_PER_DAY (default 8) hours per working day (Mon-Fri) per user.
+# numpy is imported on first use, so processes that never build a report do not load it.
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+
+from auth import admin_required
+from db import get_connection
+from process_pool import LazyProcessPool
+from reference_data import get_projects, get_tasks
+
+reports_bp = Blueprint("reports_bp", __name__)
+
+REPORT_WORKERS = int(os.environ.get("TIMESHEET_REPORT_WORKERS", os.cpu_count() or 1))
+REPORT_CHUNK_DAYS = int(os.environ.get("TIMESHEET_REPORT_CHUNK_DAYS", 28))
+REPORT_FETCH_SIZE = 20000
+HOURS_PER_DAY = float(os.environ.get("TIMESHEET_HOURS_PER_DAY", 8))
+MAX_REPORT_DAYS = 731
+
+# Day totals per (user, project, task); the date comes back as days since 1970-01-01 so
+# it lands in an integer array without building date objects
+REPORT_SQL = """
+    SELECT m.user_id, m.project_id, m.task_id, DATEDIFF(DAY, '1970-01-01', m.Tdate),
+           CAST(SUM(m.hours) AS FLOAT), CAST(SUM(COALESCE(m.overtime, 0)) AS FLOAT), COUNT(*)
+    FROM TimesheetMain m
+    WHERE m.Tdate >= ? AND m.Tdate <= ?
+    GROUP BY m.user_id, m.project_id, m.task_id, m.Tdate
+"""
+
+# Columns of the per-chunk key matrix
+USER, PROJECT, TASK, WEEK = range(4)
+
+_pool = LazyProcessPool()
+
+
+def _get_executor():
+    if REPORT_WORKERS <= 1:
+        return None
+    return _pool.get(REPORT_WORKERS)
+
+
+def _group(keys, values):
+    """Sum the rows of `values` (n x k) per unique row of `keys` (n x m, non-negative ints)."""
+    import numpy as np
+    if not len(keys):
+        return keys, values
+    # Pack each key row into one int64 so grouping is a 1-d unique instead of a row sort
+    low = keys.min(axis=0)
+    dims = tuple(int(d) for d in keys.max(axis=0) - low + 1)
+    packed = np.ravel_multi_index(tuple((keys - low).T), dims)
+    unique, inverse = np.unique(packed, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = np.column_stack([np.bincount(inverse, weights=values[:, i], minlength=len(unique))
+                            for i in range(values.shape[1])])
+    return np.column_stack(np.unravel_index(unique, dims)) + low, sums
+
+
+def aggregate_chunk(start_date, end_date):
+    """
+    Totals for entries in [start_date, end_date] per (user, project, task, week).
+    Returns (keys, values): keys is an int64 array of rows (user_id, project_id, task_id,
+    week start as days since 1970-01-01), values a float array of (hours, overtime, entries).
+    Runs in a report worker process or in-process.
+    """
+    import numpy as np
+
+    key_parts, value_parts = [], []
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(REPORT_SQL, (start_date, end_date))
+        while True:
+            rows = cursor.fetchmany(REPORT_FETCH_SIZE)
+            if not rows:
+                break
+            columns = np.array(rows, dtype=np.float64)
+            days = columns[:, 3].astype(np.int64)
+            # 1970-01-01 was a Thursday; shift so Monday = 0
+            weeks = days - (days + 3) % 7
+            key_parts.append(np.column_stack([columns[:, :3].astype(np.int64), weeks]))
+            value_parts.append(columns[:, 4:7])
+        cursor.close()
+    finally:
+        conn.close()
+
+    if not key_parts:
+        return np.empty((0, 4), np.int64), np.empty((0, 3))
+    return _group(np.concatenate(key_parts), np.concatenate(value_parts))
+
+
+def _chunks(start, end, days):
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        yield start.isoformat(), chunk_end.isoformat()
+        start = chunk_end + timedelta(days=1)
+
+
+def _user_names(user_ids):
+    if not user_ids:
+        return {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT Id, Username, Fname, Lname FROM UserDetail")
+    names = {row[0]: {"username": row[1], "name": " ".join(filter(None, (row[2], row[3])))}
+             for row in cursor.fetchall() if row[0] in user_ids}
+    conn.close()
+    return names
+
+
+def _week_start(days):
+    return (datetime(1970, 1, 1) + timedelta(days=int(days))).date().isoformat()
+
+
+def build_utilization_report(start_date, end_date):
+    """
+    Utilization report for every user between start_date and end_date (date objects).
+    Returns {"start_date", "end_date", "working_days", "capacity_hours_per_user", "totals",
+    "by_user", "by_project", "by_task", "by_week", "by_project_week"}.
+    """
+    import numpy as np
+
+    chunks = list(_chunks(start_date, end_date, REPORT_CHUNK_DAYS))
+    executor = _get_executor() if len(chunks) > 1 else None
+    partials = None
+    if executor is not None:
+        try:
+            partials = list(executor.map(aggregate_chunk, *zip(*chunks)))
+        except BrokenProcessPool as e:
+            # A worker died; drop the pool (the next report starts a fresh one) and
+            # aggregate this report in-process rather than failing it
+            print("Report pool broken, aggregating in-process:", e)
+            _pool.discard(executor)
+    if partials is None:
+        partials = [aggregate_chunk(s, e) for s, e in chunks]
+    keys, values = _group(np.concatenate([k for k, _ in partials]), np.concatenate([v for _, v in partials]))
+
+    working_days = int(np.busday_count(start_date, end_date + timedelta(days=1)))
+    capacity = working_days * HOURS_PER_DAY
+
+    def rollup(columns):
+        return _group(keys[:, columns], values)
+
+    def distinct_users(columns):
+        # Number of distinct users per group of `columns`
+        pairs, _ = _group(keys[:, columns + [USER]], np.zeros((len(keys), 1)))
+        return _group(pairs[:, :-1], np.ones((len(pairs), 1)))
+
+    def amounts(row):
+        return {"hours": round(float(row[0]), 2), "overtime": round(float(row[1]), 2), "entries": int(row[2])}
+
+    def utilization(hours):
+        return round(hours * 100.0 / capacity, 1) if capacity else None
+
+    user_keys, user_values = rollup([USER])
+    names = _user_names(set(user_keys[:, 0].tolist()))
+    by_user = []
+    for (user_id,), row in zip(user_keys.tolist(), user_values):
+        entry = {"user_id": user_id, **names.get(user_id, {"username": None, "name": None}), **amounts(row)}
+        entry["utilization"] = utilization(float(row[0]))
+        entry["overtime_share"] = round(float(row[1]) * 100.0 / float(row[0] + row[1]), 1) if row[0] + row[1] else 0.0
+        by_user.append(entry)
+    by_user.sort(key=lambda e: -e["hours"])
+
+    project_names = {p["id"]: p["name"] for p in get_projects()}
+    project_keys, project_values = rollup([PROJECT])
+    project_users = dict(zip(*(a.reshape(-1).tolist() for a in distinct_users([PROJECT]))))
+    by_project = [
+        {"project_id": pid, "project": project_names.get(pid), **amounts(row), "users": int(project_users.get(pid, 0))}
+        for (pid,), row in zip(project_keys.tolist(), project_values)
+    ]
+    by_project.sort(key=lambda e: -e["hours"])
+
+    task_names = {t["id"]: t["task"] for t in get_tasks()}
+    task_keys, task_values = rollup([PROJECT, TASK])
+    by_task = [
+        {"project_id": pid, "task_id": tid, "task": task_names.get(tid), **amounts(row)}
+        for (pid, tid), row in zip(task_keys.tolist(), task_values)
+    ]
+    by_task.sort(key=lambda e: -e["hours"])
+
+    week_keys, week_values = rollup([WEEK])
+    week_users = dict(zip(*(a.reshape(-1).tolist() for a in distinct_users([WEEK]))))
+    by_week = [
+        {"week_start": _week_start(week), **amounts(row), "users": int(week_users.get(week, 0))}
+        for (week,), row in zip(week_keys.tolist(), week_values)
+    ]
+
+    project_week_keys, project_week_values = rollup([PROJECT, WEEK])
+    by_project_week = [
+        {"project_id": pid, "week_start": _week_start(week), **amounts(row)}
+        for (pid, week), row in zip(project_week_keys.tolist(), project_week_values)
+    ]
+
+    totals = values.sum(axis=0) if len(values) else np.zeros(3)
+    users = len(by_user)
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "working_days": working_days,
+        "capacity_hours_per_user": capacity,
+        "totals": {
+            **amounts(totals),
+            "users": users,
+            "capacity_hours": capacity * users,
+            "utilization": utilization(float(totals[0]) / users) if users else None,
+        },
+        "by_user": by_user,
+        "by_project": by_project,
+        "by_task": by_task,
+        "by_week": by_week,
+        "by_project_week": by_project_week,
+    }
+
+
+@reports_bp.route("/admin/reports/utilization", methods=["GET"])
+@admin_required
+def utilization_report():
+    """
+    ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD[&sections=by_user,by_project,...]
+    Without sections every section is returned.
+    """
+    try:
+        start_date = datetime.strptime(request.args.get("start_date", ""), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get("end_date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start_date and end_date are required (YYYY-MM-DD)"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "end_date is before start_date"}), 400
+    if (end_date - start_date).days >= MAX_REPORT_DAYS:
+        return jsonify({"error": f"Ranges are limited to {MAX_REPORT_DAYS} days"}), 400
+
+    report = build_utilization_report(start_date, end_date)
+    sections = [s.strip() for s in request.args.get("sections", "").split(",") if s.strip()]
+    if sections:
+        unknown = [s for s in sections if not s.startswith("by_") or s not in report]
+        if unknown:
+            return jsonify({"error": "Unknown sections: %s" % ", ".join(unknown)}), 400
+        report = {k: v for k, v in report.items() if not k.startswith("by_") or k in sections}
+    return jsonify(report)
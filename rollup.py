@@ -0,0 +1,130 @@
+# rollup.py
+# Daily summary of TimesheetMain keyed by (user_id, Tdate, project_id).
+# The analytics endpoints read only from this table, so their cost grows with the number
+# of days in the requested range rather than with the number of individual entries.
+#
+# Every write path that touches TimesheetMain calls refresh_rollup() on the same cursor,
+# inside the same transaction, for each (Tdate, project_id) it changed. The affected keys
+# are recomputed from TimesheetMain, which keeps the rollup exact even when an update
+# moves an entry to another day or project. The DELETE holds a key-range lock
+# (UPDLOCK, HOLDLOCK) until commit, even when the key has no rollup row yet, so two
+# writers refreshing the same key take turns: the second recomputes after the first has
+# committed instead of both inserting the same primary key.
+#
+# The table is created by migrations/0003_daily_rollup.sql (python setup_timesheet.py).
+# Usage (backfill / repair):
+#     python rollup.py rebuild [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--user-id N]
+
+import argparse
+
+from db import get_connection
+
+_REFRESH_DELETE_SQL = """
+    DELETE FROM TimesheetDailyRollup WITH (UPDLOCK, HOLDLOCK)
+    WHERE user_id = ? AND Tdate = ? AND project_id = ?
+"""
+
+_REFRESH_INSERT_SQL = """
+    INSERT INTO TimesheetDailyRollup (user_id, Tdate, project_id, hours, overtime, entries)
+    SELECT user_id, Tdate, project_id, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*)
+    FROM TimesheetMain
+    WHERE user_id = ? AND Tdate = ? AND project_id = ?
+    GROUP BY user_id, Tdate, project_id
+"""
+
+
+def refresh_rollup(cursor, user_id, keys):
+    """
+    Recompute the rollup rows for one user and the given (Tdate, project_id) keys.
+    Runs on the caller's cursor so it commits (or rolls back) with the caller's write.
+    """
+    unique = {(str(Tdate), int(project_id)) for Tdate, project_id in keys}
+    for Tdate, project_id in sorted(unique):
+        params = (user_id, Tdate, project_id)
+        cursor.execute(_REFRESH_DELETE_SQL, params)
+        cursor.execute(_REFRESH_INSERT_SQL, params)
+
+
+# Keys per statement in refresh_rollup_many (3 parameters each, SQL Server allows 2100)
+REFRESH_MANY_CHUNK = 500
+
+
+def refresh_rollup_many(cursor, user_keys):
+    """
+    Like refresh_rollup() for (user_id, Tdate, project_id) keys of many users at once,
+    with one DELETE and one INSERT per REFRESH_MANY_CHUNK keys (used by group commits).
+    """
+    unique = sorted({(int(user_id), str(Tdate), int(project_id)) for user_id, Tdate, project_id in user_keys})
+    for i in range(0, len(unique), REFRESH_MANY_CHUNK):
+        chunk = unique[i:i + REFRESH_MANY_CHUNK]
+        where = " OR ".join(["(user_id = ? AND Tdate = ? AND project_id = ?)"] * len(chunk))
+        params = [value for key in chunk for value in key]
+        cursor.execute("DELETE FROM TimesheetDailyRollup WITH (UPDLOCK, HOLDLOCK) WHERE " + where, params)
+        cursor.execute(
+            "INSERT INTO TimesheetDailyRollup (user_id, Tdate, project_id, hours, overtime, entries) "
+            "SELECT user_id, Tdate, project_id, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*) "
+            "FROM TimesheetMain WHERE " + where + " GROUP BY user_id, Tdate, project_id",
+            params,
+        )
+
+
+def get_entry_key(cursor, entry_id, user_id):
+    """(Tdate, project_id) of an existing TimesheetMain row, or None if it doesn't exist."""
+    cursor.execute(
+        "SELECT Tdate, project_id FROM TimesheetMain WHERE id = ? AND user_id = ?",
+        (entry_id, user_id),
+    )
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def rebuild_rollup(start_date=None, end_date=None, user_id=None):
+    """
+    Backfill: recompute the rollup from TimesheetMain for an optional date range and user.
+    Returns the number of rollup rows written.
+    """
+    where = []
+    params = []
+    if start_date:
+        where.append("Tdate >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("Tdate <= ?")
+        params.append(end_date)
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM TimesheetDailyRollup" + where_sql, params)
+        cursor.execute(
+            "INSERT INTO TimesheetDailyRollup (user_id, Tdate, project_id, hours, overtime, entries) "
+            "SELECT user_id, Tdate, project_id, SUM(hours), SUM(COALESCE(overtime, 0)), COUNT(*) "
+            "FROM TimesheetMain" + where_sql +
+            " GROUP BY user_id, Tdate, project_id",
+            params,
+        )
+        written = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute TimesheetDailyRollup from TimesheetMain")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", help="first date to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+
+    count = rebuild_rollup(args.start, args.end, args.user_id)
+    print("Rebuilt %d rollup rows." % count)
@@ -0,0 +1,302 @@
+# search_index.py
+# Token/trigram index over the searchable text of TimesheetMain entries
+# (activity, description, project name and task name).
+#
+# Each entry is broken into whole-word tokens ("w:review") and trigram tokens ("g:rev",
+# "g:evi", ...). Trigrams let a search for part of a word ("view") find "review" without a
+# LIKE '%term%' scan. They only pick candidates: the trigrams of an entry are pooled across
+# its fields and words, so "report" would also hit activity "repo" with description
+# "port". Every candidate is therefore checked against its actual text before it is ranked.
+# Lookups go through the (user_id, token) primary key, so the cost of a search depends on
+# how many entries match rather than on how much history the user has.
+# Terms of one or two characters have no trigrams; a query made only of those falls back
+# to a LIKE scan of the user's entries, capped at the MAX_SCAN_MATCHES most recent matches.
+#
+# Write paths keep the index in step through timesheet_model.sync_entry_changes().
+# The table is created by migrations/0004_search_tokens.py (python setup_timesheet.py).
+# Usage (backfill / repair):
+#     python search_index.py rebuild
+
+import argparse
+import re
+
+from db import get_connection
+from serialize import rows_to_dicts
+
+CREATE_SEARCH_TABLE_SQL = """
+IF OBJECT_ID('TimesheetSearchTokens', 'U') IS NULL
+BEGIN
+    CREATE TABLE TimesheetSearchTokens (
+        user_id INT NOT NULL,
+        token VARCHAR(40) NOT NULL,
+        entry_id INT NOT NULL,
+        field TINYINT NOT NULL,  -- see SEARCH_FIELDS
+        CONSTRAINT PK_TimesheetSearchTokens PRIMARY KEY (user_id, token, entry_id, field)
+    );
+    CREATE INDEX IX_TimesheetSearchTokens_entry ON TimesheetSearchTokens (entry_id);
+END
+"""
+
+# field id -> (column name used by /search_tasks, ranking weight)
+SEARCH_FIELDS = {
+    1: ("activity", 3),
+    2: ("description", 1),
+    3: ("Project_Name", 2),
+    4: ("Task", 2),
+}
+FIELD_IDS = {name: field for field, (name, _) in SEARCH_FIELDS.items()}
+
+# Long descriptions are only indexed up to this many characters
+MAX_INDEXED_CHARS = 2000
+MAX_WORD_LENGTH = 38
+MAX_QUERY_TERMS = 8
+# Rows returned by the LIKE fallback for queries without a term of 3+ characters
+MAX_SCAN_MATCHES = 1000
+# Candidate ids per statement when fetching candidates (SQL Server allows 2100 parameters)
+CANDIDATE_CHUNK = 1000
+# Parameters per statement when (re)indexing or removing entries
+INDEX_CHUNK = 2000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_ENTRY_TEXT_SQL = """
+    SELECT m.id, m.user_id, m.activity, m.description, p.Project_Name, t.Task
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+"""
+
+# Columns searched for each field id, for the LIKE fallback
+_FIELD_COLUMNS = {1: "m.activity", 2: "m.description", 3: "p.Project_Name", 4: "t.Task"}
+
+_RESULT_COLUMNS = "m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description, m.Tdate"
+_RESULT_FROM = """
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ?
+"""
+
+# Postings of a user's query tokens; %s is the list of token placeholders
+POSTINGS_SQL = "SELECT entry_id, token FROM TimesheetSearchTokens WHERE user_id = ? AND token IN (%s)"
+
+_INSERT_TOKEN_SQL = "INSERT INTO TimesheetSearchTokens (user_id, token, entry_id, field) VALUES (?, ?, ?, ?)"
+
+
+def _words(text):
+    return [w.lower()[:MAX_WORD_LENGTH] for w in _WORD_RE.findall((text or "")[:MAX_INDEXED_CHARS])]
+
+
+def _trigrams(word):
+    return ["g:" + word[i:i + 3] for i in range(len(word) - 2)]
+
+
+def index_tokens(text):
+    """Set of tokens stored for a piece of text."""
+    tokens = set()
+    for word in _words(text):
+        tokens.add("w:" + word)
+        tokens.update(_trigrams(word))
+    return tokens
+
+
+def query_terms(query):
+    """
+    Split a search string into terms. Each term is (required_tokens, word_token):
+    an entry matches the term when it has every required token; word_token only boosts ranking.
+    """
+    terms = []
+    for word in _words(query)[:MAX_QUERY_TERMS]:
+        required = set(_trigrams(word)) if len(word) >= 3 else {"w:" + word}
+        terms.append((required, "w:" + word))
+    return terms
+
+
+def _entry_rows(entry):
+    entry_id, user_id = entry[0], entry[1]
+    rows = []
+    for field, text in zip((1, 2, 3, 4), entry[2:]):
+        for token in index_tokens(text):
+            rows.append((user_id, token, entry_id, field))
+    return rows
+
+
+def index_entries(cursor, entry_ids=None, user_id=None, dates=None, user_dates=None):
+    """
+    (Re)index entries on the caller's cursor, either by id, or by picking up the user's
+    not-yet-indexed entries on the given dates (used after inserts, where new ids are not known).
+    user_dates does the same for (user_id, Tdate) pairs of many users at once.
+    Long lists are split into statements of at most INDEX_CHUNK parameters.
+    """
+    unindexed = " AND NOT EXISTS (SELECT 1 FROM TimesheetSearchTokens s WHERE s.entry_id = m.id)"
+    if entry_ids:
+        ids = sorted(set(entry_ids))
+        for i in range(0, len(ids), INDEX_CHUNK):
+            chunk = ids[i:i + INDEX_CHUNK]
+            _index_matching(cursor, "m.id IN (%s)" % ",".join("?" * len(chunk)), chunk)
+    elif user_id is not None and dates:
+        days = sorted({str(d) for d in dates})
+        for i in range(0, len(days), INDEX_CHUNK - 1):
+            chunk = days[i:i + INDEX_CHUNK - 1]
+            _index_matching(
+                cursor, "m.user_id = ? AND m.Tdate IN (%s)" % ",".join("?" * len(chunk)) + unindexed,
+                [user_id] + chunk)
+    elif user_dates:
+        pairs = sorted({(int(u), str(d)) for u, d in user_dates})
+        # Two parameters per pair
+        for i in range(0, len(pairs), INDEX_CHUNK // 2):
+            chunk = pairs[i:i + INDEX_CHUNK // 2]
+            _index_matching(
+                cursor, "(%s)" % " OR ".join(["(m.user_id = ? AND m.Tdate = ?)"] * len(chunk)) + unindexed,
+                [value for pair in chunk for value in pair])
+
+
+def _index_matching(cursor, where, params):
+    cursor.execute(_ENTRY_TEXT_SQL + " WHERE " + where, params)
+    entries = cursor.fetchall()
+    if not entries:
+        return
+    found = [e[0] for e in entries]
+    remove_entries(cursor, found)
+    rows = [row for entry in entries for row in _entry_rows(entry)]
+    if rows:
+        cursor.fast_executemany = True
+        cursor.executemany(_INSERT_TOKEN_SQL, rows)
+
+
+def remove_entries(cursor, entry_ids):
+    """Drop the index tokens of the given entries."""
+    ids = sorted(set(entry_ids))
+    for i in range(0, len(ids), INDEX_CHUNK):
+        chunk = ids[i:i + INDEX_CHUNK]
+        cursor.execute(
+            "DELETE FROM TimesheetSearchTokens WHERE entry_id IN (%s)" % ",".join("?" * len(chunk)), chunk
+        )
+
+
+def _indexed_candidates(cursor, user_id, terms, fields):
+    """Ids of the user's entries that have every trigram of every term in `fields`."""
+    required = set().union(*(req for req, _ in terms))
+    sql = POSTINGS_SQL % ",".join("?" * len(required))
+    params = [user_id] + sorted(required)
+    if len(fields) < len(SEARCH_FIELDS):
+        sql += " AND field = ?"
+        params.append(fields[0])
+    cursor.execute(sql, params)
+    postings = {}
+    for entry_id, token in cursor.fetchall():
+        postings.setdefault(entry_id, set()).add(token)
+    return [entry_id for entry_id, tokens in postings.items() if required.issubset(tokens)]
+
+
+def _candidate_rows(cursor, user_id, entry_ids):
+    rows = []
+    ids = sorted(entry_ids)
+    for i in range(0, len(ids), CANDIDATE_CHUNK):
+        chunk = ids[i:i + CANDIDATE_CHUNK]
+        cursor.execute(
+            "SELECT " + _RESULT_COLUMNS + _RESULT_FROM + " AND m.id IN (%s)" % ",".join("?" * len(chunk)),
+            [user_id] + chunk,
+        )
+        rows.extend(rows_to_dicts(cursor, cursor.fetchall()))
+    return rows
+
+
+def _scan_rows(cursor, user_id, words, fields):
+    """LIKE '%word%' scan for every word in `fields`, most recent matches first."""
+    where = []
+    params = [MAX_SCAN_MATCHES, user_id]
+    for word in words:
+        pattern = "%" + word.replace("_", "\\_") + "%"
+        where.append("(%s)" % " OR ".join("%s LIKE ? ESCAPE '\\'" % _FIELD_COLUMNS[f] for f in fields))
+        params.extend([pattern] * len(fields))
+    cursor.execute(
+        "SELECT TOP (?) " + _RESULT_COLUMNS + _RESULT_FROM +
+        " AND " + " AND ".join(where) + " ORDER BY m.Tdate DESC, m.id DESC",
+        params,
+    )
+    return rows_to_dicts(cursor, cursor.fetchall())
+
+
+def _score(row, words, fields):
+    """Ranking score of a row that contains every word in `fields`, or None if it does not."""
+    score = 0
+    texts = {f: (row[SEARCH_FIELDS[f][0]] or "").lower() for f in fields}
+    for word in words:
+        matched = [f for f in fields if word in texts[f]]
+        if not matched:
+            return None
+        for f in matched:
+            weight = SEARCH_FIELDS[f][1]
+            score += weight
+            if word in _WORD_RE.findall(texts[f]):
+                # Whole-word hit
+                score += 2 * weight
+    return score
+
+
+def search_entries(user_id, query, field=None, limit=50):
+    """
+    Ranked search over one user's entries.
+    Every term in the query must occur (in any indexed field, or only in `field` when given,
+    e.g. "activity"). Matches are ranked by field weight, with a bonus for whole-word hits.
+    Returns up to `limit` entries as dicts, best match first.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    words = [word[2:] for _, word in terms]
+    fields = [FIELD_IDS[field]] if field is not None else sorted(SEARCH_FIELDS)
+    indexed = [term for term, word in zip(terms, words) if len(word) >= 3]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if indexed:
+            # The index narrows the entries down; short terms are checked on the text below
+            rows = _candidate_rows(cursor, user_id, _indexed_candidates(cursor, user_id, indexed, fields))
+        else:
+            rows = _scan_rows(cursor, user_id, words, fields)
+    finally:
+        cursor.close()
+        conn.close()
+
+    scored = []
+    for row in rows:
+        score = _score(row, words, fields)
+        if score is not None:
+            scored.append((score, row["id"], row))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [row for _, _, row in scored[:limit]]
+
+
+def rebuild_search_index(batch_size=1000):
+    """Re-index every TimesheetMain entry in id order. Returns the number of entries indexed."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    count = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute(
+                "SELECT TOP (?) id FROM TimesheetMain WHERE id > ? ORDER BY id", (batch_size, last_id)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            index_entries(cursor, entry_ids=ids)
+            conn.commit()
+            count += len(ids)
+            last_id = ids[-1]
+    finally:
+        cursor.close()
+        conn.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-index every TimesheetMain entry for search")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    print("Indexed %d entries." % rebuild_search_index())
@@ -0,0 +1,118 @@
+# serialize.py
+# Shared row -> JSON layer.
+# Views used to build one dict per row with dict(zip(columns, row)) and hand the result to
+# Flask's default jsonify, which goes through json.dumps with a Python-level default()
+# for every Decimal and date. Here:
+#   - the column layout of a query (names, which columns hold Decimal) is worked out once
+#     and cached, so converting rows is one pass over the tuples with no per-value type
+#     checks. Decimal values stay Decimal in the dicts (templates show 8.00, not 8.0)
+#     and are only converted when the result is encoded
+#   - encoding uses orjson when it is installed and falls back to the standard json
+#     module otherwise; both write dates as ISO 8601
+# FastJSONProvider plugs the encoder into Flask so every jsonify() uses it. jsonify()
+# keeps Flask's contract of sending Decimal as a string ("8.00"); dumps() on its own,
+# used by the NDJSON export and the async API, sends Decimal as a number, as those did.
+
+import json
+from decimal import Decimal
+from threading import Lock
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Column layouts by query key (normally the SQL text)
+_layouts = {}
+_layouts_lock = Lock()
+MAX_CACHED_LAYOUTS = 256
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def _default_decimal_str(value):
+    # What Flask's default provider does with Decimal
+    if isinstance(value, Decimal):
+        return str(value)
+    return _default(value)
+
+
+if orjson is not None:
+    def dumps(obj, decimals_as_str=False):
+        """Encode obj as compact JSON bytes."""
+        default = _default_decimal_str if decimals_as_str else _default
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    _encoders = {
+        flag: json.JSONEncoder(default=_default_decimal_str if flag else _default,
+                               separators=(",", ":"), ensure_ascii=False)
+        for flag in (False, True)
+    }
+
+    def dumps(obj, decimals_as_str=False):
+        """Encode obj as compact JSON bytes."""
+        return _encoders[decimals_as_str].encode(obj).encode("utf-8")
+
+
+def column_layout(cursor, query=None):
+    """
+    (column names, indexes of Decimal columns) for the cursor's current result set.
+    With a query key the layout is cached, so repeated calls skip cursor.description.
+    """
+    if query is not None:
+        layout = _layouts.get(query)
+        if layout is not None:
+            return layout
+    description = cursor.description or ()
+    names = tuple(col[0] for col in description)
+    # pyodbc reports the Python type of each column; the SQLite stand-in reports None
+    decimals = tuple(i for i, col in enumerate(description) if col[1] is Decimal)
+    layout = (names, decimals)
+    if query is not None:
+        with _layouts_lock:
+            if len(_layouts) >= MAX_CACHED_LAYOUTS:
+                _layouts.clear()
+            _layouts[query] = layout
+    return layout
+
+
+def _decimals_to_float(rows, decimals):
+    for row in rows:
+        row = list(row)
+        for i in decimals:
+            if row[i] is not None:
+                row[i] = float(row[i])
+        yield row
+
+
+def rows_to_dicts(cursor, rows, query=None, floats=False):
+    """
+    Rows as a list of {column: value} dicts. Decimal values are kept unless floats is set
+    (for results whose API has always sent plain numbers).
+    """
+    names, decimals = column_layout(cursor, query)
+    if floats and decimals:
+        rows = _decimals_to_float(rows, decimals)
+    return [dict(zip(names, row)) for row in rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes responses with dumps() above."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Callers asking for specific json.dumps options (e.g. the session serializer)
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, decimals_as_str=True).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, decimals_as_str=True), mimetype=self.mimetype)
@@ -1,11 +1,169 @@
 # setup_timesheet.py
-# This script sets up the timesheet database table.
-# Run this once to create the Timesheet table in the database.
-# Usage: python setup_timesheet.py
+# This script sets up and upgrades the timesheet database schema.
+# Schema changes live in numbered files under migrations/ (0001_*.sql, 0002_*.py, ...).
+# Each one is applied once, in order, inside its own transaction, and its version is
+# recorded in the SchemaMigrations table so re-running the script is always safe.
+#   - .sql files are T-SQL; batches are separated by lines containing only GO
+#   - .py files define upgrade(cursor) for changes that need Python (e.g. backfills)
+# Usage:
+#   python setup_timesheet.py                 # apply pending migrations
+#   python setup_timesheet.py --explain       # ...and print hot-query plans before and after
+#   python setup_timesheet.py status          # list applied and pending migrations
+#   python setup_timesheet.py explain         # print the current hot-query plans
+
+import argparse
+import importlib.util
+import os
+import re
+
+import analysis_api
+import export_api
+import hours_series
+import reports_api
+import search_index
+import timesheet_model
+from db import get_connection, explain_query, dialect
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+CREATE_MIGRATIONS_TABLE_SQL = """
+IF OBJECT_ID('SchemaMigrations', 'U') IS NULL
+CREATE TABLE SchemaMigrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+);
+"""
+
+_MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.(sql|py)$")
+_GO_RE = re.compile(r"^\s*GO\s*$", re.IGNORECASE | re.MULTILINE)
+
+# The queries every page view depends on, with representative parameters. The SQL is the
+# modules' own, so the plans shown are the plans of the queries the app actually runs.
+HOT_QUERIES = [
+    ("dashboard first page (/home)", timesheet_model.TASK_PAGE_SQL, (51, 1)),
+    ("dashboard next page (/home/tasks)", timesheet_model.TASK_PAGE_AFTER_SQL,
+     (51, 1, "2026-01-15", "2026-01-15", 1000)),
+    ("weekly timesheet", timesheet_model.WEEKLY_TIMESHEET_SQL, (1, "2026-01-12", "2026-01-12")),
+    ("weekly grid", timesheet_model.WEEKLY_GRID_SQL, (1, "2026-01-12", "2026-02-09")),
+    ("analytics summary", analysis_api.ANALYSIS_SUMMARY_SQL, (1, "2026-01-01", "2026-01-31")),
+    ("hours series", hours_series.DAILY_HOURS_SQL, (1, "2025-01-01", "2026-01-31")),
+    ("search postings", search_index.POSTINGS_SQL % "?, ?", (1, "g:rev", "w:review")),
+    ("org-wide date range (reports)", reports_api.REPORT_SQL, ("2026-01-01", "2026-01-31")),
+    ("export date range", export_api.EXPORT_SQL, ("2026-01-01", "2026-01-31")),
+]
+
+
+def discover_migrations():
+    """Sorted list of (version, name, path) for every file in migrations/."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE_RE.match(filename)
+        if match:
+            found.append((int(match.group(1)), filename, os.path.join(MIGRATIONS_DIR, filename)))
+    found.sort()
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version numbers in %s" % MIGRATIONS_DIR)
+    return found
+
+
+def _check_dialect(conn):
+    if dialect(conn) != "mssql":
+        conn.close()
+        raise SystemExit("Migrations are T-SQL and target SQL Server; the SQLite stand-in "
+                         "schema is created by benchmarks/common.py.")
+
+
+def applied_versions(cursor):
+    cursor.execute(CREATE_MIGRATIONS_TABLE_SQL)
+    cursor.execute("SELECT version FROM SchemaMigrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _run_migration(cursor, path):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as f:
+            script = f.read()
+        for batch in _GO_RE.split(script):
+            if batch.strip():
+                cursor.execute(batch)
+    else:
+        spec = importlib.util.spec_from_file_location("migration_%s" % os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(cursor)
+
+
+def migrate():
+    """Apply every pending migration in version order. Returns the list of applied file names."""
+    conn = get_connection()
+    _check_dialect(conn)
+    cursor = conn.cursor()
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        conn.commit()
+        for version, name, path in discover_migrations():
+            if version in done:
+                continue
+            print("Applying %s..." % name)
+            try:
+                _run_migration(cursor, path)
+                cursor.execute("INSERT INTO SchemaMigrations (version, name) VALUES (?, ?)", (version, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print("Migration %s failed; rolled back." % name)
+                raise
+            applied.append(name)
+    finally:
+        cursor.close()
+        conn.close()
+    return applied
+
+
+def print_status():
+    conn = get_connection()
+    _check_dialect(conn)
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    conn.commit()
+    conn.close()
+    for version, name, _ in discover_migrations():
+        print("%-10s %s" % ("applied" if version in done else "pending", name))
+
+
+def print_query_plans(title):
+    """Print the plan of each HOT_QUERIES entry so index usage can be checked."""
+    print("==== Query plans: %s ====" % title)
+    conn = get_connection()
+    try:
+        for label, sql, params in HOT_QUERIES:
+            print("-- %s" % label)
+            try:
+                for line in explain_query(conn, sql, params):
+                    print("   " + line)
+            except Exception as e:
+                print("   (plan unavailable: %s)" % e)
+    finally:
+        conn.close()
 
-from timesheet_model import create_timesheet_table
 
 if __name__ == "__main__":
-    print("Creating Timesheet table...")
-    create_timesheet_table()
-    print("Timesheet table created successfully!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Apply timesheet schema migrations")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status", "explain"])
+    parser.add_argument("--explain", action="store_true", help="print hot-query plans before and after migrating")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status()
+    elif args.command == "explain":
+        print_query_plans("current schema")
+    else:
+        if args.explain:
+            print_query_plans("before")
+        applied = migrate()
+        print("Applied %d migration(s)." % len(applied) if applied else "Database is up to date.")
+        if args.explain:
+            print_query_plans("after")
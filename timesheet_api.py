@@ -4,8 +4,11 @@
 # This blueprint will handle requests for viewing and adding timesheet entries.
 
 from flask import Blueprint, request, jsonify, session
-from timesheet_model import insert_timesheet_entry, get_weekly_timesheet
+from timesheet_model import insert_timesheet_entry, get_weekly_timesheet, get_weekly_grid, validate_main_entry, insert_main_entries
 from datetime import datetime, timedelta
+from ingest import IngestBusy
+from data_version import conditional_response
+from reference_data import get_project_tree
 
 # Create a Blueprint named 'timesheet_bp'
 # This allows us to group related routes together.
@@ -43,10 +46,74 @@ def add_timesheet_entry():
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
     # Insert into database
-    insert_timesheet_entry(user_id, task, hours, date, week_start)
+    try:
+        insert_timesheet_entry(user_id, task, hours, date, week_start)
+    except IngestBusy:
+        # Queue full, or IngestTimeout: the row was withdrawn before it was written
+        return jsonify({'error': 'The server is busy. Please try again in a moment.'}), 503, {'Retry-After': '2'}
 
     return jsonify({'message': 'Timesheet entry added successfully'}), 201
 
+# Upper bound on entries per batch request; a full week for one person is well below this.
+MAX_BATCH_ENTRIES = 500
+
+@timesheet_bp.route('/api/timesheet/batch', methods=['POST'])
+def add_timesheet_batch():
+    """
+    API endpoint to add many TimesheetMain entries in one request.
+    Expects JSON: { "entries": [ { "date": "YYYY-MM-DD", "project_id": int, "task_id": int,
+                                   "activity": "...", "hours": float, "overtime": float|null,
+                                   "description": "..." }, ... ],
+                    "atomic": true }
+    Every entry is validated before anything is written. With atomic (the default) a single
+    invalid entry rejects the whole batch; with "atomic": false the valid entries are inserted.
+    Valid entries are inserted in one transaction with a single commit.
+    Returns per-item results: [{"index": i, "ok": bool, "error": "..."}].
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User not logged in'}), 401
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON body must be an object'}), 400
+    raw_entries = data.get('entries')
+    atomic = data.get('atomic', True)
+    if not isinstance(raw_entries, list) or not raw_entries:
+        return jsonify({'error': 'entries must be a non-empty list'}), 400
+    # A string such as "false" would be truthy, so only a JSON boolean is accepted
+    if not isinstance(atomic, bool):
+        return jsonify({'error': 'atomic must be true or false'}), 400
+    if len(raw_entries) > MAX_BATCH_ENTRIES:
+        return jsonify({'error': f'At most {MAX_BATCH_ENTRIES} entries per batch'}), 400
+
+    # Validate everything up front so the transaction only ever sees good rows
+    results = []
+    valid = []
+    for index, raw in enumerate(raw_entries):
+        entry, error = validate_main_entry(raw)
+        if error:
+            results.append({'index': index, 'ok': False, 'error': error})
+        else:
+            results.append({'index': index, 'ok': True})
+            valid.append(entry)
+
+    if len(valid) < len(raw_entries) and atomic:
+        for result in results:
+            if result['ok']:
+                result['ok'] = False
+                result['error'] = 'Not inserted: batch contains invalid entries'
+        return jsonify({'inserted': 0, 'results': results}), 400
+
+    if valid:
+        try:
+            insert_main_entries(user_id, valid)
+        except Exception as e:
+            print("Batch insert error:", e)
+            return jsonify({'error': 'Database rejected the batch; nothing was inserted'}), 500
+
+    return jsonify({'inserted': len(valid), 'results': results}), 201
+
 @timesheet_bp.route('/api/timesheet/weekly/<week_start>', methods=['GET'])
 def get_weekly_timesheet_api(week_start):
     """
@@ -54,6 +121,7 @@ def get_weekly_timesheet_api(week_start):
     Retrieves data from the existing TimesheetMain table with project and task details.
     URL parameter: week_start in YYYY-MM-DD format (any date in the week).
     Returns JSON with list of entries: [{"project": "...", "task": "...", "activity": "...", "hours": ..., "date": "..."}]
+    Supports conditional GET: answers 304 when the client's ETag is still current.
     """
     # Check if user is logged in
     user_id = session.get('user_id')
@@ -66,10 +134,39 @@ def get_weekly_timesheet_api(week_start):
     except ValueError:
         return jsonify({'error': 'Invalid week_start format. Use YYYY-MM-DD'}), 400
 
-    # Get data from existing TimesheetMain table
-    timesheet = get_weekly_timesheet(user_id, week_start_date)
+    # Get data from existing TimesheetMain table, unless the client's copy is still current
+    # (the response also carries project and task names, hence the reference data ETag)
+    _, reference_etag = get_project_tree()
+    return conditional_response(
+        user_id, lambda: jsonify({'timesheet': get_weekly_timesheet(user_id, week_start_date)}), reference_etag)
+
+# Upper bound on weeks per grid request
+MAX_GRID_WEEKS = 12
+
+@timesheet_bp.route('/api/timesheet/grid', methods=['GET'])
+def get_weekly_grid_api():
+    """
+    API endpoint returning the weekly pivot grid for several consecutive weeks at once,
+    so the weekly page can prefetch neighbouring weeks instead of fetching on every click.
+    Query parameters: week_start=YYYY-MM-DD (any date in the first week), weeks=N (default 1).
+    Returns JSON: {"weeks": [{"week_start", "days", "rows", "day_totals", "total"}, ...]}
+    (see timesheet_model.get_weekly_grid).
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'User not logged in'}), 401
+
+    try:
+        week_start_date = datetime.strptime(request.args.get('week_start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid week_start format. Use YYYY-MM-DD'}), 400
+    weeks = request.args.get('weeks', 1, type=int)
+    if not 1 <= weeks <= MAX_GRID_WEEKS:
+        return jsonify({'error': f'weeks must be between 1 and {MAX_GRID_WEEKS}'}), 400
 
-    return jsonify({'timesheet': timesheet}), 200
+    _, reference_etag = get_project_tree()
+    return conditional_response(
+        user_id, lambda: jsonify({'weeks': get_weekly_grid(user_id, week_start_date, weeks)}), reference_etag)
 
 # Note: To use this blueprint, register it in the main app.py like:
 # from timesheet_api import timesheet_bp
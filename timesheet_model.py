@@ -3,7 +3,14 @@
 # Since we're using raw SQL with pyodbc (no ORM like SQLAlchemy), we'll define the table structure and helper functions here.
 # This keeps the database logic separate and reusable.
 
+import math
+from datetime import datetime, timedelta
 from db import get_connection  # Importing the connection function from the existing db.py
+import ingest
+from data_version import bump_user_version
+from rollup import refresh_rollup, refresh_rollup_many
+from search_index import index_entries, remove_entries
+from serialize import rows_to_dicts
 
 # Define the table creation SQL for the Timesheet table.
 # This table will store individual timesheet entries.
@@ -40,6 +47,11 @@ def create_timesheet_table():
     cursor.close()
     conn.close()
 
+INSERT_TIMESHEET_SQL = """
+    INSERT INTO Timesheet (user_id, task, hours, date, week_start)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
 def insert_timesheet_entry(user_id, task, hours, date, week_start):
     """
     Insert a new timesheet entry into the database.
@@ -49,17 +61,50 @@ def insert_timesheet_entry(user_id, task, hours, date, week_start):
     - hours: Hours spent
     - date: Date of the task
     - week_start: Start date of the week
+    In ingest mode (see ingest.py) the row is group-committed with other requests' rows.
     """
+    params = (user_id, task, hours, date, week_start)
+    if ingest.INGEST_MODE:
+        # Joins the next group commit; returns once that has committed
+        ingest.write(INSERT_TIMESHEET_SQL, params, user_id)
+        return
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO Timesheet (user_id, task, hours, date, week_start)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, task, hours, date, week_start))
+    cursor.execute(INSERT_TIMESHEET_SQL, params)
+    bump_user_version(cursor, user_id)
     conn.commit()
     cursor.close()
     conn.close()
 
+# Dashboard task list (/home, /home/tasks), newest first; TASK_PAGE_AFTER_SQL continues
+# after the (Tdate, id) of the previous page's last row
+TASK_PAGE_SQL = """
+    SELECT TOP (?) m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description , m.Tdate
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ?
+    ORDER BY m.Tdate DESC, m.id DESC;
+"""
+TASK_PAGE_AFTER_SQL = """
+    SELECT TOP (?) m.id, p.Project_Name, t.Task, m.activity, m.hours, m.overtime, m.description , m.Tdate
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ? AND (m.Tdate < ? OR (m.Tdate = ? AND m.id < ?))
+    ORDER BY m.Tdate DESC, m.id DESC;
+"""
+
+WEEKLY_TIMESHEET_SQL = """
+    SELECT p.Project_Name AS project, t.Task AS task, COALESCE(m.activity, '') AS activity,
+           m.hours + COALESCE(m.overtime, 0) AS hours, m.Tdate AS date
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ? AND m.Tdate >= ? AND m.Tdate < DATEADD(DAY, 7, ?)
+    ORDER BY m.Tdate
+"""
+
 def get_weekly_timesheet(user_id, week_start):
     """
     Retrieve all timesheet entries for a user in a specific week from the existing TimesheetMain table.
@@ -71,28 +116,205 @@ def get_weekly_timesheet(user_id, week_start):
     """
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT p.Project_Name, t.Task, m.activity, m.hours + COALESCE(m.overtime, 0) as total_hours, m.Tdate
-        FROM TimesheetMain m
-        JOIN TimesheetProjects p ON m.project_id = p.id
-        JOIN TimesheetTasks t ON m.task_id = t.id
-        WHERE m.user_id = ? AND m.Tdate >= ? AND m.Tdate < DATEADD(DAY, 7, ?)
-        ORDER BY m.Tdate
-    """, (user_id, week_start, week_start))
-    rows = cursor.fetchall()
+    cursor.execute(WEEKLY_TIMESHEET_SQL, (user_id, week_start, week_start))
+    # hours has always been sent as a number here
+    timesheet = rows_to_dicts(cursor, cursor.fetchall(), WEEKLY_TIMESHEET_SQL, floats=True)
     cursor.close()
     conn.close()
-    # Convert rows to list of dicts
-    timesheet = []
-    for row in rows:
-        timesheet.append({
-            'project': row[0],
-            'task': row[1],
-            'activity': row[2] or '',
-            'hours': float(row[3]),
-            'date': row[4]
-        })
     return timesheet
 
+# Hours (including overtime) per project, task and day for a run of weeks
+WEEKLY_GRID_SQL = """
+    SELECT m.project_id, p.Project_Name, m.task_id, t.Task, m.Tdate,
+           CAST(SUM(m.hours + COALESCE(m.overtime, 0)) AS FLOAT)
+    FROM TimesheetMain m
+    JOIN TimesheetProjects p ON m.project_id = p.id
+    JOIN TimesheetTasks t ON m.task_id = t.id
+    WHERE m.user_id = ? AND m.Tdate >= ? AND m.Tdate < ?
+    GROUP BY m.project_id, p.Project_Name, m.task_id, t.Task, m.Tdate
+"""
+
+def get_weekly_grid(user_id, week_start, weeks=1):
+    """
+    Project x task x day pivot of a user's hours for `weeks` consecutive weeks starting
+    with the week containing week_start, from one grouped query.
+    Returns a list with one dict per week:
+    {"week_start", "days": [7 dates], "rows": [{"project_id", "project", "task_id", "task",
+     "hours": [7 floats], "total"}], "day_totals": [7 floats], "total"}
+    Rows are sorted by project and task; only tasks with hours in that week are listed.
+    """
+    first = week_start - timedelta(days=week_start.weekday())
+    end = first + timedelta(days=7 * weeks)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(WEEKLY_GRID_SQL, (user_id, first, end))
+    cells = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    grid = []
+    for w in range(weeks):
+        start = first + timedelta(days=7 * w)
+        grid.append({
+            "week_start": start.isoformat(),
+            "days": [(start + timedelta(days=d)).isoformat() for d in range(7)],
+            "rows": {},
+            "day_totals": [0.0] * 7,
+            "total": 0.0,
+        })
+    for project_id, project, task_id, task, Tdate, hours in cells:
+        if isinstance(Tdate, str):
+            Tdate = datetime.strptime(Tdate[:10], "%Y-%m-%d").date()
+        offset = (Tdate - first).days
+        week = grid[offset // 7]
+        row = week["rows"].get((project_id, task_id))
+        if row is None:
+            row = week["rows"][(project_id, task_id)] = {
+                "project_id": project_id, "project": project, "task_id": task_id, "task": task,
+                "hours": [0.0] * 7, "total": 0.0,
+            }
+        row["hours"][offset % 7] += hours
+        row["total"] += hours
+        week["day_totals"][offset % 7] += hours
+        week["total"] += hours
+    for week in grid:
+        week["rows"] = sorted(week["rows"].values(), key=lambda r: (r["project"], r["task"]))
+    return grid
+
+# -------------------
+# Derived tables
+# -------------------
+def sync_entry_changes(cursor, user_id, keys, entry_ids=None, deleted_ids=()):
+    """
+    Bring the tables derived from TimesheetMain (daily rollup, search index) up to date
+    after a write and bump the user's data version (see data_version.py). Runs on the
+    writer's cursor so everything commits together.
+    Parameters:
+    - keys: (Tdate, project_id) pairs that changed; for updates pass the old and new pair
+    - entry_ids: ids of inserted/updated rows; None indexes the user's new entries on the
+      dates in keys (for inserts, where the new ids are not known)
+    - deleted_ids: ids of removed rows
+    """
+    refresh_rollup(cursor, user_id, keys)
+    if deleted_ids:
+        remove_entries(cursor, deleted_ids)
+    if entry_ids is None:
+        index_entries(cursor, user_id=user_id, dates=[Tdate for Tdate, _ in keys])
+    elif entry_ids:
+        index_entries(cursor, entry_ids=entry_ids)
+    bump_user_version(cursor, user_id)
+
+def sync_inserted_entries(cursor, user_keys):
+    """
+    sync_entry_changes() for rows inserted for many users in one transaction.
+    user_keys: (user_id, Tdate, project_id) of every inserted row.
+    """
+    user_keys = list(user_keys)
+    refresh_rollup_many(cursor, user_keys)
+    index_entries(cursor, user_dates=[(user_id, Tdate) for user_id, Tdate, _ in user_keys])
+    for user_id in sorted({user_id for user_id, _, _ in user_keys}):
+        bump_user_version(cursor, user_id)
+
+# -------------------
+# Batch inserts into TimesheetMain
+# -------------------
+INSERT_MAIN_SQL = """
+    INSERT INTO TimesheetMain (user_id, project_id, task_id, activity, hours, overtime, description, Tdate)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def validate_main_entry(raw):
+    """
+    Validate one TimesheetMain entry given as a dict with keys
+    date, project_id, task_id, activity, hours, overtime (optional), description.
+    Returns (values, None) on success where values is a dict of parsed fields,
+    or (None, error_message) on failure. Nothing is written to the database.
+    """
+    if not isinstance(raw, dict):
+        return None, "Entry must be an object"
+    try:
+        Tdate = datetime.strptime(str(raw.get("date", "")), "%Y-%m-%d").date()
+    except ValueError:
+        return None, "Invalid date format. Use YYYY-MM-DD"
+    try:
+        project_id = int(raw.get("project_id"))
+        task_id = int(raw.get("task_id"))
+    except (TypeError, ValueError):
+        return None, "project_id and task_id must be integers"
+    try:
+        hours = float(raw.get("hours"))
+        overtime = raw.get("overtime")
+        overtime = float(overtime) if overtime not in (None, "") else None
+    except (TypeError, ValueError):
+        return None, "hours and overtime must be numbers"
+    # float() also accepts "nan" and "inf"
+    if not math.isfinite(hours) or (overtime is not None and not math.isfinite(overtime)):
+        return None, "hours and overtime must be finite numbers"
+    if hours < 0 or (overtime is not None and overtime < 0):
+        return None, "hours and overtime cannot be negative"
+    description = raw.get("description")
+    if not description:
+        return None, "description is required"
+    return {
+        "Tdate": Tdate,
+        "project_id": project_id,
+        "task_id": task_id,
+        "activity": raw.get("activity") or "",
+        "hours": hours,
+        "overtime": overtime,
+        "description": description,
+    }, None
+
+def insert_main_entry(user_id, project_id, task_id, activity, hours, overtime, description, Tdate):
+    """
+    Insert one TimesheetMain entry and bring the derived tables up to date.
+    In ingest mode (see ingest.py) the row is group-committed with other requests' rows;
+    either way it has committed when this returns.
+    """
+    params = (user_id, project_id, task_id, activity, hours, overtime, description, Tdate)
+    if ingest.INGEST_MODE:
+        ingest.write(INSERT_MAIN_SQL, params, user_id, (Tdate, project_id))
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(INSERT_MAIN_SQL, params)
+        sync_entry_changes(cursor, user_id, [(Tdate, project_id)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def insert_main_entries(user_id, entries):
+    """
+    Insert many validated entries (see validate_main_entry) for one user in a single
+    transaction with one executemany round trip and one commit.
+    Rolls back and re-raises if any row is rejected by the database.
+    """
+    params = [
+        (user_id, e["project_id"], e["task_id"], e["activity"], e["hours"],
+         e["overtime"], e["description"], e["Tdate"])
+        for e in entries
+    ]
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # Send the whole parameter array in one round trip instead of one per row
+        cursor.fast_executemany = True
+        cursor.executemany(INSERT_MAIN_SQL, params)
+        # Set-based refresh: a few statements for the whole batch rather than two per key
+        sync_inserted_entries(cursor, [(user_id, e["Tdate"], e["project_id"]) for e in entries])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return len(params)
+
 # Note: To use this, you need to call create_timesheet_table() once.
 # Also, ensure the UserDetail table has an 'Id' column; if not, adjust the foreign key.
\ No newline at end of file
@@ -0,0 +1,47 @@
+# user_profile.py
+# Cached UserDetail profile (everything except the password hash) per user.
+# login() primes the cache with the row it already read, so the dashboard greeting,
+# /profile and /edit_profile are served without touching UserDetail. update_profile()
+# invalidates the entry. The cache is per process: a profile changed through another
+# worker can be served stale for at most TIMESHEET_PROFILE_TTL seconds (default 300).
+
+import os
+
+from cache import TTLCache
+from db import get_connection
+
+PROFILE_TTL = float(os.environ.get("TIMESHEET_PROFILE_TTL", 300))
+PROFILE_CACHE_SIZE = int(os.environ.get("TIMESHEET_PROFILE_CACHE_SIZE", 10000))
+
+PROFILE_FIELDS = ("Id", "Username", "Fname", "Lname", "ContactNo", "Email")
+
+_profile_cache = TTLCache(ttl=PROFILE_TTL, maxsize=PROFILE_CACHE_SIZE)
+
+
+def cache_user_profile(profile):
+    """Store a profile dict (PROFILE_FIELDS) that the caller has just read from UserDetail."""
+    _profile_cache.set(profile["Id"], dict(profile))
+
+
+def get_user_profile(user_id):
+    """Profile dict for user_id (PROFILE_FIELDS), or None if the user does not exist."""
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return dict(profile)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT Id, Username, Fname, Lname, ContactNo, Email FROM UserDetail WHERE Id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+
+    profile = dict(zip(PROFILE_FIELDS, row))
+    cache_user_profile(profile)
+    return dict(profile)
+
+
+def invalidate_user_profile(user_id):
+    """Forget the cached profile; call after changing the user's UserDetail row."""
+    _profile_cache.invalidate(user_id)
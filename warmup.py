@@ -0,0 +1,44 @@
+# warmup.py
+# Optional warm-up for the dependencies the app imports lazily.
+# pyodbc, bcrypt and matplotlib are loaded on first use so a worker boots quickly;
+# warm_up() pays those costs ahead of the first request instead. It runs on startup when
+# TIMESHEET_WARMUP is set, or can be called from a WSGI server's post-fork hook.
+
+import threading
+import time
+
+
+def _warm_pool():
+    from db import get_pool
+    pool = get_pool()
+    pool.acquire().close()
+
+
+def _warm_charts():
+    # Importing matplotlib and drawing once builds its font cache
+    from charts import render_pie
+    render_pie(["warm-up"], [1.0])
+
+
+def warm_up(extra_steps=(), background=False):
+    """
+    Import and initialise the lazily loaded dependencies.
+    extra_steps: iterable of (name, callable) run after the built-in steps,
+    e.g. [("password_pool", warm_up_pool)] from app.py.
+    Returns a dict of step name -> seconds (or the error message if a step failed).
+    With background=True the work runs on a daemon thread and None is returned.
+    """
+    if background:
+        threading.Thread(target=warm_up, args=(extra_steps,), name="warm-up", daemon=True).start()
+        return None
+
+    steps = [("db_pool", _warm_pool), ("charts", _warm_charts)] + list(extra_steps)
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            timings[name] = time.perf_counter() - started
+        except Exception as e:
+            timings[name] = "failed: %s" % e
+    return timings